@@ -6,77 +6,78 @@ CreateDate: 2022/1/14
 Author: xuwenlin
 E-mail: wenlinxu.njfu@outlook.com
 """
-from io import StringIO, TextIOWrapper
+from io import TextIOWrapper
 from os import getcwd, makedirs
-from re import findall
-from pandas import read_table
+from re import compile
+from typing import Iterable
+import numpy as np
 import click
 from pybioinformatic import TaskManager, Displayer
-displayer = Displayer(__file__.split('/')[-1], version='0.2.0')
+from file_io_lib import map_line_batches
+from go_lib import Ontology
+displayer = Displayer(__file__.split('/')[-1], version='0.4.1')
 
+GO_ID = compile(r'GO:\d{7}')
+BATCH_SIZE = 100000
 
-def parse_obo(go_basic_obo_file: str):
+# GO term names and ontology shared with worker processes.
+_shared = {}
+
+
+def annotate_lines(lines: Iterable[str]) -> str:
+    """Annotate a batch of lines with GO term names, return output of the batch as one string."""
+    names, findall = _shared['names'], GO_ID.findall
     content = []
-    d = {}
-    is_term = None
-    for line in open(go_basic_obo_file):
-        if line.startswith('data-version'):
-            content.append(f'##{line}##ID\tChild_id\tName\tNamespace\tDefinition')
-        elif line.startswith('[Term]'):
-            is_term = True
-        elif line.startswith('id: '):
-            if is_term:
-                d[1] = f"{line.strip().replace('id: ', '')}"
-        elif line.startswith('name: '):
-            if is_term:
-                d[3] = f"{line.strip().replace('name: ', '')}"
-        elif line.startswith('namespace: '):
-            if is_term:
-                d[4] = f"{line.strip().replace('namespace: ', '')}"
-        elif line.startswith('alt_id: '):
-            if is_term:
-                if 2 in d:
-                    d[2] = d[2] + f",{line.strip().replace('alt_id: ', '')}"
-                else:
-                    d[2] = f"{line.strip().replace('alt_id: ', '')}"
-        elif line.startswith('def: '):
-            if is_term:
-                d[5] = f"{line.strip().replace('def: ', '')}"
-        elif not line.strip():
-            if d:
-                try:
-                    content.append(f'{d[1]}\t{d[2]}\t{d[3]}\t{d[4]}\t{d[5]}')
-                except KeyError:
-                    content.append(f'{d[1]}\tNull\t{d[3]}\t{d[4]}\t{d[5]}')
-            is_term = False
-            d = {}
-    content = '\n'.join(content)
-    return content
+    for line in lines:
+        GO_ids = findall(line)
+        if GO_ids:
+            query_id = line.strip().split('\t')[0]
+            content.extend(f'{query_id}\t{GO_id}\t{names[GO_id]}\n' for GO_id in GO_ids if GO_id in names)
+    return ''.join(content)
+
+
+def propagate_lines(lines: Iterable[str]) -> str:
+    """
+    Annotate a batch of lines with GO terms and all their is_a/part_of ancestors (alternative IDs are resolved),
+    every term is reported once per line.
+    """
+    ontology, findall = _shared['ontology'], GO_ID.findall
+    query_ids, rows, terms = [], [], []
+    for line in lines:
+        term_indices = [i for i in map(ontology.term_index, findall(line)) if i >= 0]
+        if term_indices:
+            rows.extend([len(query_ids)] * len(term_indices))
+            terms.extend(term_indices)
+            query_ids.append(line.strip().split('\t')[0])
+    if not terms:
+        return ''
+    rows, terms = ontology.propagate(np.array(rows, dtype=np.int64), np.array(terms, dtype=np.int64))
+    ids, names = ontology.ids, ontology.names
+    return ''.join(f'{query_ids[row]}\t{ids[term]}\t{names[term]}\n' for row, term in zip(rows.tolist(), terms.tolist()))
 
 
 def main(anno_file: TextIOWrapper,
          go_basic_obo_file: str = None,
-         output_path: str = getcwd()):
+         output_path: str = getcwd(),
+         num_threads: int = 1,
+         propagate: bool = False,
+         use_cache: bool = True):
     makedirs(output_path, exist_ok=True)
     if not go_basic_obo_file:
         cmd = f'wget -c -O {output_path}/go-basic.obo https://purl.obolibrary.org/obo/go/go-basic.obo'
         tkm = TaskManager(num_processing=1)
         tkm.echo_and_exec_cmd(cmd=cmd, show_cmd=True)
-    content = parse_obo(go_basic_obo_file) if go_basic_obo_file else parse_obo(f'{output_path}/go-basic.obo')
-    df = read_table(StringIO(content), comment='#', header=None, names=['ID', 'Child_id', 'Name', 'Namespace', 'Definition'])
-    df.set_index(keys='ID', drop=True, inplace=True)
+    ontology = Ontology.load(go_basic_obo_file or f'{output_path}/go-basic.obo', use_cache)
+    # Workers are forked after the ontology is loaded, so they share it copy-on-write without pickling.
+    anno_file = '-' if anno_file.name == '<stdin>' else anno_file.name
+    annotate = propagate_lines if propagate else annotate_lines
+    _shared.update(
+        names=dict(zip(ontology.ids.tolist(), ontology.names.tolist())),
+        ontology=ontology
+    )
     with open(f'{output_path}/GO_anno.xls', 'w') as o:
-        for line in anno_file:
-            query_id = line.strip().split('\t')[0]
-            GO_ids = findall(r'GO:\d{7}', line)
-            if GO_ids:
-                for GO_id in GO_ids:
-                    try:
-                        definition = df.loc[GO_id, 'Name']
-                    except KeyError:
-                        pass
-                    else:
-                        click.echo(f'{query_id}\t{GO_id}\t{definition}', o)
+        for content in map_line_batches(anno_file, annotate, num_threads, BATCH_SIZE):
+            o.write(content)
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
@@ -87,14 +88,24 @@ def main(anno_file: TextIOWrapper,
 @click.option('-o', '--output-path', 'output_path',
               metavar='<path>', default=getcwd(), show_default=True,
               help=r'Output path, if not exist, automatically created.')
+@click.option('-t', '--threads', 'num_threads',
+              metavar='<int>', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Number of processes annotating the annotation file in parallel byte ranges. (output order is kept)')
+@click.option('-p', '--propagate', 'propagate', is_flag=True, flag_value=True,
+              help='Also annotate each gene with all ancestors (is_a and part_of) of its GO terms.')
+@click.option('--no-cache', 'no_cache', is_flag=True, flag_value=True,
+              help='Do not read or write the parsed ontology cache (.<obo file>.<data-version>.npz next to obo file).')
 @click.option('-V', '--version', 'version', help='Show author and version information.',
               is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
-def run(obo_file, anno_file, output_path):
+def run(obo_file, anno_file, output_path, num_threads, propagate, no_cache):
     """GO annotate."""
     main(
         anno_file=anno_file,
         go_basic_obo_file=obo_file,
-        output_path=output_path
+        output_path=output_path,
+        num_threads=num_threads,
+        propagate=propagate,
+        use_cache=not no_cache
     )
 
 
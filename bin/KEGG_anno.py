@@ -7,69 +7,157 @@ Author: xuwenlin
 E-mail: wenlinxu.njfu@outlook.com
 """
 from io import TextIOWrapper
+from os import makedirs, replace
+from os.path import expanduser, exists
+from concurrent.futures import ThreadPoolExecutor
+from json import loads, load, dump
+from re import compile
+from time import time
+from typing import Iterator, Tuple, List
 import requests
-from json import loads
-from re import sub
 import click
 from pybioinformatic import Displayer
-displayer = Displayer(__file__.split('/')[-1], version='0.3.0')
+displayer = Displayer(__file__.split('/')[-1], version='0.4.0')
 
+BRITE_URL = 'https://www.kegg.jp/kegg-bin/download_htext?htext={species}00001&format=json&filedir=kegg/brite/{species}'
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.99 Safari/537.36'
+DEFAULT_CACHE_DIR = expanduser('~/.cache/KEGG_anno')
+PATHWAY_TAG = compile(r'\[.*]')
+WRITE_BATCH = 10000
 
-def download_json(species_name: str):
-    response = requests.get(url=f'https://www.kegg.jp/kegg-bin/download_htext?htext={species_name}00001&format=json&filedir=kegg/brite/{species_name}',
-                            headers={
-                                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.99 Safari/537.36"
-                            })
-    return response.text
 
+def fetch_json(session: requests.Session,
+               species_name: str,
+               cache_dir: str,
+               max_age: float = 30,
+               offline: bool = False) -> str:
+    """
+    Get BRITE hierarchy JSON of species from cache directory (<cache dir>/<species>00001.json), downloading it only
+    if it is missing or older than max_age days. An expired file is revalidated with its ETag/Last-Modified,
+    so an unchanged hierarchy is not downloaded again. Without network a cached file of any age is used.
+    :return: Path of JSON file.
+    """
+    json_file = f'{cache_dir}/{species_name}00001.json'
+    meta_file = f'{json_file}.meta'
+    meta = {}
+    if exists(json_file) and exists(meta_file):
+        with open(meta_file) as f:
+            meta = load(f)
+    elif exists(json_file):
+        # a JSON file put into the cache by hand (eg. test fixture) is always taken as fresh
+        return json_file
+    if offline or (meta and time() - meta['fetched'] < max_age * 86400):
+        if not exists(json_file):
+            raise click.ClickException(f'{json_file} is not cached, it can not be used offline.')
+        return json_file
+    headers = {'User-Agent': USER_AGENT}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    try:
+        response = session.get(BRITE_URL.format(species=species_name), headers=headers, timeout=120)
+        response.raise_for_status()
+        if response.status_code != 304:
+            loads(response.text)  # never cache an error page
+    except (requests.RequestException, ValueError) as e:
+        if exists(json_file):
+            click.echo(f'\033[33mWarning: {e}, use cached {json_file}.\033[0m', err=True)
+            return json_file
+        raise click.ClickException(f'Download of {species_name}00001.json failed: {e}')
+    if response.status_code != 304:
+        with open(f'{json_file}.tmp', 'w') as o:
+            o.write(response.text)
+        replace(f'{json_file}.tmp', json_file)
+    with open(meta_file, 'w') as o:
+        dump({'etag': response.headers.get('ETag', meta.get('etag')),
+              'last_modified': response.headers.get('Last-Modified', meta.get('last_modified')),
+              'fetched': time()}, o)
+    return json_file
 
-def parse_json(content: str,
-               out_file: TextIOWrapper):
-    items = loads(content)['children']
-    for level_1 in items:
-        level_1_name = level_1['name'].split(' ')
-        level_1_ko = f'ko{level_1_name[0]}'
-        level_1_name = ' '.join(level_1_name[1:])
-        level_1_children = level_1['children']
-        for level_2 in level_1_children:
-            level_2_name = level_2['name'].split(' ')
-            level_2_ko = f'ko{level_2_name[0]}'
-            level_2_name = ' '.join(level_2_name[1:])
-            level_2_children = level_2['children']
-            for level_3 in level_2_children:
-                level_3_name = level_3['name'].split(' ')
-                level_3_ko = f'ko{level_3_name[0]}'
-                level_3_name = sub(r'\[.*]', '', ' '.join(level_3_name[1:]))
-                try:
-                    level_3_children = level_3['children']
-                except KeyError:
-                    pass
-                else:
-                    for i in level_3_children:
-                        name = i['name'].split('\t')
-                        K = name[1].split(' ')[0]
-                        id = 'pop:' + name[0].split(' ')[0] + '\t' + K + '\t' + ' '.join(name[0].split(' ')[1:])
-                        click.echo(f'{id}\t{level_1_ko}\t{level_1_name}\t{level_2_ko}\t{level_2_name}\t{level_3_ko}\t{level_3_name}', out_file)
 
+def split_level_name(name: str, level: int) -> str:
+    """Level name like "09100 Metabolism" as "ko09100\tMetabolism", pathway tag of the third level is removed."""
+    number, _, name = name.partition(' ')
+    if level == 3:
+        name = PATHWAY_TAG.sub('', name)
+    return f'ko{number}\t{name}'
 
-def main(species_name: str,
-         out_file: TextIOWrapper):
-        content = download_json(species_name=species_name)
-        parse_json(content=content, out_file=out_file)
+
+def iter_brite_rows(hierarchy: dict, species_name: str) -> Iterator[str]:
+    """
+    Flatten BRITE hierarchy in a single depth-first pass, yielding one line per gene:
+    gene ID, KO, gene description and the ko number and name of the three levels above the gene.
+    Level names are formatted once per node rather than once per gene.
+    """
+    stack: List[Tuple[dict, int, str]] = [(node, 1, '') for node in reversed(hierarchy['children'])]
+    while stack:
+        node, level, path = stack.pop()
+        if level <= 3:
+            children = node.get('children')
+            if children:
+                path = f'{path}\t{split_level_name(node["name"], level)}'
+                stack.extend((child, level + 1, path) for child in reversed(children))
+            continue
+        gene, _, ko = node['name'].partition('\t')
+        gene_id, _, description = gene.partition(' ')
+        yield f'{species_name}:{gene_id}\t{ko.split(" ")[0] or "NA"}\t{description}{path}\n'
+
+
+def write_rows(rows: Iterator[str], out_file: TextIOWrapper):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == WRITE_BATCH:
+            out_file.write(''.join(batch))
+            batch = []
+    out_file.write(''.join(batch))
+
+
+def main(species_names: Tuple[str, ...],
+         out_file: TextIOWrapper,
+         cache_dir: str = DEFAULT_CACHE_DIR,
+         max_age: float = 30,
+         offline: bool = False,
+         num_threads: int = 4):
+    makedirs(cache_dir, exist_ok=True)
+    out_file = out_file or click.get_text_stream('stdout')
+    # Downloads run in threads over one keep-alive session, species are written in the given order.
+    with requests.Session() as session, ThreadPoolExecutor(num_threads) as executor:
+        json_files = executor.map(lambda species: fetch_json(session, species, cache_dir, max_age, offline),
+                                  species_names)
+        for species_name, json_file in zip(species_names, json_files):
+            with open(json_file) as f:
+                hierarchy = load(f)
+            write_rows(iter_brite_rows(hierarchy, species_name), out_file)
+    out_file.flush()
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
-@click.option('-n', '--species-name', 'species_name',
-              metavar='<str>', required=True,
-              help='Species name. (eg: pop)')
+@click.option('-n', '--species-name', 'species_names',
+              metavar='<str>', required=True, multiple=True,
+              help='Species name, specify multiple times or separate by comma for several species. (eg: pop)')
 @click.option('-o', '--output-file', 'outfile',
               metavar='<file|stdout>', type=click.File('w'),
               help=r'Output file, stdout by default.')
+@click.option('-c', '--cache-dir', 'cache_dir',
+              metavar='<dir>', default=DEFAULT_CACHE_DIR, show_default=True,
+              help='Directory of downloaded BRITE JSON files (<species>00001.json), '
+                   'JSON files put there by hand are used as they are.')
+@click.option('-a', '--max-age', 'max_age',
+              metavar='<float>', type=click.FloatRange(min=0), default=30, show_default=True,
+              help='Days a cached file is used without asking KEGG whether it changed.')
+@click.option('--offline', 'offline', is_flag=True, flag_value=True,
+              help='Only use cached files.')
+@click.option('-t', '--threads', 'num_threads',
+              metavar='<int>', type=click.IntRange(min=1), default=4, show_default=True,
+              help='Number of species downloaded at the same time.')
 @click.option('-V', '--version', 'version', help='Show author and version information.',
               is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
-def run(species_name, outfile):
+def run(species_names, outfile, cache_dir, max_age, offline, num_threads):
     """Preprocess xxx00001.keg file"""
-    main(species_name, outfile)
+    species_names = tuple(name for names in species_names for name in names.split(',') if name)
+    main(species_names, outfile, cache_dir, max_age, offline, num_threads)
 
 
 if __name__ == '__main__':
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 """
 File: PCC.py
-Description: Calculation of Pearson correlation coefficient from gene expression.
+Description: Calculation of Pearson, Spearman or Kendall (partial) correlation coefficient from gene expression.
 CreateDate: 2022/9/10
 Author: xuwenlin
 E-mail: wenlinxu.njfu@outlook.com
@@ -9,16 +9,11 @@ E-mail: wenlinxu.njfu@outlook.com
 from io import TextIOWrapper
 from typing import Union
 from tqdm import tqdm
-from scipy.stats import pearsonr
 import click
-from pybioinformatic import TaskManager, Displayer
+from pybioinformatic import Displayer
+from expression_lib import read_exp_matrix, correlation_tiles
 
-displayer = Displayer(__file__.split('/')[-1], version='0.2.0')
-
-
-def sub_process(x_name, x_data, y_name, y_data):
-    r, p = pearsonr(x_data, y_data)
-    return f'{x_name}\t{y_name}\t{r}\t{p}'
+displayer = Displayer(__file__.split('/')[-1], version='0.4.3')
 
 
 def main(exp_matrix_file1: Union[str, TextIOWrapper],
@@ -26,37 +21,41 @@ def main(exp_matrix_file1: Union[str, TextIOWrapper],
          min_exp1: float = 0.5,
          min_exp2: float = 0.5,
          num_processing: int = 10,
+         method: str = 'pearson',
+         covariate_file: Union[str, TextIOWrapper] = None,
+         block_size: int = 512,
+         min_abs_r: float = None,
+         max_p: float = None,
+         top_k: int = None,
          output_file: TextIOWrapper = None):
-
-    exp_dict1 = {
-        line.strip().split('\t')[0]: [float(i) for i in line.strip().split('\t')[1:]]
-        for line in exp_matrix_file1
-        if not line.startswith('Geneid') and line.strip() and
-           all([float(i) >= min_exp1 for i in line.strip().split('\t')[1:]])
-    }
-
-    exp_dict2 = {
-        line.strip().split('\t')[0]: [float(i) for i in line.strip().split('\t')[1:]]
-        for line in exp_matrix_file2
-        if not line.startswith('Geneid') and line.strip() and
-           all([float(i) >= min_exp2 for i in line.strip().split('\t')[1:]])
-    }
-
-    with tqdm(total=len(exp_dict1) * len(exp_dict2)) as pbar:
-        params = ((k1, v1, k2, v2) for k1, v1 in exp_dict1.items() for k2, v2 in exp_dict2.items())
-        tkm = TaskManager(num_processing=num_processing, params=params)
-        rets = tkm.parallel_run_func(func=sub_process, call_back_func=lambda _: pbar.update())
-        for ret in rets:
-            click.echo(ret.get(), output_file)
+    x_ids, x = read_exp_matrix(exp_matrix_file1, min_exp1)
+    y_ids, y = read_exp_matrix(exp_matrix_file2, min_exp2)
+    covariates = read_exp_matrix(covariate_file)[1] if covariate_file else None
+    if method == 'kendall' and covariates is not None:
+        click.echo('\033[31mError: Partial correlation is not supported by kendall method.\033[0m', err=True)
+        exit()
+    with tqdm(total=len(x_ids) * len(y_ids)) as pbar:
+        tiles = correlation_tiles(x_ids, x, y_ids, y,
+                                  method=method,
+                                  covariates=covariates,
+                                  block_size=block_size,
+                                  num_processing=num_processing,
+                                  min_abs_r=min_abs_r,
+                                  max_p=max_p,
+                                  top_k=top_k)
+        for num_genes, content in tiles:
+            if content:
+                click.echo(content, output_file)
+            pbar.update(num_genes * len(y_ids))
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
 @click.option('-i', '--exp-file1', 'exp_file1',
               metavar='<file|stdin>', required=True, type=click.File('r'),
-              help=r'Input gene expression matrix file. (header must start with "Geneid")')
+              help=r'Input gene expression matrix file. (header must start with "Geneid", or binary matrix from "file_format_conversion exp2bin")')
 @click.option('-I', '--exp-file2', 'exp_file2',
               metavar='<file|stdin>', required=True, type=click.File('r'),
-              help='Input another gene expression matrix file. (header must start with "Geneid")')
+              help='Input another gene expression matrix file. (header must start with "Geneid", or binary matrix)')
 @click.option('-e', '--min-exp1', 'min_exp1',
               metavar='<float>', type=float, default=0.5, show_default=True,
               help="Min expression of gene in exp file1, if some one's expression is less than specified value in all samples, then filter out.")
@@ -66,19 +65,45 @@ def main(exp_matrix_file1: Union[str, TextIOWrapper],
 @click.option('-p', '--num-processing', 'num_processing',
               metavar='<int>', type=int, default=10, show_default=True,
               help='Number of processing.')
+@click.option('-m', '--method', 'method',
+              type=click.Choice(['pearson', 'spearman', 'kendall']), default='pearson', show_default=True,
+              help='Correlation method.')
+@click.option('-c', '--covariate-file', 'covariate_file',
+              metavar='<file>', type=click.File('r'),
+              help='Input covariate matrix file (one covariate per row, same samples as exp files, header must start with "Geneid"). '
+                   'If specified, calculate partial correlation controlling for these covariates. (not supported by kendall)')
+@click.option('-b', '--block-size', 'block_size',
+              metavar='<int>', type=int, default=512, show_default=True,
+              help='Number of genes in exp file1 calculated against all genes in exp file2 per matrix multiplication.')
+@click.option('-r', '--min-abs-r', 'min_abs_r',
+              metavar='<float>', type=click.FloatRange(0, 1),
+              help='Only output gene pairs whose absolute correlation coefficient is not less than specified value.')
+@click.option('-P', '--max-p', 'max_p',
+              metavar='<float>', type=click.FloatRange(0, 1),
+              help='Only output gene pairs whose p value is not greater than specified value.')
+@click.option('-k', '--top-k-per-gene', 'top_k',
+              metavar='<int>', type=click.IntRange(min=1),
+              help='Only output the top k gene pairs with the highest absolute correlation coefficient for each gene in exp file1.')
 @click.option('-o', '--output-file', 'output_file',
               metavar='<file|stdout>', type=click.File('w'),
               help='Output file, stdout by default.')
 @click.option('-V', '--version', 'version', help='Show author and version information.',
               is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
-def run(exp_file1, exp_file2, min_exp1, min_exp2, num_processing, output_file):
-    """Calculation of Pearson correlation coefficient from gene expression."""
+def run(exp_file1, exp_file2, min_exp1, min_exp2, num_processing, method, covariate_file,
+        block_size, min_abs_r, max_p, top_k, output_file):
+    """Calculation of Pearson, Spearman or Kendall (partial) correlation coefficient from gene expression."""
     main(
         exp_matrix_file1=exp_file1,
         exp_matrix_file2=exp_file2,
         min_exp1=min_exp1,
         min_exp2=min_exp2,
         num_processing=num_processing,
+        method=method,
+        covariate_file=covariate_file,
+        block_size=block_size,
+        min_abs_r=min_abs_r,
+        max_p=max_p,
+        top_k=top_k,
         output_file=output_file
     )
 
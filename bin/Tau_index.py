@@ -7,7 +7,8 @@ Author: xuwenlin
 E-mail: wenlinxu.njfu@outlook.com
 """
 import click
-from pybioinformatic import read_in_gene_expression_as_dataframe, Displayer
+from pybioinformatic import Displayer
+from expression_lib import read_in_gene_expression_as_dataframe
 displayer = Displayer(__file__.split('/')[-1], version='0.1.0')
 
 
@@ -29,7 +30,7 @@ def main(exp_file: str, out_file_prefix: str):
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
 @click.option('-i', '--expression_file', 'expression_file',
               metavar='<exp file>', required=True,
-              help='Input gene expression profile file. (support format: txt, xls, xlsx, and csv)')
+              help='Input gene expression profile file. (support format: txt, xls, xlsx, csv, and binary matrix from "file_format_conversion exp2bin")')
 @click.option('-o', '--output_prefix', 'output_prefix',
               metavar='<str>', default='Tau_index', show_default=True,
               help='Output file prefix.')
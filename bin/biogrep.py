@@ -7,64 +7,206 @@ Author: xuwenlin
 E-mail: wenlinxu.njfu@outlook.com
 """
 from io import TextIOWrapper
-from re import sub
+from collections import defaultdict, deque
+from re import compile
+from typing import Iterable, Tuple, Union
+import numpy as np
 import click
 from pybioinformatic import Displayer
-displayer = Displayer(__file__.split('/')[-1], version='0.1.0')
+from file_io_lib import open_input, map_line_batches
+displayer = Displayer(__file__.split('/')[-1], version='0.4.1')
+
+MULTI_SPACE = compile(r' {2,}')
+BATCH_SIZE = 100000
+
+# Bait matcher and options shared with worker processes.
+_shared = {}
+
+
+def get_key(line: str, columns: Tuple[int, ...]) -> Union[str, Tuple[str, ...]]:
+    """Get the field of a column, or the tuple of fields of several columns (composite key)."""
+    if '  ' in line:
+        line = MULTI_SPACE.sub('\t', line)
+    fields = line.split('\t')
+    if len(columns) == 1:
+        return fields[columns[0] - 1].strip()
+    return tuple(fields[column - 1].strip() for column in columns)
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton telling whether any of the patterns occurs in a text in O(len(text))."""
+    # Transitions are kept in one flat dict keyed by (state << 21 | code point) instead of one dict per state.
+    SHIFT = 21
+
+    def __init__(self, patterns: Iterable[str]):
+        self.goto = {}
+        self.fail = [0]
+        self.hit = [False]
+        for pattern in patterns:
+            state = 0
+            for char in pattern:
+                key = state << self.SHIFT | ord(char)
+                next_state = self.goto.get(key)
+                if next_state is None:
+                    next_state = len(self.fail)
+                    self.goto[key] = next_state
+                    self.fail.append(0)
+                    self.hit.append(False)
+                state = next_state
+            self.hit[state] = True
+        children = defaultdict(list)
+        for key, child in self.goto.items():
+            children[key >> self.SHIFT].append((key & ((1 << self.SHIFT) - 1), child))
+        queue = deque(child for _, child in children[0])
+        while queue:
+            state = queue.popleft()
+            for code, child in children[state]:
+                fail = self.fail[state]
+                while fail and (fail << self.SHIFT | code) not in self.goto:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto.get(fail << self.SHIFT | code, 0)
+                self.hit[child] = self.hit[child] or self.hit[self.fail[child]]
+                queue.append(child)
+
+    def search(self, text: str) -> bool:
+        goto, fail, hit, shift = self.goto, self.fail, self.hit, self.SHIFT
+        state = 0
+        if hit[state]:
+            return True
+        for char in text:
+            code = ord(char)
+            while True:
+                next_state = goto.get(state << shift | code)
+                if next_state is not None:
+                    state = next_state
+                    break
+                if not state:
+                    break
+                state = fail[state]
+            if hit[state]:
+                return True
+        return False
+
+
+class SubstringIndex:
+    """Suffix array over all texts telling whether a query is a substring of any of them in O(len(query) * log(N))."""
+    def __init__(self, texts: Iterable[str]):
+        texts = list(texts)
+        # Texts are joined with a separator that never occurs in a stripped table field.
+        self.text = '\n'.join(texts)
+        self.empty = not texts
+        self.suffix_array = self.build_suffix_array(self.text).tolist()
+
+    @staticmethod
+    def build_suffix_array(text: str) -> np.ndarray:
+        """Prefix doubling, O(N * log(N) ^ 2) in vectorized numpy."""
+        rank = np.frombuffer(text.encode('utf-32-le'), dtype='<u4').astype(np.int64)
+        n, k = len(rank), 1
+        if n < 2:
+            return np.arange(n)
+        while True:
+            second = np.full(n, -1, dtype=np.int64)
+            second[:n - k] = rank[k:]
+            suffix_array = np.lexsort((second, rank))
+            first, second = rank[suffix_array], second[suffix_array]
+            new_rank = np.empty(n, dtype=np.int64)
+            new_rank[suffix_array] = np.r_[0, np.cumsum((first[1:] != first[:-1]) | (second[1:] != second[:-1]))]
+            rank = new_rank
+            if rank[suffix_array[-1]] == n - 1 or k >= n:
+                return suffix_array
+            k *= 2
+
+    def contains(self, query: str) -> bool:
+        if self.empty:
+            return False
+        text, suffix_array, length = self.text, self.suffix_array, len(query)
+        low, high = 0, len(suffix_array)
+        while low < high:
+            mid = (low + high) // 2
+            start = suffix_array[mid]
+            if text[start:start + length] < query:
+                low = mid + 1
+            else:
+                high = mid
+        if low == len(suffix_array):
+            return False
+        start = suffix_array[low]
+        return text[start:start + length] == query
+
+
+def scan_lines(lines: Iterable[str]) -> str:
+    """Return selected lines of a batch as one string, so that output is written in large blocks."""
+    is_hit, fish_columns, invert_match = _shared['is_hit'], _shared['fish_columns'], _shared['invert_match']
+    return ''.join(
+        f'{line.strip()}\n'
+        for line in lines
+        if line.strip() and is_hit(get_key(line, fish_columns)) != invert_match
+    )
 
 
 def main(bait_file: TextIOWrapper,
          fish_file: TextIOWrapper,
-         bait_column: int,
-         fish_column: int,
+         bait_column: Union[int, str],
+         fish_column: Union[int, str],
          match: bool,
          invert_match: bool,
-         output_file: TextIOWrapper):
-    baits = set(sub(r' {2,}', '\t', line).split('\t')[bait_column - 1].strip()
-                for line in bait_file if line.strip())
-    for line in fish_file:
-        if line.strip():
-            fish = sub(r' {2,}', '\t', line).split('\t')[fish_column - 1].strip()
-            if match and not invert_match and (fish in baits):
-                click.echo(line.strip(), output_file)
-            elif match and invert_match and (fish not in baits):
-                click.echo(line.strip(), output_file)
-            elif not match and not invert_match:
-                for bait in baits:
-                    if (bait in fish) or (fish in bait):
-                        click.echo(line.strip(), output_file)
-            elif not match and invert_match:
-                for bait in baits:
-                    if (bait not in fish) and (fish not in bait):
-                        click.echo(line.strip(), output_file)
+         output_file: TextIOWrapper,
+         num_threads: int = 1):
+    bait_columns = tuple(int(i) for i in str(bait_column).split(','))
+    fish_columns = tuple(int(i) for i in str(fish_column).split(','))
+    if len(bait_columns) != len(fish_columns):
+        click.echo('\033[31mError: Bait column and fish column must have the same number of columns.\033[0m', err=True)
+        exit()
+    if not match and len(bait_columns) > 1:
+        click.echo('\033[31mError: Composite key (multiple columns) only supports match mode.\033[0m', err=True)
+        exit()
+    bait_file = '-' if bait_file.name == '<stdin>' else bait_file.name
+    fish_file = '-' if fish_file.name == '<stdin>' else fish_file.name
+    with open_input(bait_file) as f:
+        baits = {get_key(line, bait_columns) for line in f if line.strip()}
+    if match:
+        is_hit = baits.__contains__
+    else:
+        # bait in fish: one automaton pass over fish; fish in bait: binary search over bait suffixes.
+        automaton, index = AhoCorasick(baits), SubstringIndex(baits)
+        is_hit = lambda fish: automaton.search(fish) or index.contains(fish)
+    # Workers are forked after the baits are indexed, so they share them copy-on-write without pickling.
+    _shared.update(is_hit=is_hit, fish_columns=fish_columns, invert_match=invert_match)
+    output_file = output_file or click.get_text_stream('stdout')
+    for content in map_line_batches(fish_file, scan_lines, num_threads, BATCH_SIZE):
+        output_file.write(content)
+    output_file.flush()
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
 @click.option('-b', '--bait-file', 'bait_file',
               metavar='<file|stdin>', type=click.File('r'), required=True,
-              help='Input bait file.')
+              help='Input bait file. (support gzip and bgzip compressed file)')
 @click.option('-f', '--fish-file', 'fish_file',
               metavar='<file|stdin>', type=click.File('r'), required=True,
-              help='Input fish file.')
+              help='Input fish file. (support gzip and bgzip compressed file)')
 @click.option('-bc', '--bait-column', 'bait_column',
-              metavar='<int>', type=int, default=1, show_default=True,
-              help='Column of bait file that used to match the fish file.')
+              metavar='<int|int,int...>', default='1', show_default=True,
+              help='Column(s) of bait file that used to match the fish file. Multiple columns separated by comma form a composite key.')
 @click.option('-fc', '--fish-column', 'fish_column',
-              metavar='<int>', type=int, default=1, show_default=True,
-              help='Column of fish file that used to match the bait file.')
+              metavar='<int|int,int...>', default='1', show_default=True,
+              help='Column(s) of fish file that used to match the bait file, must correspond to bait columns.')
 @click.option('--match/--contain', default=True, show_default=True,
-              help='Match mode.')
+              help='Match mode. (match: fish column equals bait; contain: fish column contains bait or is contained in bait)')
 @click.option('-v', '--invert-match', 'invert_match',
               is_flag=True, flag_value=True,
               help='Select non-matching lines.')
+@click.option('-t', '--threads', 'num_threads',
+              metavar='<int>', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Number of processes scanning the fish file in parallel, also used to decompress gzip input. (output order is kept)')
 @click.option('-o', '--output-file', 'output_file',
               metavar='<file|stdout>', type=click.File('w'),
               help='Output file, stdout by default.')
 @click.option('-V', '--version', 'version', help='Show author and version information.',
               is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
-def run(bait_file, fish_file, bait_column, fish_column, match, invert_match, output_file):
+def run(bait_file, fish_file, bait_column, fish_column, match, invert_match, num_threads, output_file):
     """This program works just like fishing, it helps you to get things that you wanted from a target file."""
-    main(bait_file, fish_file, bait_column, fish_column, match, invert_match, output_file)
+    main(bait_file, fish_file, bait_column, fish_column, match, invert_match, output_file, num_threads)
 
 
 if __name__ == '__main__':
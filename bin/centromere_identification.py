@@ -15,8 +15,9 @@ from yaml import safe_load
 from schema import Schema, And, Use, SchemaError
 import click
 from pybioinformatic import check_cmds, parse_sample_info, build_ref_index, Macs2PeakCalling, Displayer
+from exec_cmds_lib import Pipeline
 
-displayer = Displayer(__file__.split('/')[-1], version='0.2.0')
+displayer = Displayer(__file__.split('/')[-1], version='0.3.1')
 
 
 def check_config(yaml_file: TextIOWrapper):
@@ -91,6 +92,9 @@ def main(config_file: Union[TextIOWrapper, str]):
 
     # commands path
     exec_cmds = which('exec_cmds')
+    exec_dag = which('exec_dag')
+    if not exec_dag:
+        raise click.ClickException('exec_dag: command not found, add the bin directory of this package to PATH.')
     macs2_helper = which('macs2_helper')
 
     makedirs(f'{output_path}/shell/samples', exist_ok=True)
@@ -145,8 +149,22 @@ def main(config_file: Union[TextIOWrapper, str]):
         o.write(f'{exec_cmds} -f {output_path}/shell/All_samples.sh -n {num_processing}')
 
     system(f'chmod 755 {output_path}/shell/All_step.sh')
+
+    # Write dependency graph, samples are independent steps
+    pipeline = Pipeline()
+    for sample_name, fq_list in sample_info_dict.items():
+        pipeline.add_step(
+            sample_name,
+            f'sh {output_path}/shell/samples/{sample_name}.sh',
+            inputs=[i for i in fq_list[:5] if i],
+            outputs=[f'{output_path}/03.peaks/{sample_name}/{sample_name}_peaks.xls'],
+            threads=num_threads
+        )
+    pipeline.write(f'{output_path}/shell/All_step.json')
     click.echo(
-        message=f'\033[32mCommands created successfully, please run "bash {output_path}/shell/All_step.sh".\033[0m',
+        message=f'\033[32mCommands created successfully, please run "bash {output_path}/shell/All_step.sh", '
+                f'or "{exec_dag} -d {output_path}/shell/All_step.json -n {num_processing}" '
+                f'to skip samples that are up to date.\033[0m',
         err=True
     )
 
@@ -7,36 +7,192 @@ Author: xuwenlin
 E-mail: wenlinxu.njfu@outlook.com
 """
 from io import TextIOWrapper
+from contextlib import nullcontext
 from datetime import datetime
 import click
-from pybioinformatic import TaskManager, Displayer
-displayer = Displayer(__file__.split('/')[-1], version='0.2.0')
+from pybioinformatic import Displayer
+from exec_cmds_lib import (
+    Journal, Scheduler, AsyncRunner, max_concurrent_jobs, Profiler, JobOutput, WorkQueue, Worker, ResultCache, parse_memory, parse_command_file
+)
+displayer = Displayer(__file__.split('/')[-1], version='0.9.2')
 
 
-def main(command_file: TextIOWrapper, num_processing: int):
+def main(command_file: TextIOWrapper,
+         num_processing: int,
+         journal_file: str = None,
+         resume: bool = False,
+         retry: int = 0,
+         cpus: int = None,
+         mem: str = None,
+         profile_prefix: str = None,
+         log_dir: str = None,
+         log_file: str = None,
+         log_size: str = None,
+         engine: str = 'process',
+         cache: ResultCache = None):
     start_time = datetime.now().replace(microsecond=0)
-    cmds = [line.strip() for line in command_file if line.strip() and not line.startswith('#')]
-    tkm = TaskManager(commands=cmds, num_processing=num_processing)
-    rets = tkm.parallel_run_cmd()
-    for ret in rets:
-        if ret.get():
-            click.echo(ret.get(), err=True)
+    jobs = parse_command_file(command_file)
+    profiler = Profiler() if profile_prefix else None
+    # Command states are only recorded when a journal file is given, nothing is written next to the command file.
+    with Journal(journal_file) if journal_file else nullcontext() as journal:
+        if resume:
+            completed = journal.completed()
+            skipped = [job for job in jobs if job.key in completed]
+            jobs = [job for job in jobs if job.key not in completed]
+            click.echo(f'[{datetime.now().replace(microsecond=0)}] Skip {len(skipped)} completed commands.', err=True)
+        output = JobOutput(log_dir, log_file, parse_memory(log_size) if log_size else 0)
+        if engine == 'async':
+            runner = AsyncRunner(jobs, num_processing, journal, retry, output)
+            failed = runner.run()
+        else:
+            scheduler = Scheduler(jobs, num_processing, cpus, parse_memory(mem) if mem else None, journal, retry,
+                                  up_to_date=cache.restore if cache else None,
+                                  on_success=cache.store if cache else None,
+                                  profiler=profiler, output=output)
+            try:
+                failed = scheduler.run()
+            finally:
+                if profiler:
+                    profiler.write(profile_prefix)
     end_time = datetime.now().replace(microsecond=0)
-    click.echo(f'[{datetime.now().replace(microsecond=0)}] Total time spent {end_time - start_time}.', err=True)
+    if engine == 'async':
+        click.echo(f'[{datetime.now().replace(microsecond=0)}] Total time spent {end_time - start_time}, '
+                   f'{len(jobs)} commands ({runner.throughput:.1f} commands/s).', err=True)
+    elif profiler:
+        click.echo(f'[{datetime.now().replace(microsecond=0)}] Total time spent {end_time - start_time}, '
+                   f'resource usage of each command is in {profile_prefix}.tsv and {profile_prefix}.trace.json.',
+                   err=True)
+    else:
+        click.echo(f'[{datetime.now().replace(microsecond=0)}] Total time spent {end_time - start_time}.', err=True)
+    if failed:
+        hint = f', see {journal_file} and rerun with --resume' if journal_file else ', rerun with -j <file> to resume later'
+        click.echo(f'\033[31m{len(failed)} commands failed{hint}.\033[0m', err=True)
+        exit(1)
+
+
+def queue_main(command_file: TextIOWrapper,
+               queue_file: str,
+               num_processing: int,
+               retry: int = 0,
+               resume: bool = False,
+               lease: int = 300,
+               output: JobOutput = None):
+    """
+    Serve commands through work queue on shared filesystem. With command file this process is the coordinator:
+    it submits the commands, works on them like any other worker and waits until all of them finished.
+    Without command file it is a worker that pulls commands until the queue is finished.
+    """
+    start_time = datetime.now().replace(microsecond=0)
+    with WorkQueue(queue_file) as queue:
+        if command_file:
+            num_submitted = queue.submit(parse_command_file(command_file), retry, resume)
+            click.echo(f'[{datetime.now().replace(microsecond=0)}] Submit {num_submitted} commands to {queue_file}, '
+                       f'start workers on other nodes with "exec_cmds -q {queue_file} -w -n <int>".', err=True)
+        worker = Worker(queue, num_processing, lease, output)
+        num_done = worker.run()
+        end_time = datetime.now().replace(microsecond=0)
+        click.echo(f'[{datetime.now().replace(microsecond=0)}] Total time spent {end_time - start_time}, '
+                   f'{num_done} commands run by {worker.name}.', err=True)
+        if command_file:
+            failed = queue.failed()
+            for task_id, command, exit_code in failed:
+                click.echo(f'\033[31mError: job {task_id} failed with exit code {exit_code}: {command}\033[0m', err=True)
+            if failed:
+                click.echo(f'\033[31m{len(failed)} commands failed, rerun with --resume.\033[0m', err=True)
+                exit(1)
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
 @click.option('-f', '--command-file', 'command_file',
-              metavar='<file|stdin>', type=click.File('r'), required=True,
-              help='Input file including command (one command per line).')
+              metavar='<file|stdin>', type=click.File('r'),
+              help='Input file including command (one command per line). '
+                   'Annotation like "#@threads=16 mem=32G" on its own line (applies to the next command) '
+                   'or at the end of a command line sets the resources the command needs. [default: threads=1 mem=0]')
 @click.option('-n', '--num-processing', 'num_processing',
-              metavar='<int>', type=int, default=1, show_default=True,
-              help='Number of processing.')
+              metavar='<int>', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Max number of commands running at the same time.')
+@click.option('-e', '--engine', 'engine',
+              type=click.Choice(['process', 'async']), default='process', show_default=True,
+              help='process: resource-aware scheduler with per-command profile; '
+                   'async: asyncio subprocesses for many short commands, only -n limits concurrency '
+                   '(-c, -m, resource annotations and -p are ignored).')
+@click.option('-c', '--cpus', 'cpus',
+              metavar='<int>', type=click.IntRange(min=1),
+              help='Total threads of running commands. [default: number of CPUs]')
+@click.option('-m', '--mem', 'mem',
+              metavar='<size>',
+              help='Total memory of running commands (eg. 256G). [default: physical memory]')
+@click.option('-r', '--retry', 'retry',
+              metavar='<int>', type=click.IntRange(min=0), default=0, show_default=True,
+              help='Number of retries of failed command.')
+@click.option('-j', '--journal', 'journal_file',
+              metavar='<file>',
+              help='SQLite journal of command states, needed by --resume. [default: no journal]')
+@click.option('-p', '--profile', 'profile_prefix',
+              metavar='<str>',
+              help='Output prefix of per-command wall time, CPU time and peak memory, written as TSV '
+                   '(<prefix>.tsv) and Chrome trace timeline (<prefix>.trace.json, open with ui.perfetto.dev). '
+                   '[default: no profile]')
+@click.option('-l', '--log-dir', 'log_dir',
+              metavar='<dir>',
+              help='Write stdout and stderr of each command to <dir>/job_<num>.out and .err. '
+                   '[default: print them to terminal with job number prefix]')
+@click.option('-L', '--log-file', 'log_file',
+              metavar='<file>',
+              help='Write stdout and stderr of all commands to one file, each line prefixed with job number.')
+@click.option('--log-size', 'log_size',
+              metavar='<size>',
+              help='Rotate per-job log files larger than this size (eg. 1G), keeping 3 old files.')
+@click.option('--cache-dir', 'cache_dir',
+              metavar='<dir>',
+              help='Cache outputs of commands that declare them ("#@inputs=r1.fq,r2.fq outputs=a.bam"), '
+                   'a command is skipped and its outputs are hard linked from cache if the same command '
+                   'ran on the same inputs before. Cached outputs are read-only.')
+@click.option('--cache-size', 'cache_size',
+              metavar='<size>',
+              help='Max total size of cache (eg. 500G), least recently used entries are evicted. [default: no limit]')
+@click.option('--cache-key', 'cache_key',
+              type=click.Choice(['content', 'mtime']), default='content', show_default=True,
+              help='Identify input files by content hash, or by size and modification time (faster).')
+@click.option('-q', '--queue', 'queue_file',
+              metavar='<file>',
+              help='Work queue (SQLite file on filesystem shared by all nodes). With -f, submit commands to the queue '
+                   'and run them together with workers started on other nodes by -w.')
+@click.option('-w', '--worker', 'worker', is_flag=True, flag_value=True,
+              help='Run as worker of the queue specified by -q, pulling commands until all of them finished.')
+@click.option('--lease', 'lease',
+              metavar='<int>', type=click.IntRange(min=10), default=300, show_default=True,
+              help='Seconds a queued command stays with a worker that stopped renewing it (eg. dead node) '
+                   'before it is given to another worker.')
+@click.option('--resume', 'resume', is_flag=True, flag_value=True,
+              help='Skip commands that completed successfully according to the journal (or the queue with -q).')
 @click.option('-V', '--version', 'version', help='Show author and version information.',
               is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
-def run(command_file, num_processing):
+def run(command_file, num_processing, engine, cpus, mem, retry, journal_file, profile_prefix, log_dir, log_file,
+        log_size, cache_dir, cache_size, cache_key, queue_file, worker, lease, resume):
     """Execute commands asynchronously."""
-    main(command_file, num_processing)
+    if log_dir and log_file:
+        raise click.UsageError('-l and -L can not be specified at the same time.')
+    if worker and (not queue_file or command_file):
+        raise click.UsageError('-w needs -q and no -f.')
+    if not worker and not command_file:
+        raise click.UsageError('Missing option "-f" / "--command-file".')
+    if resume and not (journal_file or queue_file):
+        raise click.UsageError('--resume needs the journal of the earlier run (-j) or a queue (-q).')
+    if cache_dir and (engine == 'async' or queue_file):
+        raise click.UsageError('--cache-dir only works with the default process engine and without -q.')
+    if queue_file:
+        output = JobOutput(log_dir, log_file, parse_memory(log_size) if log_size else 0)
+        queue_main(command_file, queue_file, num_processing, retry, resume, lease, output)
+        return
+    if engine == 'async':
+        max_jobs = max_concurrent_jobs(bool(log_dir))
+        if num_processing > max_jobs:
+            raise click.UsageError(f'-n {num_processing} exceeds the {max_jobs} commands that can run at the same time '
+                                   f'under the open file limit, lower -n or raise the hard limit (ulimit -Hn).')
+    cache = ResultCache(cache_dir, parse_memory(cache_size) if cache_size else 0, cache_key) if cache_dir else None
+    main(command_file, num_processing, journal_file, resume, retry, cpus, mem, profile_prefix,
+         log_dir, log_file, log_size, engine, cache)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+File: exec_dag.py
+Description: Execute pipeline steps concurrently according to the dependency graph of their inputs and outputs.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from contextlib import nullcontext
+from datetime import datetime
+import click
+from pybioinformatic import Displayer
+from exec_cmds_lib import Journal, Scheduler, Profiler, Pipeline, MakeStyleChecker, step_graph, parse_memory
+displayer = Displayer(__file__.split('/')[-1], version='0.3.1')
+
+
+def main(dag_file: str,
+         num_processing: int,
+         cpus: int = None,
+         mem: str = None,
+         retry: int = 0,
+         journal_file: str = None,
+         force: bool = False,
+         dry_run: bool = False,
+         profile_prefix: str = None):
+    pipeline = Pipeline.load(dag_file)
+    checker = MakeStyleChecker(pipeline, dag_file, force)
+    if dry_run:
+        for name, dependencies in step_graph(pipeline).items():
+            click.echo(f'{name}\t{",".join(dependencies) or "-"}')
+        return
+    start_time = datetime.now().replace(microsecond=0)
+    profiler = Profiler() if profile_prefix else None
+    with Journal(journal_file) if journal_file else nullcontext() as journal:
+        scheduler = Scheduler(
+            jobs=pipeline.jobs(),
+            num_processing=num_processing,
+            cpus=cpus,
+            mem=parse_memory(mem) if mem else None,
+            journal=journal,
+            retry=retry,
+            up_to_date=checker.up_to_date,
+            on_success=checker.on_success,
+            profiler=profiler
+        )
+        try:
+            failed = scheduler.run()
+        finally:
+            if profiler:
+                profiler.write(profile_prefix)
+    end_time = datetime.now().replace(microsecond=0)
+    usage = f', resource usage of each step is in {profile_prefix}.tsv and {profile_prefix}.trace.json' \
+        if profiler else ''
+    click.echo(f'[{datetime.now().replace(microsecond=0)}] Total time spent {end_time - start_time}{usage}.', err=True)
+    if failed:
+        names = ', '.join(pipeline.steps[job.index]['name'] for job in failed)
+        click.echo(f'\033[31m{len(failed)} steps failed or not run: {names}.\033[0m', err=True)
+        exit(1)
+
+
+@click.command(context_settings=dict(help_option_names=['-h', '--help']))
+@click.option('-d', '--dag-file', 'dag_file',
+              metavar='<json|yaml file>', required=True,
+              help='Pipeline steps with inputs and outputs (eg. shell/All_step.json written by pipelines).')
+@click.option('-n', '--num-processing', 'num_processing',
+              metavar='<int>', type=click.IntRange(min=1), default=4, show_default=True,
+              help='Max number of steps running at the same time.')
+@click.option('-c', '--cpus', 'cpus',
+              metavar='<int>', type=click.IntRange(min=1),
+              help='Total threads of running steps. [default: number of CPUs]')
+@click.option('-m', '--mem', 'mem',
+              metavar='<size>',
+              help='Total memory of running steps (eg. 256G). [default: physical memory]')
+@click.option('-r', '--retry', 'retry',
+              metavar='<int>', type=click.IntRange(min=0), default=0, show_default=True,
+              help='Number of retries of failed step.')
+@click.option('-j', '--journal', 'journal_file',
+              metavar='<file>',
+              help='SQLite journal of step states. [default: no journal]')
+@click.option('-p', '--profile', 'profile_prefix',
+              metavar='<str>',
+              help='Output prefix of per-step wall time, CPU time and peak memory (<prefix>.tsv and '
+                   '<prefix>.trace.json). [default: no profile]')
+@click.option('-F', '--force', 'force', is_flag=True, flag_value=True,
+              help='Run all steps even if their outputs are up to date.')
+@click.option('--dry-run', 'dry_run', is_flag=True, flag_value=True,
+              help='Only print each step and the steps it depends on.')
+@click.option('-V', '--version', 'version', help='Show author and version information.',
+              is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
+def run(dag_file, num_processing, cpus, mem, retry, journal_file, profile_prefix, force, dry_run):
+    """Execute pipeline steps concurrently according to the dependency graph of their inputs and outputs."""
+    main(dag_file, num_processing, cpus, mem, retry, journal_file, force, dry_run, profile_prefix)
+
+
+if __name__ == '__main__':
+    run()
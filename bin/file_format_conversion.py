@@ -7,7 +7,7 @@ Author: xuwenlin
 E-mail: wenlinxu.njfu@outlook.com
 """
 import click
-from file_format_conversion_lib import fq2fa, vcf2gt, embl2fa, __version__
+from file_format_conversion_lib import fq2fa, vcf2gt, embl2fa, exp2bin, __version__
 from pybioinformatic import Displayer
 displayer = Displayer(__file__.split('/')[-1], version=__version__)
 
@@ -23,6 +23,7 @@ def file_format_conversion():
 file_format_conversion.add_command(fq2fa, 'fq2fa')
 file_format_conversion.add_command(vcf2gt, 'vcf2gt')
 file_format_conversion.add_command(embl2fa, 'embl2fa')
+file_format_conversion.add_command(exp2bin, 'exp2bin')
 
 
 if __name__ == '__main__':
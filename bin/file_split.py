@@ -7,59 +7,162 @@ Author: xuwenlin
 E-mail: wenlinxu.njfu@outlook.com
 """
 from os import makedirs
+from importlib.util import find_spec
 from io import TextIOWrapper
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice, chain, groupby
+from typing import Iterator, Iterable, Callable, Tuple, BinaryIO
 import click
 from pybioinformatic import Displayer
-displayer = Displayer(__file__.split('/')[-1], version='0.2.0')
+from file_io_lib import COMPRESS_SUFFIX, open_output
+displayer = Displayer(__file__.split('/')[-1], version='0.5.2')
+
+BUFFER_SIZE = 16 << 20
+SIZE_UNITS = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def parse_size(size: str) -> int:
+    """Parse human readable size (eg. 500M, 2G, 1024) as bytes."""
+    size = size.strip().upper().rstrip('B')
+    if size and size[-1] in SIZE_UNITS:
+        return int(float(size[:-1]) * SIZE_UNITS[size[-1]])
+    return int(size)
+
+
+def read_header(stream: BinaryIO, header: bool, header_line_num: int) -> Tuple[bytes, Iterator[bytes]]:
+    """
+    Read header lines, VCF meta-information and header lines are always taken as header.
+    :return: tuple(header content, line iterator of the remaining content)
+    """
+    header_lines = list(islice(stream, header_line_num)) if header else []
+    first_line = stream.readline()
+    if not header and first_line.startswith(b'##fileformat=VCF'):
+        while first_line.startswith(b'#'):
+            header_lines.append(first_line)
+            first_line = stream.readline()
+    return b''.join(header_lines), chain([first_line] if first_line else [], stream)
+
+
+def fasta_records(lines: Iterator[bytes]) -> Iterator[bytes]:
+    record = []
+    for line in lines:
+        if line.startswith(b'>') and record:
+            yield b''.join(record)
+            record = []
+        record.append(line)
+    if record:
+        yield b''.join(record)
+
+
+def fastq_records(lines: Iterator[bytes]) -> Iterator[bytes]:
+    return iter(lambda: b''.join(islice(lines, 4)), b'')
+
+
+def is_fastq(head: list) -> bool:
+    """Whether the first four lines form a FASTQ record ("@" header, "+" line and quality as long as sequence)."""
+    return len(head) == 4 and head[0].startswith(b'@') and head[2].startswith(b'+') and \
+        len(head[1].rstrip(b'\r\n')) == len(head[3].rstrip(b'\r\n'))
+
+
+def iter_records(lines: Iterator[bytes]) -> Tuple[str, Iterator[bytes]]:
+    """
+    Detect FASTA format from the first line and FASTQ from the layout of the first record,
+    other files (eg. SAM, whose header lines also start with "@") are split by lines.
+    """
+    head = list(islice(lines, 4))
+    lines = chain(head, lines)
+    if head and head[0].startswith(b'>'):
+        return 'fasta', fasta_records(lines)
+    if is_fastq(head):
+        return 'fastq', fastq_records(lines)
+    return 'text', lines
+
+
+def sequence_length(record: bytes, file_format: str) -> int:
+    """Sequence length of FASTA/FASTQ record, or byte size of other records."""
+    if file_format == 'fasta':
+        return sum(len(line.strip()) for line in record.split(b'\n')[1:])
+    if file_format == 'fastq':
+        return len(record.split(b'\n')[1].strip())
+    return len(record)
+
+
+def group_by_count(records: Iterator[bytes], num: int) -> Iterator[Iterable[bytes]]:
+    for first_record in records:
+        yield chain([first_record], islice(records, num - 1))
+
+
+def group_by_key(records: Iterator[bytes], key: Callable[[bytes], int]) -> Iterator[Iterable[bytes]]:
+    return (group for _, group in groupby(records, key))
+
+
+def size_key(max_size: int) -> Callable[[bytes], int]:
+    """Start a new part before a record that would make the current part exceed max_size."""
+    state = {'part': 0, 'size': 0}
+
+    def key(record: bytes) -> int:
+        if state['size'] and state['size'] + len(record) > max_size:
+            state['part'] += 1
+            state['size'] = 0
+        state['size'] += len(record)
+        return state['part']
+    return key
+
+
+def balance_key(total_length: int, num_parts: int, file_format: str) -> Callable[[bytes], int]:
+    """Assign each record to the part that contains the midpoint of the record on the cumulative length axis."""
+    state = {'length': 0}
+
+    def key(record: bytes) -> int:
+        length = sequence_length(record, file_format)
+        midpoint = state['length'] + length / 2
+        state['length'] += length
+        return min(int(midpoint * num_parts / max(total_length, 1)), num_parts - 1)
+    return key
 
 
 def main(input_file: TextIOWrapper,
          sub_file_line_num: int,
          output_dir: str,
          header: bool,
-         header_line_num: int):
+         header_line_num: int,
+         num_records: int = None,
+         max_size: str = None,
+         num_parts: int = None,
+         compress: str = None,
+         num_threads: int = 4):
     makedirs(output_dir, exist_ok=True)
-    line_count, subfile_num = 0, 1
-    header_content = content = ''
+    # Stream raw bytes in a single pass (two passes for --n-parts), only the header is kept in memory.
     if input_file.name == '<stdin>':
-        input_file = click.open_file('-').readlines()
-        line_num = sum(1 for _ in input_file)
+        if num_parts:
+            click.echo('\033[31mError: --n-parts needs a regular input file, stdin is not supported.\033[0m', err=True)
+            exit()
+        stream = click.get_binary_stream('stdin')
         output_prefix = ''
     else:
-        line_num = sum(1 for _ in input_file)
-        input_file.seek(0)
+        stream = open(input_file.name, 'rb')
         output_prefix = f"{input_file.name.split('/')[-1]}."
-    for line in input_file:
-        line_count += 1
-        if header:
-            if line_count == line_num:
-                content += line
-                with open(f"{output_dir}/{output_prefix}part{subfile_num}", 'w') as o:
-                    o.write(header_content + content)
-            elif line_count <= header_line_num:
-                header_content += line
-            else:
-                if (line_count - header_line_num) % sub_file_line_num != 0:
-                    content += line
-                else:
-                    content += line
-                    with open(f"{output_dir}/{output_prefix}part{subfile_num}", 'w') as o:
-                        o.write(header_content + content)
-                    content = ''
-                    subfile_num += 1
+    # Compression runs in the thread pool, the reader only waits when too many blocks are pending.
+    suffix = COMPRESS_SUFFIX.get(compress, '')
+    with stream, ThreadPoolExecutor(num_threads) as executor:
+        header_content, lines = read_header(stream, header, header_line_num)
+        if sub_file_line_num:
+            parts = group_by_count(lines, sub_file_line_num)
+        elif num_records:
+            parts = group_by_count(iter_records(lines)[1], num_records)
+        elif max_size:
+            parts = group_by_key(iter_records(lines)[1], size_key(parse_size(max_size)))
         else:
-            if line_count == line_num:
-                content += line
-                with open(f"{output_dir}/{output_prefix}part{subfile_num}", 'w') as o:
-                    o.write(content)
-            elif line_count % sub_file_line_num != 0:
-                content += line
-            else:
-                content += line
-                with open(f"{output_dir}/{output_prefix}part{subfile_num}", 'w') as o:
-                    o.write(content)
-                content = ''
-                subfile_num += 1
+            file_format, records = iter_records(lines)
+            total_length = sum(sequence_length(record, file_format) for record in records)
+            stream.seek(0)
+            file_format, records = iter_records(read_header(stream, header, header_line_num)[1])
+            parts = group_by_key(records, balance_key(total_length, num_parts, file_format))
+        for subfile_num, part in enumerate(parts, 1):
+            out_file = f"{output_dir}/{output_prefix}part{subfile_num}{suffix}"
+            with open_output(out_file, compress, executor, BUFFER_SIZE) as o:
+                o.write(header_content)
+                o.writelines(part)
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
@@ -67,21 +170,40 @@ def main(input_file: TextIOWrapper,
               metavar='<file|stdin>', type=click.File('r'), required=True,
               help='Input file.')
 @click.option('-n', '--line_num', 'line_num',
-              metavar='<int>', type=int,  required=True,
+              metavar='<int>', type=click.IntRange(min=1),
               help='The line num of each sub file, not including header.')
+@click.option('-r', '--by-records', 'num_records',
+              metavar='<int>', type=click.IntRange(min=1),
+              help='The number of records of each sub file. (FASTA and FASTQ records are kept intact, other files are split by lines)')
+@click.option('-s', '--by-size', 'max_size',
+              metavar='<size>',
+              help='Max size of each sub file without header (eg. 500M, 2G), records are never cut.')
+@click.option('-k', '--n-parts', 'num_parts',
+              metavar='<int>', type=click.IntRange(min=1),
+              help='Split into K sub files with balanced total sequence length (FASTA/FASTQ) or size (other files).')
 @click.option('-H', '--header', is_flag=True, flag_value=True,
-              help='If specified header, each sub file will contain header content.')
+              help='If specified header, each sub file will contain header content. (VCF header is always repeated)')
 @click.option('-N', '--header_num', 'header_num',
               metavar='<int>', type=int, default=1, show_default=True,
               help='If header specified, specify the number of header line.')
+@click.option('-c', '--compress', 'compress',
+              type=click.Choice(['gz', 'bgz', 'zst']),
+              help='Compress sub files with gzip, bgzip (BGZF) or zstd. (zst needs zstandard package)')
+@click.option('-t', '--threads', 'threads',
+              metavar='<int>', type=click.IntRange(min=1), default=4, show_default=True,
+              help='Number of compression threads.')
 @click.option('-o', '--output_dir', 'output_dir',
               metavar='<dir>', required=True,
               help='Output directory, if not exists, it will be created automatically.')
 @click.option('-V', '--version', 'version', help='Show author and version information.',
               is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
-def run(input_file, line_num, header, header_num, output_dir):
+def run(input_file, line_num, num_records, max_size, num_parts, header, header_num, compress, threads, output_dir):
     """Divide a large file into several smaller files."""
-    main(input_file, line_num, output_dir, header, header_num)
+    if sum(i is not None for i in (line_num, num_records, max_size, num_parts)) != 1:
+        raise click.UsageError('Exactly one of -n, -r, -s and -k must be specified.')
+    if compress == 'zst' and find_spec('zstandard') is None:
+        raise click.UsageError('-c zst needs the zstandard package, install it with "pip install zstandard".')
+    main(input_file, line_num, output_dir, header, header_num, num_records, max_size, num_parts, compress, threads)
 
 
 if __name__ == '__main__':
@@ -11,7 +11,8 @@ from os.path import abspath
 from shutil import which
 import click
 from pybioinformatic import parse_sample_info, build_ref_index, GatkSNPCalling, Displayer
-displayer = Displayer(__file__.split('/')[-1], version='1.0.1')
+from exec_cmds_lib import Pipeline
+displayer = Displayer(__file__.split('/')[-1], version='1.1.1')
 
 
 def check_dependency():
@@ -35,6 +36,9 @@ def main(genome_fasta_file: str,
          output_path: str):
     """Variation analysis pipeline of GATK."""
     check_dependency()
+    exec_dag = which('exec_dag')
+    if not exec_dag:
+        raise click.ClickException('exec_dag: command not found, add the bin directory of this package to PATH.')
     output_path = abspath(output_path)
     sample_info_dict = parse_sample_info(sample_info)
     makedirs(f'{output_path}/shell/normal', exist_ok=True)
@@ -129,8 +133,34 @@ def main(genome_fasta_file: str,
             cmds.insert(0, f'{exec_cmds} -f {output_path}/shell/build_index.sh -n 3')
         o.write('\n\n'.join(cmds))
     system(f'chmod 755 {output_path}/shell/All_step.sh')
+
+    # Write dependency graph of all steps, SNP selection, INDEL selection and GT conversion run concurrently
+    variant_path = f'{output_path}/03.variant'
+    pipeline = Pipeline()
+    if build_index:
+        pipeline.add_step('build_index', cmds[0], inputs=[genome_fasta_file], threads=3)
+    pipeline.add_step(
+        'snp_calling',
+        f'{exec_cmds} -f {output_path}/shell/run_normal.sh -n {num_processing}',
+        inputs=[genome_fasta_file, *(fq for fq_path in sample_info_dict.values() for fq in fq_path)],
+        after=['build_index'] if build_index else [],
+        threads=num_processing * num_threads
+    )
+    pipeline.add_step('combine_gvcfs', CombineGVCFs, outputs=[f'{variant_path}/cohort.gvcf.gz'], after=['snp_calling'])
+    pipeline.add_step('genotype_gvcfs', GenotypeGVCFs,
+                      inputs=[f'{variant_path}/cohort.gvcf.gz'], outputs=[f'{variant_path}/cohort.vcf.gz'])
+    pipeline.add_step('select_snp', select_snp,
+                      inputs=[f'{variant_path}/cohort.vcf.gz'], outputs=[f'{variant_path}/cohort.snp.vcf.gz'])
+    pipeline.add_step('select_indel', select_indel,
+                      inputs=[f'{variant_path}/cohort.vcf.gz'], outputs=[f'{variant_path}/cohort.indel.vcf.gz'])
+    pipeline.add_step('vcf2gt', vcf2gt, inputs=[f'{variant_path}/cohort.vcf.gz'], outputs=[f'{variant_path}/All.GT.xls'])
+    pipeline.add_step('stat_gt', stat_gt,
+                      inputs=[f'{variant_path}/All.GT.xls'], outputs=[f'{output_path}/04.stats/site_stat.xls'],
+                      threads=num_processing * num_threads)
+    pipeline.write(f'{output_path}/shell/All_step.json')
     click.echo(
-        message=f'\033[32mCommands created successfully, please run "bash {output_path}/shell/All_step.sh".\033[0m',
+        message=f'\033[32mCommands created successfully, please run "bash {output_path}/shell/All_step.sh", '
+                f'or run independent steps concurrently with "{exec_dag} -d {output_path}/shell/All_step.json".\033[0m',
         err=True
     )
 
@@ -7,13 +7,46 @@ Author: xuwenlin
 E-mail: wenlinxu.njfu@outlook.com
 """
 from io import TextIOWrapper
-from typing import Union, Literal
-from pandas import read_table
+from typing import Union, Literal, Iterator, List, Tuple
 from natsort import natsort_key
 import click
 from pybioinformatic import Displayer
+from table_join_lib import natural_key, external_sort, split_row, merge_join, partition_join
+from file_io_lib import TABLE_FORMATS, table_file_name, read_table_file, write_table_file, iter_table_lines, write_table_rows
 
-displayer = Displayer(__file__.split('/')[-1], version='0.2.0')
+displayer = Displayer(__file__.split('/')[-1], version='0.5.1')
+
+
+def sorted_rows(table: TextIOWrapper, column: int, tmp_dir: str, run_size: int) -> Tuple[List[str], Iterator[List[str]]]:
+    """Read header and externally sort the other rows of table by natural order of join column."""
+    table = iter_table_lines(table)
+    header = next(table).rstrip('\r\n').split('\t')
+    width = len(header)
+    lines = (line if line.endswith('\n') else f'{line}\n' for line in table)
+    lines = external_sort(lines, key=lambda line: natural_key(split_row(line, width)[column]), tmp_dir=tmp_dir, run_size=run_size)
+    return header, (split_row(line, width) for line in lines)
+
+
+def external_join(left_table: TextIOWrapper,
+                  right_table: TextIOWrapper,
+                  left_column: int,
+                  right_column: int,
+                  joint_method: Literal['left', 'right', 'outer', 'inner'],
+                  output_file: Union[str, TextIOWrapper],
+                  tmp_dir: str = None,
+                  run_size: int = 1000000,
+                  table_format: str = 'tsv'):
+    left_header, left_rows = sorted_rows(left_table, left_column - 1, tmp_dir, run_size)
+    right_header, right_rows = sorted_rows(right_table, right_column - 1, tmp_dir, run_size)
+    left_names = left_header[:left_column - 1] + left_header[left_column:]
+    right_names = right_header[:right_column - 1] + right_header[right_column:]
+    overlap = set(left_names) & set(right_names)
+    header = [left_header[left_column - 1]] + \
+             [f'{name}_left_table' if name in overlap else name for name in left_names] + \
+             [f'{name}_right_table' if name in overlap else name for name in right_names]
+    rows = merge_join(left_rows, right_rows, left_column - 1, right_column - 1,
+                      len(left_header), len(right_header), joint_method)
+    write_table_rows(header, rows, output_file, table_format)
 
 
 def main(left_table: Union[str, TextIOWrapper],
@@ -21,13 +54,28 @@ def main(left_table: Union[str, TextIOWrapper],
          left_column: int,
          right_column: int,
          joint_method: Literal['left', 'right', 'outer', 'inner', 'cross'],
-         output_file: TextIOWrapper):
-    left_table = read_table(left_table, index_col=left_column - 1, dtype=str)
-    right_table = read_table(right_table, index_col=right_column - 1, dtype=str)
+         output_file: TextIOWrapper,
+         external: bool = False,
+         tmp_dir: str = None,
+         run_size: int = 1000000,
+         table_format: str = 'tsv',
+         num_processing: int = 1):
+    if table_format != 'tsv':
+        output_file = table_file_name(output_file.name, table_format)
+    if external:
+        external_join(left_table, right_table, left_column, right_column, joint_method, output_file, tmp_dir, run_size,
+                      table_format)
+        return
+    left_table = read_table_file(left_table, index_col=left_column - 1, dtype=str)
+    right_table = read_table_file(right_table, index_col=right_column - 1, dtype=str)
+    if num_processing > 1:
+        header, rows = partition_join(left_table, right_table, joint_method, num_processing, tmp_dir=tmp_dir)
+        write_table_rows(header, rows, output_file, table_format)
+        return
     merge = left_table.join(other=right_table, how=joint_method, lsuffix='_left_table', rsuffix='_right_table')
     merge.sort_index(key=natsort_key, inplace=True)
     merge.drop_duplicates(inplace=True)
-    merge.to_csv(output_file, sep='\t', na_rep='NA')
+    write_table_file(merge, output_file, table_format, na_rep='NA')
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
@@ -47,20 +95,44 @@ def main(left_table: Union[str, TextIOWrapper],
               type=click.Choice(['left', 'right', 'outer', 'inner', 'cross']),
               default='left', show_default=True,
               help='How to handle the operation of the two tables.')
+@click.option('-x', '--external', 'external', is_flag=True, flag_value=True,
+              help='Sort both tables into on-disk runs and merge join them with constant memory. '
+                   '(not support cross join, only fully duplicated rows are dropped)')
+@click.option('-T', '--tmp-dir', 'tmp_dir',
+              metavar='<dir>',
+              help='Directory of temporary sorted runs (--external) or joined buckets (-n). [default: system temporary directory]')
+@click.option('-S', '--run-size', 'run_size',
+              metavar='<int>', type=click.IntRange(min=1), default=1000000, show_default=True,
+              help='Max number of lines sorted in memory for --external.')
+@click.option('-n', '--num-processing', 'num_processing',
+              metavar='<int>', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Number of processing. Tables are hash-partitioned by join key and the buckets are joined in parallel '
+                   '(only fully duplicated rows are dropped, not support cross join).')
+@click.option('-f', '--format', 'table_format',
+              type=click.Choice(TABLE_FORMATS), default='tsv', show_default=True,
+              help='Output table format, parquet and feather files replace .xls suffix. Input format is detected automatically.')
 @click.option('-o', '--output-file', 'output_file',
               metavar='<file>', type=click.File('w'), default='joint.xls', show_default=True,
               help='Output file.')
 @click.option('-V', '--version', 'version', help='Show author and version information.',
               is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
-def run(left_table, right_table, left_column, right_column, joint_method, output_file):
+def run(left_table, right_table, left_column, right_column, joint_method, external, tmp_dir, run_size, num_processing,
+        table_format, output_file):
     """Joint two table files by different ways ('left', 'right', 'outer', 'inner', or 'cross')."""
+    if (external or num_processing > 1) and joint_method == 'cross':
+        raise click.UsageError('Cross join is not supported in --external mode or with multiple processing.')
     main(
         left_table=left_table,
         right_table=right_table,
         left_column=left_column,
         right_column=right_column,
         joint_method=joint_method,
-        output_file=output_file
+        output_file=output_file,
+        external=external,
+        tmp_dir=tmp_dir,
+        run_size=run_size,
+        table_format=table_format,
+        num_processing=num_processing
     )
 
 
@@ -7,30 +7,93 @@ Author: xuwenlin
 E-mail: wenlinxu.njfu@outlook.com
 """
 from io import TextIOWrapper
-from typing import Union, Tuple, Literal
-from pandas import read_table,concat
+from os import remove
+from os.path import exists
+from typing import Union, Tuple, List, Iterator, Literal
+from pandas import concat
 from natsort import natsort_key
 import click
 from pybioinformatic import Displayer
+from table_join_lib import project_lines, keyed_rows, sort_projected_to_file, read_and_remove, kway_merge_join
+from file_io_lib import TABLE_FORMATS, table_file_name, read_table_file, write_table_file, iter_table_lines, write_table_rows
 
-displayer = Displayer(__file__.split('/')[-1], version='0.1.0')
+displayer = Displayer(__file__.split('/')[-1], version='0.3.1')
+
+
+def streaming_join(tables: List[Iterator[str]],
+                   usecols: List[List[str]],
+                   headers: List[List[str]],
+                   index: List[str],
+                   output_file: Union[str, TextIOWrapper],
+                   joint_method: Literal['left', 'outer', 'inner'],
+                   presorted: bool,
+                   tmp_dir: str,
+                   run_size: int,
+                   table_format: str,
+                   files: List[TextIOWrapper] = None):
+    rows, sorted_files = [], []
+    try:
+        for table_index, (table, header, names) in enumerate(zip(tables, headers, usecols)):
+            # key columns first, only the needed columns of each line are split
+            indexes = [header.index(i) for i in index] + [header.index(i) for i in names if i not in index]
+            lines = project_lines(table, indexes)
+            if not presorted:
+                # Tables are sorted one after another into one file each, so only the runs of one table are open
+                # at a time and the input can be closed before the join starts.
+                sorted_files.append(sort_projected_to_file(lines, len(index), tmp_dir, run_size))
+                if files:
+                    files[table_index].close()
+                lines = read_and_remove(sorted_files[-1])
+            rows.append(keyed_rows(lines, len(index)))
+        widths = [len(names) - len(index) for names in usecols]
+        header = index + [i for names in usecols for i in names if i not in index]
+        write_table_rows(header, kway_merge_join(rows, widths, joint_method), output_file, table_format)
+    finally:
+        for sorted_file in sorted_files:
+            if exists(sorted_file):
+                remove(sorted_file)
 
 
 def main(master_table: Union[str, TextIOWrapper],
          other_tables: Tuple[Union[str, TextIOWrapper]],
          output_file: TextIOWrapper,
-         joint_method: Literal['left', 'outer', 'inner'] = 'left'):
-    # read in raw table
-    master_table = read_table(master_table, dtype=str)
-    other_tables = [
-        read_table(other_table, dtype=str)
-        for other_table in other_tables
+         joint_method: Literal['left', 'outer', 'inner'] = 'left',
+         columns: List[str] = None,
+         streaming: bool = False,
+         presorted: bool = False,
+         tmp_dir: str = None,
+         run_size: int = 1000000,
+         table_format: str = 'tsv'):
+    tables = [
+        open(table) if isinstance(table, str) else table
+        for table in [master_table, *other_tables]
+    ]
+    if table_format != 'tsv':
+        output_file = table_file_name(output_file.name, table_format)
+
+    # read in table headers and get common fields as index
+    lines = [iter_table_lines(table) for table in tables]
+    headers = [next(table_lines).rstrip('\r\n').split('\t') for table_lines in lines]
+    intersection = set(headers[0]).intersection(*headers[1:])
+    index = [i for i in headers[0] if i in intersection]
+    # column projection, index fields are always kept
+    usecols = [
+        [i for i in header if i in intersection or columns is None or i in columns]
+        for header in headers
+    ]
+
+    if streaming:
+        streaming_join(lines, usecols, headers, index, output_file, joint_method, presorted, tmp_dir, run_size,
+                       table_format, tables)
+        return
+
+    # read in raw table (header of text file has been read)
+    master_table, *other_tables = [
+        read_table_file(table, header=None, names=header, usecols=names, dtype=str)
+        for table, header, names in zip(tables, headers, usecols)
     ]
 
     # reset table index
-    all_columns = [set(other_table.columns.tolist()) for other_table in other_tables]
-    intersection = set(master_table.columns.tolist()).intersection(*all_columns)
-    index = [i for i in master_table.columns if i in intersection]
     master_table.set_index(keys=index, drop=True, inplace=True)
     other_tables = [
         other_table.set_index(keys=index, drop=True)
@@ -46,7 +109,7 @@ def main(master_table: Union[str, TextIOWrapper],
         merged_table = concat(other_tables, axis=1, join=joint_method)
     merged_table.reset_index(inplace=True)
     merged_table.sort_values(by=index, key=natsort_key, inplace=True)
-    merged_table.to_csv(output_file, sep='\t', na_rep='NA', index=False)
+    write_table_file(merged_table, output_file, table_format, index=False, na_rep='NA')
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
@@ -58,18 +121,42 @@ def main(master_table: Union[str, TextIOWrapper],
               type=click.Choice(['left', 'outer', 'inner']),
               default='left', show_default=True,
               help='How to handle the operation of these tables.')
+@click.option('-c', '--columns', 'columns',
+              metavar='<str>',
+              help='Comma-separated field names to keep, common fields are always kept. Other fields are never parsed. '
+                   '[default: all fields]')
+@click.option('-s', '--streaming', 'streaming', is_flag=True, flag_value=True,
+              help='Join all tables in a single k-way merge pass instead of loading them, duplicate keys are allowed.')
+@click.option('-p', '--presorted', 'presorted', is_flag=True, flag_value=True,
+              help='With --streaming, input tables are already naturally sorted by common fields, skip external sort.')
+@click.option('-T', '--tmp-dir', 'tmp_dir',
+              metavar='<dir>',
+              help='Directory of temporary sorted runs for --streaming. [default: system temporary directory]')
+@click.option('-S', '--run-size', 'run_size',
+              metavar='<int>', type=click.IntRange(min=1), default=1000000, show_default=True,
+              help='Max number of lines sorted in memory for --streaming, tables are sorted one after another.')
+@click.option('-f', '--format', 'table_format',
+              type=click.Choice(TABLE_FORMATS), default='tsv', show_default=True,
+              help='Output table format, parquet and feather files replace .xls suffix. Input format is detected automatically.')
 @click.option('-o', '--output-file', 'output_file',
               metavar='<file>', type=click.File('w'), default='joint.xls', show_default=True,
               help='Output file.')
 @click.option('-V', '--version', 'version', help='Show author and version information.',
               is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
-def run(master_table_file, table_files, joint_method, output_file):
+def run(master_table_file, table_files, joint_method, columns, streaming, presorted, tmp_dir, run_size, table_format,
+        output_file):
     """Perform left inner or outer joins on a group of table files based on the common field names of the table files."""
     main(
         master_table=master_table_file,
         other_tables=table_files,
         output_file=output_file,
-        joint_method=joint_method
+        joint_method=joint_method,
+        columns=columns.split(',') if columns else None,
+        streaming=streaming,
+        presorted=presorted,
+        tmp_dir=tmp_dir,
+        run_size=run_size,
+        table_format=table_format
     )
 
 
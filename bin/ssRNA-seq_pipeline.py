@@ -24,7 +24,8 @@ from pybioinformatic import (
     LncRNAClassification,
     Displayer
 )
-displayer = Displayer(__file__.split('/')[-1], version='1.1.1')
+from exec_cmds_lib import Pipeline
+displayer = Displayer(__file__.split('/')[-1], version='1.2.1')
 
 
 def check_config(yaml_file: TextIOWrapper):
@@ -141,6 +142,9 @@ def main(config: TextIOWrapper):
     # commands path
     cuffcompare = which('cuffcompare')
     exec_cmds = which('exec_cmds')
+    exec_dag = which('exec_dag')
+    if not exec_dag:
+        raise click.ClickException('exec_dag: command not found, add the bin directory of this package to PATH.')
     file_split = which('file_split')
     featureCounts = which('featureCounts')
     featureCounts_helper = which('featureCounts_helper')
@@ -615,8 +619,88 @@ def main(config: TextIOWrapper):
         )
         o.write(cmd)
     system(f'chmod 755 {output_path}/shell/All_step.sh')
+
+    # write dependency graph of all steps, independent branches (eg. quantification and lncRNA identification,
+    # lncRNA classification and differential expression of each comparison) run concurrently
+    assembly_path = f'{output_path}/03.assembly'
+    lncRNA_path = f'{output_path}/05.lncRNA_prediction'
+    target_path = f'{output_path}/06.lncRNA_target_prediction'
+    pipeline = Pipeline()
+    pipeline.add_step(
+        'qc_mapping_assembly',
+        f'{exec_cmds} -f {output_path}/shell/merge_normal.sh -n {num_processing}',
+        inputs=[genome, gff, *(fq for l in sample_info_dict.values() for fq in l[:2])],
+        threads=num_threads * num_processing
+    )
+    pipeline.add_step('qc_stats', f'{python} {output_path}/shell/qc_stats.py', after=['qc_mapping_assembly'])
+    pipeline.add_step('mapping_rate_summary', mapping_rate_summary,
+                      outputs=[f'{output_path}/02.mapping/mapping_rate_summary.xls'], after=['qc_mapping_assembly'])
+    pipeline.add_step(
+        'novel_transcript',
+        f'{stringtie_merge_cmd}\n{cuffcompare_cmd}\n{identify_novel_transcript}',
+        inputs=[gff, genome],
+        outputs=[f'{assembly_path}/All.stringtie.gtf', ref_gtf, novel_transcript_gtf, f'{assembly_path}/novel_transcript.fa'],
+        after=['qc_mapping_assembly'],
+        threads=num_threads * num_processing
+    )
+    pipeline.add_step('all_gtf', f'cat {ref_gtf} {novel_transcript_gtf} > {all_gtf}',
+                      inputs=[ref_gtf, novel_transcript_gtf], outputs=[all_gtf])
+    pipeline.add_step(
+        'quantification',
+        step4.split('\n', 2)[2],
+        inputs=[all_gtf],
+        outputs=[f'{output_path}/04.expression/featureCounts.xls', f'{output_path}/04.expression/reads.count.fc.xls'],
+        threads=featureCounts_num_threads
+    )
+    pipeline.add_step(
+        'lncRNA_identification',
+        step5.split('\n', 1)[1],
+        inputs=[f'{assembly_path}/novel_transcript.fa', all_gtf],
+        outputs=[f'{lncRNA_path}/lncRNA.fa', f'{lncRNA_path}/lncRNA.gtf', f'{lncRNA_path}/lncRNA_exon_count.xls'],
+        threads=num_threads * num_processing
+    )
+    pipeline.add_step('target_gtf', create_target_gtf,
+                      inputs=[f'{lncRNA_path}/lncRNA.fa', all_gtf], outputs=[f'{target_path}/target.gtf'])
+    pipeline.add_step('lncRNA_exp', lncRNA_exp,
+                      inputs=[f'{lncRNA_path}/lncRNA.gtf'],
+                      outputs=[f'{target_path}/lncRNA_exp/reads.count.fc.xls'],
+                      threads=featureCounts_num_threads)
+    pipeline.add_step('target_exp', target_exp,
+                      inputs=[f'{target_path}/target.gtf'],
+                      outputs=[f'{target_path}/target_exp/reads.count.fc.xls'],
+                      threads=featureCounts_num_threads)
+    pipeline.add_step(
+        'lncRNA_target_prediction',
+        f'{python} {output_path}/shell/lncRNA_target_prediction.py\n{add_lncRNA_exon_count}\n{add_lncRNA_len}',
+        inputs=[f'{target_path}/lncRNA_exp/reads.count.fc.xls', f'{target_path}/target_exp/reads.count.fc.xls',
+                f'{lncRNA_path}/lncRNA_exon_count.xls', f'{lncRNA_path}/lncRNA.fa'],
+        outputs=[f'{target_path}/co_loc.xls', f'{target_path}/filter_co_exp.xls'],
+        threads=num_threads * num_processing
+    )
+    pipeline.add_step(
+        'lncRNA_classification',
+        f'bash {output_path}/shell/lncRNA_classification.sh',
+        inputs=[f'{lncRNA_path}/lncRNA.gtf', f'{lncRNA_path}/lncRNA.fa', f'{target_path}/co_loc.xls'],
+        outputs=[f'{output_path}/07.lncRNA_classification/co_loc.xls']
+    )
+    for cc_name in comparative_combination:
+        pipeline.add_step(
+            f'DEmRNA_{cc_name}',
+            f'sh {output_path}/shell/DE_enrich/DEmRNA_{cc_name}.sh',
+            inputs=[f'{target_path}/target_exp/reads.count.fc.xls'],
+            outputs=[f'{output_path}/08.mRNA_differential_expression_analysis/{cc_name}/DESeq2.csv']
+        )
+        pipeline.add_step(
+            f'DElncRNA_{cc_name}',
+            f'sh {output_path}/shell/DE_enrich/DElncRNA_{cc_name}.sh',
+            inputs=[f'{target_path}/lncRNA_exp/reads.count.fc.xls', f'{target_path}/co_loc.xls',
+                    f'{target_path}/filter_co_exp.xls'],
+            outputs=[f'{output_path}/09.lncRNA_differential_expression_analysis/{cc_name}/DESeq2.csv']
+        )
+    pipeline.write(f'{output_path}/shell/All_step.json')
     click.echo(
-        message=f'\033[32mCommands created successfully, please run "bash {output_path}/shell/All_step.sh".\033[0m',
+        message=f'\033[32mCommands created successfully, please run "bash {output_path}/shell/All_step.sh", '
+                f'or run independent steps concurrently with "{exec_dag} -d {output_path}/shell/All_step.json".\033[0m',
         err=True
     )
 
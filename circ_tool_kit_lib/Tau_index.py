@@ -7,7 +7,8 @@ Author: xuwenlin
 E-mail: wenlinxu.njfu@outlook.com
 """
 import click
-from pybioinformatic import read_in_gene_expression_as_dataframe, Displayer
+from pybioinformatic import Displayer
+from expression_lib import read_in_gene_expression_as_dataframe
 displayer = Displayer(__file__.split('/')[-1], version='1.0.0')
 
 
@@ -29,7 +30,7 @@ def main(exp_file, out_file_prefix):
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
 @click.option('-i', '--circ_exp_file', 'circ_exp_file',
               metavar='<exp file>', required=True,
-              help='Input circRNA expression profile file. (support format: txt, xls, xlsx, csv)')
+              help='Input circRNA expression profile file. (support format: txt, xls, xlsx, csv, binary matrix)')
 @click.option('-o', '--output_prefix', 'out_prefix',
               metavar='<str>', required=True, default='circ_Tau', show_default=True,
               help='Output file prefix.')
@@ -13,7 +13,8 @@ from scipy.stats import pearsonr
 import pandas as pd
 import matplotlib.pyplot as plt
 import click
-from pybioinformatic import read_in_gene_expression_as_dataframe, Displayer
+from pybioinformatic import Displayer
+from expression_lib import read_in_gene_expression_as_dataframe
 displayer = Displayer(__file__.split('/')[-1], version='1.0.0')
 
 
@@ -103,17 +104,17 @@ def main(mRNA_exp_file: str,
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
 @click.option('-m', '--mRNA_exp_file', 'mrna',
               metavar='<exp file>', required=True,
-              help='Input mRNA expression file. (Supported formats: txt, xls, xlsx and csv)')
+              help='Input mRNA expression file. (Supported formats: txt, xls, xlsx, csv and binary matrix)')
 @click.option('-c', '--circ_exp_file', 'circ',
               metavar='<exp file>', required=True,
-              help='Input circRNA expression file. (Supported formats: txt, xls, xlsx and csv)')
+              help='Input circRNA expression file. (Supported formats: txt, xls, xlsx, csv and binary matrix)')
 @click.option('-C', '--ceRNA', 'cerna',
               metavar='<file>', required=True,
               help='Input ceRNA file as followed content:\n'
                    'miRNA156\\tChr01:100|1000\\tcircRNA\\n\nmiRNA156\\tPotri.001G001000.1\\tmRNA\\n')
 @click.option('-M', '--miRNA_exp_file', 'mirna',
               metavar='<exp file>',
-              help='Input miRNA expression file. (Supported formats: txt, xls, xlsx and csv)')
+              help='Input miRNA expression file. (Supported formats: txt, xls, xlsx, csv and binary matrix)')
 @click.option('-o', '--output_path', 'out_path',
               metavar='<str>', default='./', show_default=True,
               help='Output path.')
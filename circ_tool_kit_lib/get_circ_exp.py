@@ -7,7 +7,8 @@ Author: xuwenlin
 E-mail: wenlinxu.njfu@outlook.com
 """
 import click
-from pybioinformatic import read_in_gene_expression_as_dataframe, Displayer
+from pybioinformatic import Displayer
+from expression_lib import read_in_gene_expression_as_dataframe
 displayer = Displayer(__file__.split('/')[-1], version='1.0.0')
 
 
@@ -24,7 +25,7 @@ def main(BSJ_matrix_file, out_file):
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
 @click.option('-i', '--bsj_matrix', 'bsj_matrix',
               metavar='<exp file>', required=True,
-              help='Input BSJ matrix file. (support format: txt, xls, xlsx, csv)')
+              help='Input BSJ matrix file. (support format: txt, xls, xlsx, csv, binary matrix)')
 @click.option('-o', '--output_prefix', 'output_prefix',
               metavar='<str>', default='circ_CPM', show_default=True,
               help='Output file prefix.')
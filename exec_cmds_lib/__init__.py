@@ -0,0 +1,11 @@
+from exec_cmds_lib.job import Job, parse_memory, parse_command_file
+from exec_cmds_lib.journal import Journal
+from exec_cmds_lib.profile import Profiler
+from exec_cmds_lib.output import JobOutput
+from exec_cmds_lib.scheduler import Scheduler, total_memory
+from exec_cmds_lib.async_runner import AsyncRunner, max_concurrent_jobs
+from exec_cmds_lib.work_queue import WorkQueue, Worker
+from exec_cmds_lib.cache import ResultCache
+from exec_cmds_lib.dag import Pipeline, MakeStyleChecker, step_graph
+
+__version__ = '0.1.0'
@@ -0,0 +1,131 @@
+"""
+File: async_runner.py
+Description: Asyncio subprocess backend for running a very large number of short commands.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+import os
+import asyncio
+import resource
+from time import monotonic
+from typing import List
+from exec_cmds_lib.job import Job
+from exec_cmds_lib.journal import Journal
+from exec_cmds_lib.output import JobOutput
+
+# Finished jobs are written to the journal in one transaction every JOURNAL_BATCH jobs or JOURNAL_INTERVAL seconds.
+JOURNAL_BATCH = 1000
+JOURNAL_INTERVAL = 1.0
+# Open files of a running job: read and write end of stdout and stderr pipes, and the child watcher's pidfd.
+# Per-job log files add two more. Files of the runner itself (journal, selector, event loop) come out of RESERVED_FDS.
+FDS_PER_JOB = 5
+FDS_PER_LOG_JOB = 2
+RESERVED_FDS = 64
+
+
+def raise_open_file_limit() -> int:
+    """Raise soft limit of open files (RLIMIT_NOFILE) to the hard limit, return the new soft limit."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (ValueError, OSError):
+            pass
+    return soft
+
+
+def max_concurrent_jobs(log_dir: bool = False) -> int:
+    """
+    Max number of jobs that can run at the same time without running out of file descriptors,
+    after raising the soft open file limit as far as allowed.
+    """
+    limit = raise_open_file_limit()
+    if limit == resource.RLIM_INFINITY:
+        return limit
+    num_open = len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else 0
+    return max(0, (limit - num_open - RESERVED_FDS) // (FDS_PER_JOB + (FDS_PER_LOG_JOB if log_dir else 0)))
+
+
+class AsyncRunner:
+    """
+    Run jobs as asyncio subprocesses with at most num_processing of them at the same time (bounded semaphore).
+    A single event loop starts and reaps all children, there is no worker process and nothing is pickled,
+    so thousands of commands can be in flight. Resource annotations and dependencies are not considered.
+    """
+    def __init__(self,
+                 jobs: List[Job],
+                 num_processing: int,
+                 journal: Journal = None,
+                 retry: int = 0,
+                 output: JobOutput = None):
+        self.jobs = jobs
+        self.num_processing = num_processing
+        self.journal = journal
+        self.retry = retry
+        self.output = output or JobOutput()
+        self.failed = []
+        self.elapsed = 0.0
+        self.__finished = []
+        self.__last_flush = monotonic()
+
+    def __flush_journal(self, force: bool = False):
+        if not self.journal or not self.__finished:
+            return
+        if force or len(self.__finished) >= JOURNAL_BATCH or monotonic() - self.__last_flush >= JOURNAL_INTERVAL:
+            self.journal.finish_many(self.__finished)
+            self.__finished = []
+            self.__last_flush = monotonic()
+
+    async def __run_job(self, job: Job, semaphore: asyncio.BoundedSemaphore):
+        try:
+            while True:
+                stdout, stderr = self.output.open(job)
+                start = monotonic()
+                try:
+                    process = await asyncio.create_subprocess_exec('/bin/bash', '-c', job.command,
+                                                                   stdout=stdout, stderr=stderr)
+                finally:
+                    os.close(stdout)
+                    os.close(stderr)
+                exit_code = await process.wait()
+                job.attempts += 1
+                if exit_code == 0 or job.attempts > self.retry:
+                    break
+            self.__finished.append((job, exit_code, monotonic() - start))
+            if exit_code != 0:
+                self.failed.append(job)
+            self.__flush_journal()
+        finally:
+            semaphore.release()
+
+    async def __run(self):
+        semaphore = asyncio.BoundedSemaphore(self.num_processing)
+        tasks = set()
+        for job in self.jobs:
+            await semaphore.acquire()
+            task = asyncio.create_task(self.__run_job(job, semaphore))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    def run(self) -> List[Job]:
+        """
+        Run all jobs.
+        :return: Jobs that still failed after all retries.
+        """
+        start = monotonic()
+        try:
+            asyncio.run(self.__run())
+        finally:
+            self.elapsed = monotonic() - start
+            self.__flush_journal(force=True)
+            self.output.close()
+        return self.failed
+
+    @property
+    def throughput(self) -> float:
+        """Finished commands per second."""
+        return len(self.jobs) / self.elapsed if self.elapsed else 0.0
@@ -0,0 +1,208 @@
+"""
+File: cache.py
+Description: Content-addressed cache of command outputs, keyed on command text and declared input files.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+import sqlite3
+from fcntl import ioctl
+from hashlib import sha256
+from os import makedirs, link, unlink, chmod, stat, walk
+from os.path import exists, isdir, isfile, islink, join, getsize, dirname, abspath
+from shutil import copy2, copytree, rmtree
+from time import time
+from typing import Optional, List
+import click
+from exec_cmds_lib.job import Job
+
+# ioctl request of Linux reflink (btrfs, xfs), ignored where the filesystem does not support it.
+FICLONE = 0x40049409
+HASH_BLOCK_SIZE = 1 << 20
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER NOT NULL, created REAL, last_used REAL);
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL,
+    PRIMARY KEY (path, size, mtime_ns)
+);
+CREATE TABLE IF NOT EXISTS links (path TEXT PRIMARY KEY, dev INTEGER NOT NULL, ino INTEGER NOT NULL)
+"""
+
+
+def _copy_file(src: str, dst: str):
+    """Reflink src to dst where the filesystem supports it, copy it otherwise. dst never shares the inode of src."""
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            ioctl(d.fileno(), FICLONE, s.fileno())
+    except OSError:
+        copy2(src, dst)
+
+
+def _clone_file(src: str, dst: str):
+    """Hard link src to dst, or reflink/copy it if they are on different filesystems."""
+    try:
+        link(src, dst)
+    except OSError:
+        _copy_file(src, dst)
+
+
+def _tree_files(path: str) -> List[str]:
+    if isdir(path):
+        return [join(root, name) for root, _, files in walk(path) for name in files]
+    return [path] if isfile(path) else []
+
+
+def _tree_size(path: str) -> int:
+    if isfile(path):
+        return getsize(path)
+    return sum(getsize(join(root, name)) for root, _, files in walk(path) for name in files)
+
+
+class ResultCache:
+    """
+    Skip a command whose outputs were cached by an earlier run of the same command text on the same inputs,
+    restoring its outputs by hard link (reflink or copy across filesystems) instead. Outputs are copied into the
+    cache, so files of the user never share an inode with the cache unless the cache restored them.
+    Only commands that declare outputs ("#@outputs=a.bam,a.bam.bai inputs=r1.fq.gz,r2.fq.gz") are cached.
+    Inputs are identified by content hash (hashes are reused while size and mtime do not change), or by
+    size and mtime only if key is mtime. Cached files are read-only, so that a restored output modified in place
+    does not corrupt the cache. Least recently used entries are evicted when the cache is larger than max_size.
+    """
+    def __init__(self, cache_dir: str, max_size: int = 0, key: str = 'content'):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.key_type = key
+        makedirs(f'{cache_dir}/objects', exist_ok=True)
+        self.__connection = sqlite3.connect(f'{cache_dir}/index.db', timeout=60, isolation_level=None)
+        self.__connection.executescript(SCHEMA)
+        # jobs already looked up and missed, the scheduler asks again every time it looks for a job to start
+        self.__missed = set()
+        # digests of this run by (path, size, mtime), an input shared by many jobs is looked up once
+        self.__digests = {}
+
+    def close(self):
+        self.__connection.close()
+
+    def __file_digest(self, path: str) -> str:
+        st = stat(path)
+        if self.key_type == 'mtime':
+            return f'{st.st_size}:{st.st_mtime_ns}'
+        path = abspath(path)
+        memo_key = (path, st.st_size, st.st_mtime_ns)
+        if memo_key in self.__digests:
+            return self.__digests[memo_key]
+        row = self.__connection.execute(
+            'SELECT digest FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ?', (path, st.st_size, st.st_mtime_ns)
+        ).fetchone()
+        if row:
+            self.__digests[memo_key] = row[0]
+            return row[0]
+        h = sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        self.__connection.execute('DELETE FROM hashes WHERE path = ?', (path,))
+        self.__connection.execute('INSERT INTO hashes VALUES (?, ?, ?, ?)', (path, st.st_size, st.st_mtime_ns, digest))
+        self.__digests[memo_key] = digest
+        return digest
+
+    def key(self, job: Job) -> Optional[str]:
+        """Cache key of job, None if job declares no outputs or an input is missing."""
+        if not job.outputs or not all(isfile(path) for path in job.inputs):
+            return None
+        h = sha256(job.command.encode())
+        for path in job.inputs:
+            h.update(f'\0{path}\0{self.__file_digest(path)}'.encode())
+        return h.hexdigest()
+
+    def restore(self, job: Job) -> bool:
+        """
+        Restore outputs of job from cache. On a miss, existing outputs that the cache itself restored as hard links
+        are removed, so that the command does not overwrite cached files.
+        :return: Whether job is cached.
+        """
+        if job.index in self.__missed:
+            return False
+        key = self.key(job)
+        if key is None:
+            return False
+        entry = f'{self.cache_dir}/objects/{key}'
+        if not exists(entry) or self.__connection.execute('SELECT 1 FROM entries WHERE key = ?', (key,)).fetchone() is None:
+            for path in job.outputs:
+                self.__unlink_restored(path)
+            self.__missed.add(job.index)
+            return False
+        for i, path in enumerate(job.outputs):
+            self.__remove(path)
+            if dirname(path):
+                makedirs(dirname(path), exist_ok=True)
+            if isdir(f'{entry}/{i}'):
+                copytree(f'{entry}/{i}', path, copy_function=_clone_file)
+            else:
+                _clone_file(f'{entry}/{i}', path)
+            self.__record_links(path)
+        self.__connection.execute('UPDATE entries SET last_used = ? WHERE key = ?', (time(), key))
+        click.echo(f'\033[32mRestore outputs of job {job.index + 1} from cache: {job.command}\033[0m', err=True)
+        return True
+
+    def __record_links(self, path: str):
+        """Remember restored files that are hard links into the cache."""
+        rows = []
+        for file in _tree_files(path):
+            st = stat(file)
+            if st.st_nlink > 1:
+                rows.append((abspath(file), st.st_dev, st.st_ino))
+        self.__connection.executemany('INSERT OR REPLACE INTO links VALUES (?, ?, ?)', rows)
+
+    def __unlink_restored(self, path: str):
+        """Remove files under path that are still the hard links restored by the cache, other files are kept."""
+        for file in _tree_files(path):
+            file = abspath(file)
+            row = self.__connection.execute('SELECT dev, ino FROM links WHERE path = ?', (file,)).fetchone()
+            if row is None:
+                continue
+            st = stat(file)
+            if (st.st_dev, st.st_ino) == tuple(row) and st.st_nlink > 1:
+                unlink(file)
+            self.__connection.execute('DELETE FROM links WHERE path = ?', (file,))
+
+    @staticmethod
+    def __remove(path: str):
+        if isdir(path):
+            rmtree(path)
+        elif exists(path) or islink(path):
+            unlink(path)
+
+    def store(self, job: Job):
+        """Add outputs of successful job to cache, then evict least recently used entries."""
+        key = self.key(job)
+        if key is None or not all(exists(path) for path in job.outputs):
+            return
+        entry = f'{self.cache_dir}/objects/{key}'
+        self.__remove(entry)
+        makedirs(entry)
+        for i, path in enumerate(job.outputs):
+            if isdir(path):
+                copytree(path, f'{entry}/{i}', copy_function=_copy_file)
+                for root, _, files in walk(f'{entry}/{i}'):
+                    for name in files:
+                        chmod(join(root, name), 0o444)
+            else:
+                _copy_file(path, f'{entry}/{i}')
+                chmod(f'{entry}/{i}', 0o444)
+        now = time()
+        self.__connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)', (key, _tree_size(entry), now, now))
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache is not larger than max_size (0 means no limit)."""
+        if not self.max_size:
+            return
+        total = self.__connection.execute('SELECT coalesce(sum(size), 0) FROM entries').fetchone()[0]
+        for key, size in self.__connection.execute('SELECT key, size FROM entries ORDER BY last_used').fetchall():
+            if total <= self.max_size:
+                break
+            self.__remove(f'{self.cache_dir}/objects/{key}')
+            self.__connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total -= size
@@ -0,0 +1,138 @@
+"""
+File: dag.py
+Description: Pipeline steps with declared inputs and outputs, executed as a dependency graph make-style.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from json import dump, load
+from os import makedirs, utime
+from os.path import abspath, dirname, exists, getmtime
+from typing import Iterable, List, Dict
+from yaml import safe_dump, safe_load
+from exec_cmds_lib.job import Job, parse_memory
+
+STAMP_DIR = '.exec_dag'
+
+
+class Pipeline:
+    """
+    Steps of a pipeline. A step depends on the steps that write any of its inputs and on the steps named in after.
+    It is written as JSON, or YAML if the file name ends with .yaml/.yml.
+    """
+    def __init__(self, steps: List[dict] = None):
+        self.steps = list(steps or [])
+
+    def add_step(self,
+                 name: str,
+                 command: str,
+                 inputs: Iterable[str] = (),
+                 outputs: Iterable[str] = (),
+                 after: Iterable[str] = (),
+                 threads: int = 1,
+                 mem: str = '0'):
+        if any(step['name'] == name for step in self.steps):
+            raise ValueError(f'Duplicate step name: {name}.')
+        self.steps.append(
+            {
+                'name': name,
+                'command': command,
+                'inputs': list(inputs),
+                'outputs': list(outputs),
+                'after': list(after),
+                'threads': threads,
+                'mem': str(mem)
+            }
+        )
+        return self
+
+    def write(self, path: str):
+        with open(path, 'w') as o:
+            if path.endswith(('.yaml', '.yml')):
+                safe_dump({'steps': self.steps}, o, sort_keys=False)
+            else:
+                dump({'steps': self.steps}, o, indent=2)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path) as f:
+            data = safe_load(f) if path.endswith(('.yaml', '.yml')) else load(f)
+        return cls(data['steps'])
+
+    def dependencies(self) -> List[set]:
+        """Indexes of the steps each step depends on, raise ValueError for unknown step names and cycles."""
+        producers = {output: i for i, step in enumerate(self.steps) for output in step.get('outputs', [])}
+        names = {step['name']: i for i, step in enumerate(self.steps)}
+        dependencies = []
+        for i, step in enumerate(self.steps):
+            unknown = [name for name in step.get('after', []) if name not in names]
+            if unknown:
+                raise ValueError(f'Step {step["name"]} runs after unknown steps: {", ".join(unknown)}.')
+            deps = {producers[path] for path in step.get('inputs', []) if path in producers}
+            deps.update(names[name] for name in step.get('after', []))
+            deps.discard(i)
+            dependencies.append(deps)
+        # Kahn's algorithm, steps left over are on a cycle
+        remaining = {i: set(deps) for i, deps in enumerate(dependencies)}
+        while remaining:
+            ready = [i for i, deps in remaining.items() if not deps]
+            if not ready:
+                cycle = ', '.join(self.steps[i]['name'] for i in remaining)
+                raise ValueError(f'Dependency cycle among steps: {cycle}.')
+            for i in ready:
+                del remaining[i]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return dependencies
+
+    def jobs(self) -> List[Job]:
+        """Steps as scheduler jobs, each step command runs in bash with errexit."""
+        return [
+            Job(
+                index=i,
+                command=f'# {step["name"]}\nset -e\n{step["command"]}',
+                threads=int(step.get('threads', 1)),
+                mem=parse_memory(str(step.get('mem', 0))),
+                dependencies=deps
+            )
+            for i, (step, deps) in enumerate(zip(self.steps, self.dependencies()))
+        ]
+
+
+class MakeStyleChecker:
+    """
+    A step is up to date if its stamp (touched after it succeeded) and all its outputs exist and are newer than
+    its existing inputs and the stamps of the steps it depends on. Steps without outputs rely on the stamp only.
+    """
+    def __init__(self, pipeline: Pipeline, dag_file: str, force: bool = False):
+        self.pipeline = pipeline
+        self.stamp_dir = f'{dirname(abspath(dag_file))}/{STAMP_DIR}'
+        self.force = force
+        self.__dependencies = pipeline.dependencies()
+        makedirs(self.stamp_dir, exist_ok=True)
+
+    def stamp(self, index: int) -> str:
+        return f'{self.stamp_dir}/{self.pipeline.steps[index]["name"]}.done'
+
+    def up_to_date(self, job: Job) -> bool:
+        if self.force:
+            return False
+        step = self.pipeline.steps[job.index]
+        targets = [self.stamp(job.index), *step.get('outputs', [])]
+        if not all(exists(target) for target in targets):
+            return False
+        sources = [path for path in step.get('inputs', []) if exists(path)]
+        sources.extend(self.stamp(i) for i in self.__dependencies[job.index] if exists(self.stamp(i)))
+        return not sources or min(map(getmtime, targets)) >= max(map(getmtime, sources))
+
+    def on_success(self, job: Job):
+        with open(self.stamp(job.index), 'a'):
+            utime(self.stamp(job.index))
+
+
+def step_graph(pipeline: Pipeline) -> Dict[str, List[str]]:
+    """Names of the steps each step depends on."""
+    return {
+        step['name']: [pipeline.steps[i]['name'] for i in sorted(deps)]
+        for step, deps in zip(pipeline.steps, pipeline.dependencies())
+    }
@@ -0,0 +1,103 @@
+"""
+File: job.py
+Description: Shell command job with resource requirements, parsed from command file.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from hashlib import sha1
+from re import compile
+from typing import Iterable, List, Set
+import click
+
+# Resource annotation, either a line of its own (applies to the next command) or at the end of a command line.
+ANNOTATION = compile(r'(?:^|\s)#@\s*((?:\w+=\S+\s*)+)$')
+MEM_UNITS = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def parse_memory(memory: str) -> int:
+    """Parse memory size (eg. 32G, 500M, 1024) as bytes."""
+    memory = memory.strip().upper().rstrip('B')
+    if memory and memory[-1] in MEM_UNITS:
+        return int(float(memory[:-1]) * MEM_UNITS[memory[-1]])
+    return int(memory)
+
+
+class Job:
+    """
+    Shell command with the number of threads and bytes of memory it needs, the jobs it must wait for,
+    and the files it reads and writes (only used by result cache).
+    """
+    def __init__(self,
+                 index: int,
+                 command: str,
+                 threads: int = 1,
+                 mem: int = 0,
+                 dependencies: Set[int] = None,
+                 inputs: List[str] = None,
+                 outputs: List[str] = None):
+        self.index = index
+        self.command = command
+        self.threads = threads
+        self.mem = mem
+        self.dependencies = set(dependencies or ())
+        self.inputs = list(inputs or ())
+        self.outputs = list(outputs or ())
+        self.key = sha1(command.encode()).hexdigest()
+        self.attempts = 0
+
+    def __repr__(self):
+        return f'Job({self.index}, {self.command!r}, threads={self.threads}, mem={self.mem})'
+
+
+def parse_annotation(annotation: str) -> dict:
+    """
+    Parse "threads=16 mem=32G" as dict(threads=16, mem=34359738368),
+    inputs and outputs are comma separated file names (eg. inputs=r1.fq,r2.fq outputs=a.bam).
+    """
+    resources = {}
+    for item in annotation.split():
+        name, _, value = item.partition('=')
+        if name not in ('threads', 'mem', 'inputs', 'outputs'):
+            raise ValueError(f'unknown resource "{name}" in annotation "#@{annotation}", '
+                             f'it must be one of threads, mem, inputs and outputs.')
+        try:
+            if name == 'threads':
+                resources['threads'] = int(value)
+            elif name == 'mem':
+                resources['mem'] = parse_memory(value)
+            else:
+                resources[name] = [path for path in value.split(',') if path]
+        except ValueError:
+            raise ValueError(f'invalid value "{value}" of resource "{name}" in annotation "#@{annotation}".')
+    return resources
+
+
+def parse_command_file(lines: Iterable[str]) -> List[Job]:
+    """
+    Parse command file (one command per line) as jobs, comment lines are skipped.
+    Lines like "#@threads=16 mem=32G" set the resources of the next command, annotation at the end of
+    a command line sets the resources of that command.
+    :param lines: Lines of command file. (type=Iterable[str])
+    :return: Jobs in file order.
+    :raise click.UsageError: Annotation has unknown resource or invalid value.
+    """
+    jobs = []
+    resources = {}
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        try:
+            if line.startswith('#@'):
+                resources = parse_annotation(line[2:])
+                continue
+            if not line or line.startswith('#'):
+                continue
+            match = ANNOTATION.search(line)
+            if match:
+                resources = {**resources, **parse_annotation(match.group(1))}
+                line = line[:match.start()].rstrip()
+        except ValueError as e:
+            raise click.UsageError(f'Line {line_number} of command file: {e}')
+        jobs.append(Job(len(jobs), line, **resources))
+        resources = {}
+    return jobs
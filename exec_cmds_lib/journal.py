@@ -0,0 +1,94 @@
+"""
+File: journal.py
+Description: SQLite journal of command states, used to resume interrupted or failed runs.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+import sqlite3
+from datetime import datetime
+from typing import Set, Iterable, Tuple
+from exec_cmds_lib.job import Job
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    command TEXT NOT NULL,
+    status TEXT NOT NULL,
+    exit_code INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    threads INTEGER,
+    mem INTEGER,
+    start_time TEXT,
+    end_time TEXT,
+    runtime REAL
+)
+"""
+
+
+class Journal:
+    """
+    Per-command state (running/done/failed/killed, exit code, runtime) keyed on the command text,
+    every change is committed at once so that the journal survives a killed run.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.__connection = sqlite3.connect(path, isolation_level=None)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.__connection.close()
+
+    def completed(self) -> Set[str]:
+        """Keys of commands that have finished successfully."""
+        return {row[0] for row in self.__connection.execute("SELECT key FROM jobs WHERE status = 'done'")}
+
+    def start(self, job: Job):
+        self.__connection.execute(
+            """
+            INSERT INTO jobs (key, command, status, attempts, threads, mem, start_time)
+            VALUES (?, ?, 'running', 1, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                status = 'running', attempts = attempts + 1, threads = excluded.threads, mem = excluded.mem,
+                start_time = excluded.start_time, end_time = NULL, exit_code = NULL, runtime = NULL
+            """,
+            (job.key, job.command, job.threads, job.mem, datetime.now().isoformat(timespec='seconds'))
+        )
+
+    def finish(self, job: Job, exit_code: int, runtime: float, status: str = None):
+        status = status or ('done' if exit_code == 0 else 'failed')
+        self.__connection.execute(
+            'UPDATE jobs SET status = ?, exit_code = ?, end_time = ?, runtime = ? WHERE key = ?',
+            (status, exit_code, datetime.now().isoformat(timespec='seconds'), runtime, job.key)
+        )
+
+    def finish_many(self, records: Iterable[Tuple[Job, int, float]]):
+        """
+        Record many finished jobs (job, exit code, runtime) in one transaction, used when commands are too short
+        to afford two commits each. Jobs need not have been started in the journal.
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.__connection:
+            self.__connection.execute('BEGIN')
+            self.__connection.executemany(
+                """
+                INSERT INTO jobs (key, command, status, exit_code, attempts, threads, mem, end_time, runtime)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    status = excluded.status, exit_code = excluded.exit_code, attempts = attempts + excluded.attempts,
+                    threads = excluded.threads, mem = excluded.mem, end_time = excluded.end_time,
+                    runtime = excluded.runtime
+                """,
+                [
+                    (job.key, job.command, 'done' if exit_code == 0 else 'failed', exit_code, job.attempts,
+                     job.threads, job.mem, now, runtime)
+                    for job, exit_code, runtime in records
+                ]
+            )
@@ -0,0 +1,155 @@
+"""
+File: output.py
+Description: Stream stdout and stderr of running jobs through non-blocking pipes to terminal, per-job log files or a multiplexed log.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+import os
+from os import makedirs, rename
+from os.path import exists, getsize
+from queue import SimpleQueue
+from selectors import DefaultSelector, EVENT_READ
+from threading import Thread
+from typing import BinaryIO, Callable, Tuple
+import click
+from exec_cmds_lib.job import Job
+
+CHUNK_SIZE = 1 << 16
+# A line longer than this is written in pieces, so that a command printing no newline never grows the buffer.
+MAX_LINE_SIZE = 1 << 20
+LOG_BACKUPS = 3
+
+
+class LineSink:
+    """Split output into lines and write every line with a prefix, the unfinished last line is kept until EOF."""
+    def __init__(self, prefix: bytes, write: Callable[[bytes], None]):
+        self.prefix = prefix
+        self.__write = write
+        self.__pending = b''
+
+    def write(self, data: bytes):
+        lines = (self.__pending + data).split(b'\n')
+        self.__pending = lines.pop()
+        if len(self.__pending) > MAX_LINE_SIZE:
+            lines.append(self.__pending)
+            self.__pending = b''
+        if lines:
+            self.__write(b''.join(self.prefix + line + b'\n' for line in lines))
+
+    def close(self):
+        if self.__pending:
+            self.__write(self.prefix + self.__pending + b'\n')
+            self.__pending = b''
+
+
+class RotatingFile:
+    """
+    Log file that is renamed to <file>.1 (older ones to <file>.2 ... <file>.3) once it grows over max_size,
+    max_size 0 means no rotation.
+    """
+    def __init__(self, path: str, max_size: int = 0, append: bool = False):
+        self.path = path
+        self.max_size = max_size
+        self.__file = open(path, 'ab' if append else 'wb')
+        self.__size = getsize(path) if append else 0
+
+    def write(self, data: bytes):
+        if self.max_size and self.__size and self.__size + len(data) > self.max_size:
+            self.__file.close()
+            for i in range(LOG_BACKUPS - 1, 0, -1):
+                if exists(f'{self.path}.{i}'):
+                    rename(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+            rename(self.path, f'{self.path}.1')
+            self.__file = open(self.path, 'wb')
+            self.__size = 0
+        self.__file.write(data)
+        self.__size += len(data)
+
+    def close(self):
+        self.__file.close()
+
+
+def _echo(data: bytes):
+    click.echo(data.decode('utf-8', errors='replace'), err=True, nl=False)
+
+
+class JobOutput:
+    """
+    Collect stdout and stderr of jobs in a background thread that reads their pipes as data arrives,
+    so memory use does not depend on how much a command prints. Output goes to
+    (1) per-job log files <log_dir>/job_<num>.out and .err, rotated when larger than max_size;
+    (2) one log file multiplexing all jobs, every line prefixed with "[job <num> stdout|stderr]";
+    (3) terminal (stderr, default), every line prefixed with "[job <num>]".
+    """
+    def __init__(self, log_dir: str = None, log_file: str = None, max_size: int = 0):
+        self.log_dir = log_dir
+        self.max_size = max_size
+        if log_dir:
+            makedirs(log_dir, exist_ok=True)
+        self.__shared: BinaryIO = open(log_file, 'wb') if log_file else None
+        self.__selector = DefaultSelector()
+        self.__registrations = SimpleQueue()
+        self.__wakeup_read, self.__wakeup_write = os.pipe()
+        self.__selector.register(self.__wakeup_read, EVENT_READ)
+        self.__closing = False
+        self.__thread = Thread(target=self.__loop, daemon=True)
+        self.__thread.start()
+
+    def __sinks(self, job: Job) -> Tuple:
+        num = job.index + 1
+        if self.log_dir:
+            # the first attempt truncates the logs of an earlier run, retries append
+            append = job.attempts > 0
+            return (RotatingFile(f'{self.log_dir}/job_{num}.out', self.max_size, append),
+                    RotatingFile(f'{self.log_dir}/job_{num}.err', self.max_size, append))
+        if self.__shared:
+            return (LineSink(f'[job {num} stdout] '.encode(), self.__shared.write),
+                    LineSink(f'[job {num} stderr] '.encode(), self.__shared.write))
+        return LineSink(f'[job {num}] '.encode(), _echo), LineSink(f'[job {num}] '.encode(), _echo)
+
+    def open(self, job: Job) -> Tuple[int, int]:
+        """
+        Create stdout and stderr pipes of job.
+        :return: Write ends for the child process, the caller closes them once the child has started.
+        """
+        fds = []
+        for sink in self.__sinks(job):
+            read_fd, write_fd = os.pipe()
+            os.set_blocking(read_fd, False)
+            self.__registrations.put((read_fd, sink))
+            fds.append(write_fd)
+        os.write(self.__wakeup_write, b'\0')
+        return fds[0], fds[1]
+
+    def __loop(self):
+        while True:
+            for key, _ in self.__selector.select():
+                if key.fd == self.__wakeup_read:
+                    os.read(self.__wakeup_read, CHUNK_SIZE)
+                    while not self.__registrations.empty():
+                        read_fd, sink = self.__registrations.get()
+                        self.__selector.register(read_fd, EVENT_READ, sink)
+                    continue
+                try:
+                    data = os.read(key.fd, CHUNK_SIZE)
+                except BlockingIOError:
+                    continue
+                if data:
+                    key.data.write(data)
+                else:
+                    self.__selector.unregister(key.fd)
+                    os.close(key.fd)
+                    key.data.close()
+            if self.__closing and len(self.__selector.get_map()) == 1 and self.__registrations.empty():
+                break
+
+    def close(self, timeout: float = 10):
+        """Wait until all pipes reach EOF (background processes of a job may keep them open up to timeout)."""
+        if self.__closing:
+            return
+        self.__closing = True
+        os.write(self.__wakeup_write, b'\0')
+        self.__thread.join(timeout)
+        if self.__shared:
+            self.__shared.flush()
@@ -0,0 +1,86 @@
+"""
+File: profile.py
+Description: Per-command resource accounting written as TSV and Chrome trace (Perfetto) timeline.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from json import dump
+from resource import struct_rusage, getrusage, RUSAGE_SELF
+from time import monotonic, time
+from typing import List
+from exec_cmds_lib.job import Job
+
+PROFILE_HEADER = ('job', 'attempt', 'exit_code', 'threads', 'mem', 'start', 'wall_time', 'user_time', 'sys_time',
+                  'cpu_usage', 'max_rss', 'command')
+
+
+class Profiler:
+    """
+    Wall time, user/sys CPU time and peak RSS of every finished command attempt. The rusage returned by wait4
+    covers the shell and all the processes it waited for, so the CPU time of pipelines is included and
+    max RSS is that of the largest process. Times are seconds since the profiler was created, RSS is in KB.
+    Linux keeps the peak RSS of the forking process across exec, so a peak RSS not above that of this process
+    only tells that the command used less memory than the scheduler, it is reported as NA.
+    """
+    def __init__(self):
+        self.origin = monotonic()
+        self.origin_epoch = time()
+        self.records: List[tuple] = []
+
+    def record(self, job: Job, start: float, end: float, exit_code: int, rusage: struct_rusage):
+        """Record one attempt of job, start and end are time.monotonic() values."""
+        wall_time = end - start
+        cpu_time = rusage.ru_utime + rusage.ru_stime
+        max_rss = rusage.ru_maxrss if rusage.ru_maxrss > getrusage(RUSAGE_SELF).ru_maxrss else 'NA'
+        self.records.append(
+            (
+                job.index + 1, job.attempts, exit_code, job.threads, job.mem,
+                round(start - self.origin, 3), round(wall_time, 3),
+                round(rusage.ru_utime, 3), round(rusage.ru_stime, 3),
+                round(cpu_time / wall_time, 2) if wall_time else 0.0,
+                max_rss, job.command.splitlines()[0]
+            )
+        )
+
+    def write_tsv(self, path: str):
+        with open(path, 'w') as o:
+            o.write('\t'.join(PROFILE_HEADER) + '\n')
+            for record in sorted(self.records, key=lambda i: i[5]):
+                o.write('\t'.join(str(i) for i in record) + '\n')
+
+    def write_trace(self, path: str):
+        """
+        Write Chrome trace event JSON, open it with chrome://tracing or https://ui.perfetto.dev.
+        Overlapping commands are placed on different rows, so the number of rows is the peak concurrency.
+        """
+        events, lane_ends = [], []
+        for record in sorted(self.records, key=lambda i: i[5]):
+            job_num, attempt, exit_code, threads, mem, start, wall_time, user_time, sys_time, cpu_usage, max_rss, command = record
+            lane = next((i for i, lane_end in enumerate(lane_ends) if lane_end <= start), len(lane_ends))
+            if lane == len(lane_ends):
+                lane_ends.append(0)
+            lane_ends[lane] = start + wall_time
+            events.append(
+                {
+                    'name': command[:80], 'cat': 'command' if exit_code == 0 else 'failed', 'ph': 'X',
+                    'ts': int(start * 1e6), 'dur': int(wall_time * 1e6), 'pid': 1, 'tid': lane + 1,
+                    'args': {
+                        'job': job_num, 'attempt': attempt, 'exit_code': exit_code, 'threads': threads,
+                        'mem': mem, 'user_time': user_time, 'sys_time': sys_time, 'cpu_usage': cpu_usage,
+                        'max_rss_kb': None if max_rss == 'NA' else max_rss, 'command': command
+                    }
+                }
+            )
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'exec_cmds'}})
+        events.extend(
+            {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': lane + 1, 'args': {'name': f'slot {lane + 1}'}}
+            for lane in range(len(lane_ends))
+        )
+        with open(path, 'w') as o:
+            dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'start_epoch': self.origin_epoch}}, o)
+
+    def write(self, prefix: str):
+        """Write <prefix>.tsv and <prefix>.trace.json."""
+        self.write_tsv(f'{prefix}.tsv')
+        self.write_trace(f'{prefix}.trace.json')
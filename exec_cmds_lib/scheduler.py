@@ -0,0 +1,160 @@
+"""
+File: scheduler.py
+Description: Resource-aware shell command scheduler with retry.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+import os
+from datetime import datetime
+from getpass import getuser
+from socket import gethostname
+from subprocess import Popen
+from time import monotonic
+from typing import List, Dict, Callable
+import click
+from exec_cmds_lib.job import Job
+from exec_cmds_lib.journal import Journal
+from exec_cmds_lib.output import JobOutput
+from exec_cmds_lib.profile import Profiler
+
+
+def total_memory() -> int:
+    """Physical memory of this machine in bytes."""
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+
+
+class Scheduler:
+    """
+    Run jobs with at most num_processing jobs at the same time, and never more threads or memory than the budget.
+    Jobs are started in file order once all their dependencies succeeded, a job that does not fit is passed over
+    so that smaller jobs behind it can fill the idle slots. Finished children are reaped with os.wait4.
+    up_to_date(job) lets a ready job be skipped, on_success(job) is called after a job succeeded.
+    The rusage of every finished attempt is recorded by profiler if given. Output of jobs is streamed by output
+    (terminal by default), which is closed when all jobs finished.
+    """
+    def __init__(self,
+                 jobs: List[Job],
+                 num_processing: int,
+                 cpus: int = None,
+                 mem: int = None,
+                 journal: Journal = None,
+                 retry: int = 0,
+                 up_to_date: Callable[[Job], bool] = None,
+                 on_success: Callable[[Job], None] = None,
+                 profiler: Profiler = None,
+                 output: JobOutput = None):
+        self.cpus = cpus or os.cpu_count()
+        self.mem = mem or total_memory()
+        self.num_processing = num_processing
+        self.journal = journal
+        self.retry = retry
+        self.up_to_date = up_to_date
+        self.on_success = on_success
+        self.profiler = profiler
+        self.output = output or JobOutput()
+        self.pending = list(jobs)
+        self.done = set()
+        self.failed = []
+        self.__running: Dict[int, tuple] = {}
+        self.__used_cpus = 0
+        self.__used_mem = 0
+        for job in self.pending:
+            if job.threads > self.cpus or job.mem > self.mem:
+                click.echo(f'\033[33mWarning: job {job.index + 1} needs more resources than the budget, '
+                           f'it will run alone.\033[0m', err=True)
+                job.threads, job.mem = min(job.threads, self.cpus), min(job.mem, self.mem)
+
+    def __fits(self, job: Job) -> bool:
+        return len(self.__running) < self.num_processing and \
+            self.__used_cpus + job.threads <= self.cpus and \
+            self.__used_mem + job.mem <= self.mem
+
+    def __start(self, job: Job):
+        click.echo(f'\033[33m[{getuser()}@{gethostname()}: {datetime.now().replace(microsecond=0)}]\n'
+                   f'$ \033[0m\033[36m{job.command}\033[0m', err=True)
+        stdout, stderr = self.output.open(job)
+        try:
+            process = Popen(job.command, shell=True, executable='/bin/bash', stdout=stdout, stderr=stderr)
+        finally:
+            os.close(stdout)
+            os.close(stderr)
+        job.attempts += 1
+        if self.journal:
+            self.journal.start(job)
+        self.__running[process.pid] = (job, process, monotonic())
+        self.__used_cpus += job.threads
+        self.__used_mem += job.mem
+
+    def __reap(self):
+        pid, status, rusage = os.wait4(-1, 0)
+        end = monotonic()
+        if pid not in self.__running:
+            return
+        job, process, start = self.__running.pop(pid)
+        process.returncode = exit_code = os.waitstatus_to_exitcode(status)
+        self.__used_cpus -= job.threads
+        self.__used_mem -= job.mem
+        if self.journal:
+            self.journal.finish(job, exit_code, end - start)
+        if self.profiler:
+            self.profiler.record(job, start, end, exit_code, rusage)
+        if exit_code == 0:
+            self.done.add(job.index)
+            if self.on_success:
+                self.on_success(job)
+        if exit_code != 0:
+            click.echo(f'\033[31mError: command exited with code {exit_code} '
+                       f'(attempt {job.attempts}/{self.retry + 1}): {job.command}\033[0m', err=True)
+            if job.attempts <= self.retry:
+                self.pending.insert(0, job)
+            else:
+                self.failed.append(job)
+
+    def __dispatch(self) -> bool:
+        """
+        Start or skip ready jobs, return whether any job was skipped (its dependents may be ready now).
+        up_to_date is only asked once a job fits, so that a costly check (eg. hashing inputs) of a job runs
+        right before it would start rather than for every ready job up front.
+        """
+        skipped = False
+        for job in list(self.pending):
+            if not job.dependencies <= self.done or not self.__fits(job):
+                continue
+            self.pending.remove(job)
+            if self.up_to_date and self.up_to_date(job):
+                self.done.add(job.index)
+                skipped = True
+                click.echo(f'\033[32mSkip up to date job {job.index + 1}: {job.command.splitlines()[0]}\033[0m', err=True)
+            else:
+                self.__start(job)
+        return skipped
+
+    def run(self) -> List[Job]:
+        """
+        Run all pending jobs.
+        :return: Jobs that still failed after all retries.
+        """
+        try:
+            while self.pending or self.__running:
+                while self.__dispatch():
+                    pass
+                if not self.__running:
+                    # nothing can start any more, the remaining jobs wait for failed jobs
+                    for job in self.pending:
+                        click.echo(f'\033[31mError: job {job.index + 1} is not run because its dependencies failed: '
+                                   f'{job.command.splitlines()[0]}\033[0m', err=True)
+                    self.failed.extend(self.pending)
+                    self.pending = []
+                    break
+                self.__reap()
+        except KeyboardInterrupt:
+            for job, process, start in self.__running.values():
+                process.terminate()
+                process.wait()
+                if self.journal:
+                    self.journal.finish(job, process.returncode, monotonic() - start, 'killed')
+            raise
+        finally:
+            self.output.close()
+        return self.failed
@@ -0,0 +1,234 @@
+"""
+File: work_queue.py
+Description: SQLite work queue on shared filesystem, serving commands to workers on several nodes with leases.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+import sqlite3
+from os import getpid, close
+from socket import gethostname
+from subprocess import Popen
+from time import time, sleep, monotonic
+from typing import List, Tuple, Dict, Optional
+import click
+from exec_cmds_lib.job import Job
+from exec_cmds_lib.output import JobOutput
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    command TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    expired INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expire REAL,
+    exit_code INTEGER,
+    start_time REAL,
+    end_time REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)
+"""
+# A command whose lease expired this many times (it may bring down the node) is failed.
+MAX_EXPIRED = 3
+
+
+class WorkQueue:
+    """
+    Commands of a run as rows of a SQLite file (pending -> leased -> done/failed). Workers claim the first pending
+    command in a write transaction and hold it with a lease they renew while it runs. A failed command is
+    returned to pending until it has been tried retry + 1 times. A lease that expires (dead worker or node)
+    returns the command to pending without counting the attempt, up to MAX_EXPIRED times.
+    The rollback journal is used instead of WAL, because WAL needs shared memory that network filesystems lack.
+    Lease times are wall-clock times, so the clocks of nodes should be synchronized (NTP).
+    """
+    def __init__(self, path: str, timeout: float = 120):
+        self.path = path
+        self.__connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.__connection.execute('PRAGMA journal_mode=DELETE')
+        self.__connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.__connection.close()
+
+    def __transaction(self):
+        """Exclusive write transaction, so that two workers never claim the same command."""
+        self.__connection.execute('BEGIN IMMEDIATE')
+        return self.__connection
+
+    def __meta(self, name: str, default: str = None) -> Optional[str]:
+        row = self.__connection.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else default
+
+    def submit(self, jobs: List[Job], retry: int = 0, resume: bool = False) -> int:
+        """
+        Replace the commands of the queue with jobs, with resume commands that are done are kept and not resubmitted.
+        :return: Number of submitted commands.
+        """
+        with self.__transaction() as connection:
+            done = set()
+            if resume:
+                done = {row[0] for row in connection.execute("SELECT key FROM tasks WHERE status = 'done'")}
+                connection.execute("DELETE FROM tasks WHERE status != 'done'")
+            else:
+                connection.execute('DELETE FROM tasks')
+            rows = [(job.key, job.command) for job in jobs if job.key not in done]
+            connection.executemany("INSERT INTO tasks (key, command, status) VALUES (?, ?, 'pending')", rows)
+            connection.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', [('retry', str(retry)), ('closed', '1')])
+        return len(rows)
+
+    def claim(self, worker: str, lease: float) -> Optional[Job]:
+        """Requeue commands with expired leases, then lease the first pending command to worker."""
+        now = time()
+        with self.__transaction() as connection:
+            connection.execute(
+                """
+                UPDATE tasks SET
+                    status = CASE WHEN expired + 1 < ? THEN 'pending' ELSE 'failed' END,
+                    attempts = attempts - 1, expired = expired + 1, worker = NULL
+                WHERE status = 'leased' AND lease_expire < ?
+                """,
+                (MAX_EXPIRED, now)
+            )
+            row = connection.execute("SELECT id, command FROM tasks WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                """
+                UPDATE tasks SET status = 'leased', worker = ?, lease_expire = ?, attempts = attempts + 1,
+                    start_time = ?, end_time = NULL, exit_code = NULL
+                WHERE id = ?
+                """,
+                (worker, now + lease, now, row[0])
+            )
+        return Job(row[0] - 1, row[1])
+
+    def renew(self, task_ids: List[int], worker: str, lease: float):
+        """Extend leases of the commands that worker is still running."""
+        with self.__transaction() as connection:
+            connection.executemany(
+                "UPDATE tasks SET lease_expire = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                [(time() + lease, task_id, worker) for task_id in task_ids]
+            )
+
+    def complete(self, task_id: int, worker: str, exit_code: int):
+        """Record the result of a command, ignored if its lease has expired and it was given to another worker."""
+        with self.__transaction() as connection:
+            max_attempts = int(self.__meta('retry', '0')) + 1
+            connection.execute(
+                """
+                UPDATE tasks SET
+                    status = CASE WHEN ? = 0 THEN 'done' WHEN attempts < ? THEN 'pending' ELSE 'failed' END,
+                    exit_code = ?, end_time = ?, worker = NULL
+                WHERE id = ? AND worker = ? AND status = 'leased'
+                """,
+                (exit_code, max_attempts, exit_code, time(), task_id, worker)
+            )
+
+    def release(self, task_ids: List[int], worker: str):
+        """Return commands of a stopped worker to pending without counting the attempt."""
+        with self.__transaction() as connection:
+            connection.executemany(
+                "UPDATE tasks SET status = 'pending', attempts = attempts - 1, worker = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                [(task_id, worker) for task_id in task_ids]
+            )
+
+    def counts(self) -> Dict[str, int]:
+        """Number of commands of each status."""
+        counts = dict.fromkeys(('pending', 'leased', 'done', 'failed'), 0)
+        counts.update(self.__connection.execute('SELECT status, count(*) FROM tasks GROUP BY status'))
+        return counts
+
+    def failed(self) -> List[Tuple[int, str, int]]:
+        """(id, command, exit code) of failed commands."""
+        return self.__connection.execute("SELECT id, command, exit_code FROM tasks WHERE status = 'failed'").fetchall()
+
+    def finished(self) -> bool:
+        """Whether commands have been submitted and none of them is pending or leased any more."""
+        if self.__meta('closed') != '1':
+            return False
+        counts = self.counts()
+        return counts['pending'] == 0 and counts['leased'] == 0
+
+
+class Worker:
+    """
+    Pull commands from work queue and run at most num_processing of them at the same time, until all commands
+    of the queue are finished. Leases of running commands are renewed every third of the lease time.
+    """
+    def __init__(self,
+                 queue: WorkQueue,
+                 num_processing: int,
+                 lease: float = 300,
+                 output: JobOutput = None,
+                 poll_interval: float = 0.5):
+        self.queue = queue
+        self.num_processing = num_processing
+        self.lease = lease
+        self.output = output or JobOutput()
+        self.poll_interval = poll_interval
+        self.name = f'{gethostname()}:{getpid()}'
+        self.num_done = 0
+
+    def __start(self, job: Job) -> Popen:
+        stdout, stderr = self.output.open(job)
+        try:
+            return Popen(job.command, shell=True, executable='/bin/bash', stdout=stdout, stderr=stderr)
+        finally:
+            close(stdout)
+            close(stderr)
+
+    def run(self) -> int:
+        """
+        Run commands until the queue is finished.
+        :return: Number of commands this worker ran.
+        """
+        running: Dict[int, Tuple[Job, Popen]] = {}
+        last_renew = monotonic()
+        try:
+            while True:
+                progressed = False
+                while len(running) < self.num_processing:
+                    job = self.queue.claim(self.name, self.lease)
+                    if job is None:
+                        break
+                    progressed = True
+                    click.echo(f'\033[33m[{self.name}] job {job.index + 1}\033[0m: \033[36m{job.command}\033[0m', err=True)
+                    running[job.index + 1] = (job, self.__start(job))
+                for task_id, (job, process) in list(running.items()):
+                    exit_code = process.poll()
+                    if exit_code is None:
+                        continue
+                    del running[task_id]
+                    progressed = True
+                    self.queue.complete(task_id, self.name, exit_code)
+                    self.num_done += 1
+                    if exit_code != 0:
+                        click.echo(f'\033[31mError: job {task_id} exited with code {exit_code}: {job.command}\033[0m',
+                                   err=True)
+                if running and monotonic() - last_renew > self.lease / 3:
+                    self.queue.renew(list(running), self.name, self.lease)
+                    last_renew = monotonic()
+                if not running and self.queue.finished():
+                    break
+                if not progressed:
+                    sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            for job, process in running.values():
+                process.terminate()
+                process.wait()
+            self.queue.release(list(running), self.name)
+            raise
+        finally:
+            self.output.close()
+        return self.num_done
@@ -0,0 +1,5 @@
+from expression_lib.binary_matrix import (is_binary_matrix, write_binary_matrix, read_binary_matrix,
+                                          read_in_gene_expression_as_dataframe)
+from expression_lib.correlation import read_exp_matrix, correlation_tiles
+
+__version__ = '0.1.0'
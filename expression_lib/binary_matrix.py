@@ -0,0 +1,94 @@
+"""
+File: binary_matrix.py
+Description: Memory-mappable binary gene expression matrix format.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from json import dumps, loads
+from os.path import isfile
+from typing import Union, List, Tuple
+import numpy as np
+from pandas import DataFrame
+from pybioinformatic import read_in_gene_expression_as_dataframe as read_in_text_matrix
+from file_io_lib import detect_table_format, read_table_file
+
+# File layout: MAGIC | header length (uint64, little endian) | JSON header | padding | C-order matrix.
+# The matrix starts at a multiple of ALIGNMENT bytes so that it can be memory mapped directly.
+MAGIC = b'BIOPYEXP'
+ALIGNMENT = 64
+
+
+def is_binary_matrix(file: str) -> bool:
+    """Whether file is a binary expression matrix written by write_binary_matrix."""
+    if not isinstance(file, str) or not isfile(file):
+        return False
+    with open(file, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write_binary_matrix(df: DataFrame, out_file: str, dtype: str = 'float32') -> None:
+    """
+    Write gene expression matrix as memory-mappable binary file.
+    :param df: Gene expression matrix (index=gene id, columns=sample name). (type=pandas.DataFrame)
+    :param out_file: Output file. (type=str)
+    :param dtype: Data type of expression value, float32 or float64. (type=str, default=float32)
+    :return: None
+    """
+    header = dumps(
+        {
+            'dtype': np.dtype(dtype).str,
+            'shape': list(df.shape),
+            'index_name': df.index.name,
+            'genes': [str(i) for i in df.index],
+            'samples': [str(i) for i in df.columns]
+        }
+    ).encode()
+    prefix_len = len(MAGIC) + 8 + len(header)
+    padding = -prefix_len % ALIGNMENT
+    with open(out_file, 'wb') as o:
+        o.write(MAGIC)
+        o.write(len(header).to_bytes(8, 'little'))
+        o.write(header)
+        o.write(b'\0' * padding)
+        np.ascontiguousarray(df.to_numpy(dtype=dtype)).tofile(o)
+
+
+def _read_header(file: str) -> Tuple[dict, int]:
+    with open(file, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{file} is not a binary expression matrix file.')
+        header_len = int.from_bytes(f.read(8), 'little')
+        header = loads(f.read(header_len))
+    offset = len(MAGIC) + 8 + header_len
+    return header, offset + -offset % ALIGNMENT
+
+
+def read_binary_matrix(file: str) -> Tuple[List[str], List[str], np.ndarray]:
+    """
+    Memory map binary gene expression matrix file, nothing is parsed except the header.
+    :param file: Binary gene expression matrix file. (type=str)
+    :return: tuple(gene_ids, sample_names, read-only matrix)
+    """
+    header, offset = _read_header(file)
+    shape = tuple(header['shape'])
+    if not all(shape):
+        return header['genes'], header['samples'], np.empty(shape, dtype=header['dtype'])
+    matrix = np.memmap(file, dtype=header['dtype'], mode='r', offset=offset, shape=shape)
+    return header['genes'], header['samples'], matrix
+
+
+def read_in_gene_expression_as_dataframe(gene_exp_file: str) -> Union[str, DataFrame]:
+    """
+    Read in gene expression matrix as DataFrame, binary matrix files are memory mapped instead of parsed.
+    :param gene_exp_file: Gene expression file. (support format: binary, parquet, feather, txt, xls, xlsx, and csv)
+    :return: DataFrame, or error message string if file format is unrecognised.
+    """
+    if is_binary_matrix(gene_exp_file):
+        genes, samples, matrix = read_binary_matrix(gene_exp_file)
+        df = DataFrame(matrix, index=genes, columns=samples, copy=False)
+        df.index.name = _read_header(gene_exp_file)[0]['index_name']
+        return df
+    if detect_table_format(gene_exp_file) != 'tsv':
+        return read_table_file(gene_exp_file, index_col=0)
+    return read_in_text_matrix(gene_exp_file)
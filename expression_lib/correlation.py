@@ -0,0 +1,387 @@
+"""
+File: correlation.py
+Description: Blocked all-pairs correlation (Pearson, Spearman, Kendall and partial) engine for gene expression matrices.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from io import TextIOWrapper
+from multiprocessing import get_context
+from typing import Union, List, Tuple, Iterator, Callable
+import numpy as np
+from scipy.special import stdtr, erfc
+from scipy.stats import rankdata
+from expression_lib.binary_matrix import is_binary_matrix, read_binary_matrix
+from file_io_lib import detect_table_format, read_table_file
+
+METHODS = ('pearson', 'spearman', 'kendall')
+
+# Max number of values of the arrays sorted at once by kendall, bounds memory whatever the number of samples.
+KENDALL_BATCH_SIZE = 1 << 22
+
+# Matrices shared with worker processes (inherited by fork, never pickled per task).
+_shared = {}
+
+
+def read_exp_matrix(exp_matrix_file: Union[str, TextIOWrapper],
+                    min_exp: float = None) -> Tuple[List[str], np.ndarray]:
+    """
+    Read in gene expression matrix file as gene id list and expression array.
+    :param exp_matrix_file: Gene expression matrix file, header must start with "Geneid", or binary/parquet/feather matrix file. (type=str|TextIOWrapper)
+    :param min_exp: Genes whose expression is less than this value in any sample are filtered out. (type=float, default=None)
+    :return: tuple(gene_ids, matrix)
+    """
+    file_name = getattr(exp_matrix_file, 'name', exp_matrix_file)
+    if is_binary_matrix(file_name):
+        # The memory map is returned as it is (in its own dtype), only filtering out genes makes a compact copy.
+        gene_ids, _, matrix = read_binary_matrix(file_name)
+        if min_exp is not None:
+            keep = (matrix >= min_exp).all(axis=1)
+            if not keep.all():
+                gene_ids, matrix = [gene_id for gene_id, k in zip(gene_ids, keep) if k], matrix[keep]
+        return gene_ids, matrix
+    if detect_table_format(file_name) != 'tsv':
+        df = read_table_file(file_name, index_col=0)
+        if min_exp is not None:
+            df = df[(df >= min_exp).all(axis=1)]
+        return df.index.astype(str).tolist(), df.to_numpy(dtype=np.float64)
+    if isinstance(exp_matrix_file, str):
+        exp_matrix_file = open(exp_matrix_file)
+    gene_ids, rows = [], []
+    for line in exp_matrix_file:
+        if line.startswith('Geneid') or not line.strip():
+            continue
+        split = line.strip().split('\t')
+        values = [float(i) for i in split[1:]]
+        if min_exp is None or all(i >= min_exp for i in values):
+            gene_ids.append(split[0])
+            rows.append(values)
+    return gene_ids, np.array(rows, dtype=np.float64)
+
+
+def standardize(matrix: np.ndarray) -> np.ndarray:
+    """
+    Center each row and scale it to unit norm, so that the dot product of two rows is their Pearson r.
+    Rows with zero variance become NaN, just like scipy.stats.pearsonr.
+    :param matrix: Expression array (genes x samples). (type=numpy.ndarray)
+    :return: Standardized array.
+    """
+    matrix = matrix - matrix.mean(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def residualize(matrix: np.ndarray, covariates: np.ndarray) -> np.ndarray:
+    """
+    Remove the linear effect of covariates (and intercept) from each row, used for partial correlation.
+    :param matrix: Expression array (genes x samples). (type=numpy.ndarray)
+    :param covariates: Covariate array (covariates x samples). (type=numpy.ndarray)
+    :return: Residual array.
+    """
+    design = np.column_stack([np.ones(matrix.shape[1]), covariates.T])
+    hat = design @ np.linalg.pinv(design)
+    return matrix - matrix @ hat.T
+
+
+def pearson_p_value(r: np.ndarray, dof: int) -> np.ndarray:
+    """
+    Two-sided p value of Pearson (or Spearman) r from the t-distribution.
+    :param r: Correlation coefficient array. (type=numpy.ndarray)
+    :param dof: Degrees of freedom, number of samples - 2 - number of covariates. (type=int)
+    :return: P value array.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.abs(r) * np.sqrt(dof / (1.0 - r * r))
+    return 2 * stdtr(dof, -t)
+
+
+def count_inversions(a: np.ndarray) -> np.ndarray:
+    """
+    Number of pairs j < k with a[j] > a[k] of each row, O(n log n) per row without any comparison sort.
+    Rows are stably partitioned by the bits of the values from the highest bit down (MSD radix sort), each bit
+    is one linear pass: within a group sharing the higher bits, an element with a 0 bit forms an inversion with every
+    element before it having a 1 bit. Every inversion is counted once, at the highest bit where the two values differ.
+    :param a: Integer array (rows x n) with values in [0, n). (type=numpy.ndarray)
+    :return: Inversion count of each row.
+    """
+    rows, n = a.shape
+    dtype = np.int32 if rows * (n + 1) < 1 << 31 else np.int64
+    a = a.astype(dtype)
+    row_offset = np.arange(rows, dtype=dtype)[:, None] * n
+    counts = np.bincount((a + row_offset).ravel(), minlength=rows * n).astype(dtype).reshape(rows, n)
+    # below[v] of a row is the flat position where value v starts once the row is sorted
+    below = np.concatenate([np.cumsum(counts, axis=1, dtype=dtype) - counts + row_offset, row_offset + n], axis=1)
+    below = below.ravel()
+    below_offset = np.arange(rows, dtype=dtype)[:, None] * (n + 1)
+    position = np.arange(rows * n, dtype=dtype).reshape(rows, n)
+    inversions = np.zeros(rows, dtype=np.int64)
+    for b in reversed(range((n - 1).bit_length())):
+        bit = (a >> b) & 1
+        group_start = below[(a >> (b + 1) << (b + 1)) + below_offset]
+        ones = np.cumsum(bit, axis=1, dtype=dtype)
+        ones -= bit
+        ones_before = ones - ones.ravel()[group_start]
+        inversions += ones_before.sum(axis=1, dtype=np.int64) - (ones_before * bit).sum(axis=1, dtype=np.int64)
+        # stable partition of each group, elements with a 0 bit first
+        target = np.where(bit, below[(a >> b << b) + below_offset] + ones_before, position - ones_before)
+        partitioned = np.empty(rows * n, dtype=dtype)
+        partitioned[target] = a
+        a = partitioned.reshape(rows, n)
+    return inversions
+
+
+def _tied_pairs(same: np.ndarray) -> np.ndarray:
+    # Number of tied pairs of each row from flags telling whether element k + 1 equals element k (sorted rows).
+    position = np.arange(1, same.shape[1] + 1)
+    run_start = np.maximum.accumulate(np.where(same, 0, position), axis=1)
+    return (position - run_start).sum(axis=1)
+
+
+def kendall_s(x: np.ndarray, y: np.ndarray, x_tie: np.ndarray, y_tie: np.ndarray) -> np.ndarray:
+    """
+    Concordant minus discordant pairs of each row pair (x[k], y[k]) by Knight's O(n log n) algorithm:
+    sort by x then y, the discordant pairs are the inversions of y in that order.
+    :param x: Dense ranks (rows x samples, values in [0, samples)) of x genes. (type=numpy.ndarray)
+    :param y: Dense ranks of y genes, paired with x row by row. (type=numpy.ndarray)
+    :param x_tie: Number of pairs tied in x of each row. (type=numpy.ndarray)
+    :param y_tie: Number of pairs tied in y of each row. (type=numpy.ndarray)
+    :return: S of each row pair.
+    """
+    n = x.shape[1]
+    key = x.astype(np.int64) * n + y
+    order = np.argsort(key, axis=1)
+    key = np.take_along_axis(key, order, axis=1)
+    joint_tie = _tied_pairs(key[:, 1:] == key[:, :-1])
+    return n * (n - 1) // 2 - x_tie - y_tie + joint_tie - 2 * count_inversions(key % n)
+
+
+def kendall_tie_stats(matrix: np.ndarray) -> np.ndarray:
+    """
+    Tie statistics of each row used by the variance of Kendall tau-b (same as scipy.stats.kendalltau).
+    :param matrix: Expression array (genes x samples). (type=numpy.ndarray)
+    :return: Array (genes x 3) of sum(t(t-1)/2), sum(t(t-1)(t-2)) and sum(t(t-1)(2t+5)) over tie groups.
+    """
+    stats = np.zeros((matrix.shape[0], 3))
+    for i, row in enumerate(matrix):
+        t = np.unique(row, return_counts=True)[1].astype(np.float64)
+        t = t[t > 1]
+        stats[i] = (t * (t - 1) / 2).sum(), (t * (t - 1) * (t - 2)).sum(), (t * (t - 1) * (2 * t + 5)).sum()
+    return stats
+
+
+def _kendall_exact_cdf(n: int) -> np.ndarray:
+    # Null distribution of the number of discordant pairs without ties (Mahonian numbers / n!).
+    # It is only needed in full for n <= 33; beyond that only the two most extreme values are used.
+    tot = n * (n - 1) // 2
+    if n > 33:
+        return np.array([1.0, n]) / np.prod(np.arange(1, n + 1, dtype=np.float64))
+    pmf = np.ones(1)
+    for j in range(2, n + 1):
+        pmf = np.convolve(pmf, np.ones(j)) / j
+    return np.cumsum(pmf[:tot + 1])
+
+
+def kendall_p_value(s: np.ndarray, n: int, x_stats: np.ndarray, y_stats: np.ndarray) -> np.ndarray:
+    """
+    Two-sided p value of Kendall tau-b, exact for small samples without ties and asymptotic otherwise,
+    following the 'auto' method of scipy.stats.kendalltau.
+    :param s: Number of concordant minus discordant pairs. (type=numpy.ndarray)
+    :param n: Number of samples. (type=int)
+    :param x_stats: Tie statistics of x genes, broadcastable with s. (type=numpy.ndarray)
+    :param y_stats: Tie statistics of y genes, broadcastable with s. (type=numpy.ndarray)
+    :return: P value array.
+    """
+    tot = n * (n - 1) // 2
+    x_tie, x0, x1 = x_stats[..., 0], x_stats[..., 1], x_stats[..., 2]
+    y_tie, y0, y1 = y_stats[..., 0], y_stats[..., 1], y_stats[..., 2]
+    m = n * (n - 1.0)
+    var = (m * (2 * n + 5) - x1 - y1) / 18 + 2 * x_tie * y_tie / m + x0 * y0 / (9 * m * (n - 2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = np.minimum(erfc(np.abs(s) / np.sqrt(2 * var)), 1.0)
+    # Without ties, s = tot - 2 * discordant.
+    dis = np.rint((tot - s) / 2)
+    extreme = np.minimum(dis, tot - dis).astype(np.int64)
+    exact = (x_tie == 0) & (y_tie == 0) & ((n <= 33) | (extreme <= 1))
+    if np.any(exact):
+        cdf = _kendall_exact_cdf(n)
+        p = np.where(exact, np.minimum(2 * cdf[np.minimum(extreme, len(cdf) - 1)], 1.0), p)
+    # Genes with a constant expression have no defined tau.
+    return np.where((x_tie == tot) | (y_tie == tot), np.nan, p)
+
+
+def prepare_matrix(matrix: np.ndarray, method: str, covariates: np.ndarray = None) -> np.ndarray:
+    """
+    Transform expression array once so that correlation of any two rows is obtained from their dot product.
+    :param matrix: Expression array (genes x samples). (type=numpy.ndarray)
+    :param method: Correlation method, pearson, spearman or kendall. (type=str)
+    :param covariates: Covariate array (covariates x samples) for partial correlation. (type=numpy.ndarray, default=None)
+    :return: Standardized (ranked) array for pearson and spearman, dense ranks (from 0) for kendall.
+    """
+    if method == 'kendall':
+        if covariates is not None:
+            raise ValueError('Partial correlation is not supported by kendall method.')
+        return (rankdata(matrix, method='dense', axis=1) - 1).astype(np.int32)
+    if method == 'spearman':
+        matrix = rankdata(matrix, axis=1)
+    if covariates is not None:
+        matrix = residualize(matrix, covariates)
+    return standardize(matrix)
+
+
+def select_hits(r: np.ndarray,
+                p_value: Callable[[Tuple[np.ndarray, np.ndarray]], np.ndarray],
+                min_abs_r: float = None,
+                max_p: float = None,
+                top_k: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Select pairs of a tile whose |r| and p pass the thresholds, keeping at most top_k pairs with the highest |r| per row.
+    :param r: Correlation coefficient array of a tile. (type=numpy.ndarray)
+    :param p_value: Function that calculates p of the pairs indexed by (rows, columns). (type=Callable)
+    :param min_abs_r: Min absolute value of r. (type=float, default=None)
+    :param max_p: Max p value. (type=float, default=None)
+    :param top_k: Max number of pairs kept for each row. (type=int, default=None)
+    :return: tuple(row_indexes, column_indexes, p) of selected pairs, sorted by row then column.
+    """
+    abs_r = np.nan_to_num(np.abs(r), nan=-1.0)
+    rows, cols = np.nonzero(abs_r >= (min_abs_r if min_abs_r is not None else 0.0))
+    p = p_value((rows, cols))
+    if max_p is not None:
+        keep = p <= max_p
+        rows, cols, p = rows[keep], cols[keep], p[keep]
+    if top_k is not None:
+        order = np.lexsort((-abs_r[rows, cols], rows))
+        sorted_rows = rows[order]
+        starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+        rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        keep = np.sort(order[rank < top_k])
+        rows, cols, p = rows[keep], cols[keep], p[keep]
+    return rows, cols, p
+
+
+def format_tile(x_ids: List[str], y_ids: List[str], r: np.ndarray, p: np.ndarray) -> str:
+    """Format all pairs of one tile as "x\\ty\\tr\\tp" lines."""
+    lines = [
+        f'{x_id}\t{y_id}\t{r_value}\t{p_value}'
+        for x_id, r_row, p_row in zip(x_ids, r.tolist(), p.tolist())
+        for y_id, r_value, p_value in zip(y_ids, r_row, p_row)
+    ]
+    return '\n'.join(lines)
+
+
+def format_hits(x_ids: List[str],
+                y_ids: List[str],
+                rows: np.ndarray,
+                cols: np.ndarray,
+                r: np.ndarray,
+                p: np.ndarray) -> str:
+    """Format selected pairs of one tile as "x\\ty\\tr\\tp" lines."""
+    lines = [
+        f'{x_ids[row]}\t{y_ids[col]}\t{r_value}\t{p_value}'
+        for row, col, r_value, p_value in zip(rows.tolist(), cols.tolist(), r.tolist(), p.tolist())
+    ]
+    return '\n'.join(lines)
+
+
+def _init_worker(shared: dict):
+    _shared.update(shared)
+
+
+def _correlation_tile(start: int, end: int) -> Tuple[np.ndarray, Callable]:
+    # Return r of the tile and a function calculating p of the pairs indexed by (rows, columns), or of all pairs.
+    # x is prepared tile by tile (every transform is per row), so workers only read the shared (memory mapped) x.
+    x_block = prepare_matrix(np.asarray(_shared['x'][start:end], dtype=np.float64), _shared['method'],
+                             _shared['covariates'])
+    y, n = _shared['y'], _shared['n']
+    if _shared['method'] != 'kendall':
+        r = np.clip(x_block @ y.T, -1.0, 1.0)
+        return r, lambda index=None: pearson_p_value(r if index is None else r[index], _shared['dof'])
+    x_stats, y_stats = _shared['x_stats'][start:end], _shared['y_stats']
+    # Pairs of the tile are processed in batches of at most KENDALL_BATCH_SIZE values per array.
+    num_y = len(y)
+    s = np.empty(len(x_block) * num_y, dtype=np.float64)
+    batch_size = max(1, KENDALL_BATCH_SIZE // n)
+    for batch_start in range(0, len(s), batch_size):
+        pairs = np.arange(batch_start, min(batch_start + batch_size, len(s)))
+        rows, cols = pairs // num_y, pairs % num_y
+        s[pairs] = kendall_s(x_block[rows], y[cols], x_stats[rows, 0], y_stats[cols, 0])
+    s = s.reshape(len(x_block), num_y)
+    tot = n * (n - 1) // 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.clip(s / np.sqrt((tot - x_stats[:, 0])[:, None] * (tot - y_stats[:, 0])[None, :]), -1.0, 1.0)
+
+    def p_value(index=None):
+        if index is None:
+            return kendall_p_value(s, n, x_stats[:, None, :], y_stats[None, :, :])
+        rows, cols = index
+        return kendall_p_value(s[rows, cols], n, x_stats[rows], y_stats[cols])
+
+    return r, p_value
+
+
+def _run_tile(tile: Tuple[int, int]) -> Tuple[int, str]:
+    start, end = tile
+    x_ids, y_ids = _shared['x_ids'][start:end], _shared['y_ids']
+    r, p_value = _correlation_tile(start, end)
+    if _shared['min_abs_r'] is None and _shared['max_p'] is None and _shared['top_k'] is None:
+        return end - start, format_tile(x_ids, y_ids, r, p_value())
+    rows, cols, p = select_hits(r, p_value, _shared['min_abs_r'], _shared['max_p'], _shared['top_k'])
+    return end - start, format_hits(x_ids, y_ids, rows, cols, r[rows, cols], p)
+
+
+def correlation_tiles(x_ids: List[str],
+                      x: np.ndarray,
+                      y_ids: List[str],
+                      y: np.ndarray,
+                      method: str = 'pearson',
+                      covariates: np.ndarray = None,
+                      block_size: int = 512,
+                      num_processing: int = 1,
+                      min_abs_r: float = None,
+                      max_p: float = None,
+                      top_k: int = None) -> Iterator[Tuple[int, str]]:
+    """
+    Calculate correlation of all gene pairs between two expression matrices tile by tile.
+    Pairs are filtered inside each tile before formatting, and tiles are yielded as soon as they complete.
+    :param x_ids: Gene ids of matrix x. (type=list)
+    :param x: Expression array x (genes x samples). (type=numpy.ndarray)
+    :param y_ids: Gene ids of matrix y. (type=list)
+    :param y: Expression array y (genes x samples), must have the same samples as x. (type=numpy.ndarray)
+    :param method: Correlation method, pearson, spearman or kendall (tau-b). (type=str, default=pearson)
+    :param covariates: Covariate array (covariates x samples), if specified, calculate partial correlation. (type=numpy.ndarray, default=None)
+    :param block_size: Number of rows of x per tile. (type=int, default=512)
+    :param num_processing: Number of processing. (type=int, default=1)
+    :param min_abs_r: Only output pairs whose |r| is not less than this value. (type=float, default=None)
+    :param max_p: Only output pairs whose p value is not greater than this value. (type=float, default=None)
+    :param top_k: Only output the top k pairs with the highest |r| for each gene of x. (type=int, default=None)
+    :return: tuple(number of x genes in tile, formatted "x\\ty\\tr\\tp" text of the tile) in completion order.
+    """
+    if method not in METHODS:
+        raise ValueError(f'Unknown correlation method: {method}. It must be one of {", ".join(METHODS)}.')
+    if x.shape[1] != y.shape[1]:
+        raise ValueError(f'Number of samples differs between two matrices ({x.shape[1]} vs {y.shape[1]}).')
+    if covariates is not None and covariates.shape[1] != x.shape[1]:
+        raise ValueError(f'Number of samples differs between covariates and matrices ({covariates.shape[1]} vs {x.shape[1]}).')
+    n = x.shape[1]
+    shared = dict(
+        x_ids=x_ids,
+        x=x,
+        y_ids=y_ids,
+        y=prepare_matrix(np.asarray(y, dtype=np.float64), method, covariates),
+        covariates=covariates,
+        method=method,
+        n=n,
+        dof=n - 2 - (0 if covariates is None else covariates.shape[0]),
+        min_abs_r=min_abs_r,
+        max_p=max_p,
+        top_k=top_k
+    )
+    if method == 'kendall':
+        shared['x_stats'], shared['y_stats'] = kendall_tie_stats(x), kendall_tie_stats(y)
+    tiles = [(start, min(start + block_size, len(x_ids))) for start in range(0, len(x_ids), block_size)]
+    if num_processing <= 1:
+        _init_worker(shared)
+        yield from map(_run_tile, tiles)
+    else:
+        # fork shares x (a memory map stays a memory map) and prepared y with workers without pickling
+        with get_context('fork').Pool(num_processing, initializer=_init_worker, initargs=(shared,)) as pool:
+            yield from pool.imap_unordered(_run_tile, tiles)
@@ -1,5 +1,6 @@
 from file_format_conversion_lib.embl2fa import run as embl2fa
+from file_format_conversion_lib.exp2bin import run as exp2bin
 from file_format_conversion_lib.fq2fa import run as fq2fa
 from file_format_conversion_lib.vcf2gt import run as vcf2gt
 
-__version__ = '0.1.0'
+__version__ = '0.2.0'
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""
+File: exp2bin.py
+Description: Convert gene expression matrix to memory-mappable binary format.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from pandas import read_table, read_csv, read_excel
+import click
+from pybioinformatic import Displayer
+from expression_lib import write_binary_matrix
+displayer = Displayer(__file__.split('/')[-1], version='0.1.0')
+
+
+def main(exp_file: str, dtype: str, out_file: str):
+    function_dict = {'csv': read_csv, 'xlsx': read_excel}
+    # Tables written by this project (*.xls) are tab-delimited text, so anything else is read as TSV.
+    reader = function_dict.get(exp_file.split('.')[-1], read_table)
+    df = reader(exp_file, index_col=0)
+    write_binary_matrix(df, out_file, dtype)
+
+
+@click.command(context_settings=dict(help_option_names=['-h', '--help']))
+@click.option('-i', '--exp-file', 'exp_file',
+              metavar='<exp file>', required=True,
+              help='Input gene expression matrix file. (support format: tab-delimited text, csv, and xlsx)')
+@click.option('-d', '--dtype', 'dtype',
+              type=click.Choice(['float32', 'float64']), default='float32', show_default=True,
+              help='Data type of expression value.')
+@click.option('-o', '--output-file', 'output_file',
+              metavar='<file>', required=True,
+              help='Output binary matrix file. It can be used as input of PCC, Tau_index, CircToolKit and plot directly.')
+@click.option('-V', '--version', 'version', help='Show author and version information.',
+              is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
+def run(exp_file, dtype, output_file):
+    """Convert gene expression matrix to memory-mappable binary format."""
+    main(exp_file, dtype, output_file)
+
+
+if __name__ == '__main__':
+    run()
@@ -15,7 +15,8 @@ from pandas import read_table, concat
 from tqdm import tqdm
 import click
 from pybioinformatic import VCF, Timer, Displayer
-displayer = Displayer(__file__.split('/')[-1], version='0.2.0')
+from file_io_lib import TABLE_FORMATS, write_table_file
+displayer = Displayer(__file__.split('/')[-1], version='0.3.0')
 
 
 @Timer('Converting the vcf file to gt format.')
@@ -23,11 +24,16 @@ def main(vcf_files: Tuple[TextIOWrapper],
          output_file: TextIOWrapper,
          read_depth: int = 5,
          depth_files_dir: str = None,
-         depth_file_suffix: str = 'depth'):
+         depth_file_suffix: str = 'depth',
+         table_format: str = 'tsv'):
     if len(vcf_files) == 1 and depth_files_dir is None:
         with VCF(vcf_files[0]) as vcf:
-            for line in vcf.to_genotype():
-                click.echo(line, output_file)
+            if table_format == 'tsv':
+                for line in vcf.to_genotype():
+                    click.echo(line, output_file)
+            else:
+                gt = read_table(StringIO('\n'.join(vcf.to_genotype())), dtype=str)
+                write_table_file(gt, output_file or '-', table_format, index=False)
     else:
         # merge genotype
         dfs = []
@@ -101,6 +107,9 @@ def main(vcf_files: Tuple[TextIOWrapper],
                 click.echo(stderr, err=True)
 
         # output results
+        if table_format != 'tsv':
+            write_table_file(merge, output_file or '-', table_format, index=False)
+            return
         merge = merge.to_string(index=False, na_rep='NA').strip()
         merge = sub(r'\n +', '\n', merge)
         merge = sub(r' +', '\t', merge)
@@ -120,16 +129,20 @@ def main(vcf_files: Tuple[TextIOWrapper],
 @click.option('-o', '--output_file', 'output_file',
               metavar='<gt file|stdout>', type=click.File('w'),
               help='Output file, stdout by default.')
+@click.option('-f', '--format', 'table_format',
+              type=click.Choice(TABLE_FORMATS), default='tsv', show_default=True,
+              help='Output table format.')
 @click.option('-V', '--version', 'version', help='Show author and version information.',
               is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
-def run(vcf_files, depth_files_dir, depth_file_suffix, read_depth, output_file):
+def run(vcf_files, depth_files_dir, depth_file_suffix, read_depth, output_file, table_format):
     """Merge genotypes for all samples from vcf files."""
     main(
         vcf_files=vcf_files,
         output_file=output_file,
         read_depth=read_depth,
         depth_files_dir=depth_files_dir,
-        depth_file_suffix=depth_file_suffix
+        depth_file_suffix=depth_file_suffix,
+        table_format=table_format
     )
 
 
@@ -0,0 +1,7 @@
+from file_io_lib.chunk import split_file_by_bytes, read_lines_in_range
+from file_io_lib.compress import COMPRESS_SUFFIX, is_gzip, open_input, open_output
+from file_io_lib.parallel import map_line_batches
+from file_io_lib.table import TABLE_FORMATS, detect_table_format, table_file_name, read_table_file, write_table_file, \
+    text_table_file, iter_table_lines, write_table_rows
+
+__version__ = '0.1.0'
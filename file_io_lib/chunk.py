@@ -0,0 +1,49 @@
+"""
+File: chunk.py
+Description: Split large text files into byte ranges aligned to line boundaries for parallel scanning.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from os.path import getsize
+from typing import List, Tuple, Iterator
+
+
+def split_file_by_bytes(file: str, num_chunks: int, start: int = 0) -> List[Tuple[int, int]]:
+    """
+    Split file into byte ranges of nearly equal size, each one starts at the beginning of a line.
+    :param file: Uncompressed text file. (type=str)
+    :param num_chunks: Expected number of ranges, fewer ranges are returned for small files. (type=int)
+    :param start: Byte offset where splitting starts, e.g. behind the header. (type=int, default=0)
+    :return: List of (start, end) byte offsets in file order.
+    """
+    end = getsize(file)
+    boundaries = [start]
+    with open(file, 'rb') as f:
+        for i in range(1, num_chunks):
+            f.seek(start + (end - start) * i // num_chunks)
+            f.readline()
+            offset = f.tell()
+            if boundaries[-1] < offset < end:
+                boundaries.append(offset)
+    boundaries.append(end)
+    return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1) if boundaries[i] < boundaries[i + 1]]
+
+
+def read_lines_in_range(file: str, start: int, end: int, encoding: str = 'utf-8') -> Iterator[str]:
+    """
+    Read lines in the byte range returned by split_file_by_bytes.
+    :param file: Uncompressed text file. (type=str)
+    :param start: Start byte offset, must be the beginning of a line. (type=int)
+    :param end: End byte offset (exclusive). (type=int)
+    :param encoding: File encoding. (type=str, default=utf-8)
+    :return: Line iterator.
+    """
+    with open(file, 'rb') as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            if offset >= end:
+                break
+            offset += len(line)
+            yield line.decode(encoding)
@@ -0,0 +1,195 @@
+"""
+File: compress.py
+Description: Transparent reading and parallel writing of plain, gzip, bgzip and zstd compressed files.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+import sys
+import zlib
+from collections import deque
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from gzip import GzipFile
+from io import RawIOBase, BufferedReader, BufferedWriter, TextIOWrapper
+from queue import Queue
+from shutil import which
+from signal import SIGPIPE
+from struct import pack
+from subprocess import Popen, PIPE, DEVNULL
+from threading import Thread
+from typing import Iterator, BinaryIO, Callable
+import click
+
+GZIP_MAGIC = b'\x1f\x8b'
+# External decompressors able to use several threads (bgzip also reads plain gzip).
+THREADED_DECOMPRESSORS = (('bgzip', '-@'), ('pigz', '-p'))
+# File name suffix of each output compression method.
+COMPRESS_SUFFIX = {'gz': '.gz', 'bgz': '.gz', 'zst': '.zst'}
+# BGZF block payload size used by htslib, a stored block of this size still fits the 64 KB block limit.
+BGZF_BLOCK_SIZE = 0xff00
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+def is_gzip(file: str) -> bool:
+    """Whether file (path, or '-' for stdin) is gzip or bgzip compressed."""
+    if file == '-':
+        return sys.stdin.buffer.peek(2)[:2] == GZIP_MAGIC
+    with open(file, 'rb') as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+class ThreadedGzipReader(RawIOBase):
+    """Decompress gzip stream in a background thread (zlib releases the GIL), so parsing overlaps decompression."""
+    def __init__(self, fileobj: BinaryIO, block_size: int = 1 << 20, max_blocks: int = 16):
+        super().__init__()
+        self.__queue = Queue(max_blocks)
+        self.__block = memoryview(b'')
+        self.__eof = False
+        self.__thread = Thread(target=self.__decompress, args=(GzipFile(fileobj=fileobj), block_size), daemon=True)
+        self.__thread.start()
+
+    def __decompress(self, gz: GzipFile, block_size: int):
+        try:
+            while True:
+                block = gz.read(block_size)
+                self.__queue.put(block)
+                if not block:
+                    break
+        except Exception as e:
+            self.__queue.put(e)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self.__block:
+            if self.__eof:
+                return 0
+            block = self.__queue.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                self.__eof = True
+                return 0
+            self.__block = memoryview(block)
+        size = min(len(buffer), len(self.__block))
+        buffer[:size] = self.__block[:size]
+        self.__block = self.__block[size:]
+        return size
+
+
+@contextmanager
+def open_input(file: str, num_threads: int = 1, encoding: str = 'utf-8') -> Iterator[TextIOWrapper]:
+    """
+    Open plain or gzip/bgzip compressed text file for reading.
+    With more than one thread, bgzip or pigz is used for decompression if it is installed,
+    otherwise decompression runs in a background thread.
+    :param file: Input file, '-' means stdin. (type=str)
+    :param num_threads: Number of decompression threads. (type=int, default=1)
+    :param encoding: File encoding. (type=str, default=utf-8)
+    :return: Text stream.
+    """
+    if not is_gzip(file):
+        if file == '-':
+            yield TextIOWrapper(sys.stdin.buffer, encoding=encoding)
+        else:
+            with open(file, encoding=encoding) as f:
+                yield f
+        return
+    decompressor = next((cmd for cmd in THREADED_DECOMPRESSORS if which(cmd[0])), None)
+    if num_threads > 1 and decompressor and file != '-':
+        exe, threads_option = decompressor
+        process = Popen([which(exe), threads_option, str(num_threads), '-dc', file], stdout=PIPE, stdin=DEVNULL)
+        try:
+            yield TextIOWrapper(process.stdout, encoding=encoding)
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+        # SIGPIPE only means the reader closed the pipe on purpose before the end of file.
+        if returncode and returncode != -SIGPIPE:
+            raise click.ClickException(f'{exe} failed to decompress {file} (exit status {returncode}), '
+                                       f'the file may be truncated or corrupt.')
+        return
+    raw = sys.stdin.buffer if file == '-' else open(file, 'rb')
+    try:
+        yield TextIOWrapper(BufferedReader(ThreadedGzipReader(raw)), encoding=encoding)
+    finally:
+        if file != '-':
+            raw.close()
+
+
+def _gzip_member(data: bytes, level: int = 6) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _bgzf_blocks(data: bytes, level: int = 6) -> bytes:
+    blocks = []
+    for start in range(0, len(data), BGZF_BLOCK_SIZE):
+        chunk = data[start:start + BGZF_BLOCK_SIZE]
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        cdata = compressor.compress(chunk) + compressor.flush()
+        blocks.append(pack('<4BI2BH2BHH', 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, len(cdata) + 25))
+        blocks.append(cdata)
+        blocks.append(pack('<II', zlib.crc32(chunk), len(chunk)))
+    return b''.join(blocks)
+
+
+def _zstd_frame_compressor(level: int = 3) -> Callable[[bytes], bytes]:
+    try:
+        import zstandard
+    except ModuleNotFoundError:
+        raise ModuleNotFoundError('zstd compression needs the zstandard package, install it with "pip install zstandard".')
+    # ZstdCompressor is not thread safe, every call creates its own compressor.
+    return lambda data: zstandard.ZstdCompressor(level=level).compress(data)
+
+
+class ParallelCompressWriter(RawIOBase):
+    """
+    Compress blocks of written data as independent gzip members, BGZF blocks or zstd frames in executor threads
+    (zlib and zstd release the GIL). Concatenated results form one valid compressed file, written in order.
+    Writing only blocks when more than max_pending blocks are still being compressed.
+    """
+    def __init__(self, fileobj: BinaryIO, method: str, executor: Executor, max_pending: int = 8):
+        super().__init__()
+        compressors = {'gz': _gzip_member, 'bgz': _bgzf_blocks}
+        self.__compress = _zstd_frame_compressor() if method == 'zst' else compressors[method]
+        self.__fileobj = fileobj
+        self.__method = method
+        self.__executor = executor
+        self.__max_pending = max_pending
+        self.__pending = deque()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.__pending.append(self.__executor.submit(self.__compress, bytes(data)))
+        while len(self.__pending) > self.__max_pending:
+            self.__fileobj.write(self.__pending.popleft().result())
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        while self.__pending:
+            self.__fileobj.write(self.__pending.popleft().result())
+        if self.__method == 'bgz':
+            self.__fileobj.write(BGZF_EOF)
+        self.__fileobj.close()
+
+
+def open_output(file: str, method: str = None, executor: Executor = None, block_size: int = 4 << 20) -> BinaryIO:
+    """
+    Open binary file for writing, optionally compressed in parallel.
+    :param file: Output file. (type=str)
+    :param method: Compression method, gz, bgz, zst or None (no compression). (type=str, default=None)
+    :param executor: Executor that compresses blocks, it can be shared by several output files. (type=Executor)
+    :param block_size: Size of each independently compressed block. (type=int, default=4194304)
+    :return: Buffered binary stream.
+    """
+    if not method:
+        return open(file, 'wb', buffering=block_size)
+    return BufferedWriter(ParallelCompressWriter(open(file, 'wb'), method, executor), buffer_size=block_size)
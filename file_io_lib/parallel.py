@@ -0,0 +1,73 @@
+"""
+File: parallel.py
+Description: Apply a function to batches of lines of a text file in forked worker processes, keeping file order.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from collections import deque
+from itertools import islice
+from multiprocessing import get_context
+from os.path import isfile, getsize
+from typing import Callable, Iterable, Iterator, Tuple
+from file_io_lib.chunk import split_file_by_bytes, read_lines_in_range
+from file_io_lib.compress import is_gzip, open_input
+
+CHUNK_BYTES = 64 << 20  # size of byte ranges of uncompressed file scanned by one task
+# Function applied by worker processes, set before the pool is forked so it is never pickled.
+_func = {}
+
+
+def _apply_to_range(task: Tuple[str, int, int]) -> str:
+    file, start, end = task
+    return _func['func'](read_lines_in_range(file, start, end))
+
+
+def _apply(lines: Iterable[str]) -> str:
+    return _func['func'](lines)
+
+
+def _imap_bounded(pool, func: Callable, tasks: Iterable, max_pending: int) -> Iterator[str]:
+    """Like pool.imap, but at most max_pending tasks are submitted ahead of the result being yielded."""
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def map_line_batches(file: str,
+                     func: Callable[[Iterable[str]], str],
+                     num_threads: int = 1,
+                     batch_size: int = 100000,
+                     chunk_bytes: int = CHUNK_BYTES) -> Iterator[str]:
+    """
+    Apply func to batches of lines of file and yield its results in file order.
+    Uncompressed files are split into byte ranges of about chunk_bytes scanned by a fork pool, streams (stdin or
+    compressed) are read in batches. Either way at most 2 * num_threads batches are in flight, so memory does not
+    grow with file size. Workers are forked when iteration starts, so they share whatever func refers to
+    (eg. an index built by the caller) copy-on-write without pickling.
+    :param file: Input file, "-" means stdin, gzip and bgzip are supported. (type=str)
+    :param func: Function turning a batch of lines into output text. (type=Callable)
+    :param num_threads: Number of worker processes, 1 runs func in this process. (type=int, default=1)
+    :param batch_size: Number of lines per batch of a stream. (type=int, default=100000)
+    :param chunk_bytes: Bytes per batch of an uncompressed file. (type=int, default=64MB)
+    :return: Output text of each batch.
+    """
+    if num_threads == 1:
+        with open_input(file) as f:
+            for lines in iter(lambda: list(islice(f, batch_size)), []):
+                yield func(lines)
+        return
+    _func['func'] = func
+    if isfile(file) and not is_gzip(file):
+        num_chunks = max(num_threads, -(-getsize(file) // chunk_bytes))
+        tasks = ((file, start, end) for start, end in split_file_by_bytes(file, num_chunks))
+        with get_context('fork').Pool(num_threads) as pool:
+            yield from _imap_bounded(pool, _apply_to_range, tasks, num_threads * 2)
+        return
+    with open_input(file, num_threads) as f, get_context('fork').Pool(num_threads) as pool:
+        batches = iter(lambda: list(islice(f, batch_size)), [])
+        yield from _imap_bounded(pool, _apply, batches, num_threads * 2)
@@ -0,0 +1,180 @@
+"""
+File: table.py
+Description: Read and write tables as tab-delimited text, Parquet or Feather with automatic format detection.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from io import TextIOWrapper
+from os.path import isfile
+from typing import Union, Literal, Iterator, Iterable, List
+from itertools import islice
+from contextlib import contextmanager
+from tempfile import NamedTemporaryFile
+import click
+from pandas import DataFrame, read_table, read_parquet, read_feather
+
+TABLE_FORMATS = ('tsv', 'parquet', 'feather')
+# Leading bytes of columnar files (Feather v2 is an Arrow IPC file, v1 files start with FEA1).
+COLUMNAR_MAGIC = {b'PAR1': 'parquet', b'ARROW1': 'feather', b'FEA1': 'feather'}
+TABLE_SUFFIX = {'tsv': '.xls', 'parquet': '.parquet', 'feather': '.feather'}
+
+
+def detect_table_format(file: Union[str, TextIOWrapper]) -> str:
+    """Detect table file format (tsv, parquet or feather) from its leading bytes, streams are always tsv."""
+    file_name = getattr(file, 'name', file)
+    if not isinstance(file_name, str) or not isfile(file_name):
+        return 'tsv'
+    with open(file_name, 'rb') as f:
+        head = f.read(6)
+    return next((fmt for magic, fmt in COLUMNAR_MAGIC.items() if head.startswith(magic)), 'tsv')
+
+
+def table_file_name(file: str, table_format: str) -> str:
+    """Replace the .xls suffix of output file name with the suffix of table format, other names are kept."""
+    if table_format == 'tsv' or not file.endswith('.xls'):
+        return file
+    return f'{file[:-4]}{TABLE_SUFFIX[table_format]}'
+
+
+def read_table_file(file: Union[str, TextIOWrapper], index_col=None, usecols=None, dtype=None, **kwargs) -> DataFrame:
+    """
+    Read in table file like pandas.read_table, Parquet and Feather files are detected and read column-wise instead.
+    :param file: Table file. (type=str|TextIOWrapper)
+    :param index_col: Column(s) (position in the columns read) used as index. (type=int|List[int], default=None)
+    :param usecols: Column names to read, or a callable selecting them. (type=list|Callable, default=None)
+    :param dtype: Data type of all columns, str keeps missing values as NaN just like text files. (default=None)
+    :param kwargs: Other parameters of pandas.read_table, only used for tab-delimited text.
+    :return: DataFrame
+    """
+    table_format = detect_table_format(file)
+    if table_format == 'tsv':
+        return read_table(file, index_col=index_col, usecols=usecols, dtype=dtype, **kwargs)
+    file_name = getattr(file, 'name', file)
+    if table_format == 'parquet':
+        if callable(usecols):
+            from pyarrow.parquet import read_schema
+            usecols = [i for i in read_schema(file_name).names if usecols(i)]
+        df = read_parquet(file_name, columns=usecols)
+    else:
+        df = read_feather(file_name, columns=None if callable(usecols) else usecols)
+        if callable(usecols):
+            df = df.loc[:, [i for i in df.columns if usecols(i)]]
+    if dtype is not None:
+        df = df.astype(object).where(df.isna(), df.astype(dtype))
+    if index_col is not None and index_col is not False:
+        index_col = [index_col] if isinstance(index_col, int) else list(index_col)
+        df.set_index(keys=[df.columns[i] for i in index_col], inplace=True)
+    return df
+
+
+@contextmanager
+def text_table_file(file: Union[str, TextIOWrapper], tmp_dir: str = None) -> Iterator[Union[str, TextIOWrapper]]:
+    """
+    Give table file to tools that only parse tab-delimited text (eg. pybioinformatic.GenoType).
+    Text files and streams are given as they are, Parquet and Feather files are converted to a temporary text file
+    (missing values as NA) removed on exit.
+    :param file: Table file. (type=str|TextIOWrapper)
+    :param tmp_dir: Directory of temporary text file, system temporary directory by default. (type=str, default=None)
+    :return: Text table file path or stream.
+    """
+    if detect_table_format(file) == 'tsv':
+        yield file
+        return
+    with NamedTemporaryFile('w', suffix='.xls', dir=tmp_dir) as tmp:
+        write_table_file(read_table_file(file, dtype=str), tmp, index=False, na_rep='NA')
+        tmp.flush()
+        yield tmp.name
+
+
+def write_table_file(df: DataFrame,
+                     file: Union[str, TextIOWrapper],
+                     table_format: Literal['tsv', 'parquet', 'feather'] = 'tsv',
+                     index: bool = True,
+                     **kwargs) -> None:
+    """
+    Write DataFrame as tab-delimited text (default), Parquet or Feather.
+    Index of columnar files is stored as ordinary columns, so that they read back just like text files.
+    :param df: Table to write. (type=pandas.DataFrame)
+    :param file: Output file path or stream, stream of a columnar file is reopened in binary mode. (type=str|TextIOWrapper)
+    :param table_format: Output format. (type=str, default=tsv)
+    :param index: Write index or not. (type=bool, default=True)
+    :param kwargs: Other parameters of DataFrame.to_csv, only used for tab-delimited text.
+    :return: None
+    """
+    if table_format == 'tsv':
+        df.to_csv(file, sep='\t', index=index, **kwargs)
+        return
+    df = df.reset_index() if index else df.reset_index(drop=True)
+    df.columns = [str(i) for i in df.columns]
+    file_name = getattr(file, 'name', file)
+    if file_name in ('-', '<stdout>'):
+        file_name = click.get_binary_stream('stdout')
+    if table_format == 'parquet':
+        df.to_parquet(file_name, index=False)
+    else:
+        df.to_feather(file_name)
+
+
+def iter_table_lines(file: Union[str, TextIOWrapper], batch_size: int = 65536) -> Iterator[str]:
+    """
+    Iterate over table file as tab-delimited text lines (header first), columnar files are decoded batch by batch.
+    :param file: Table file. (type=str|TextIOWrapper)
+    :param batch_size: Number of rows decoded at once from columnar file. (type=int, default=65536)
+    :return: Text lines, missing values of columnar file are NA.
+    """
+    table_format = detect_table_format(file)
+    if table_format == 'tsv':
+        yield from open(file) if isinstance(file, str) else file
+        return
+    file_name = getattr(file, 'name', file)
+    if table_format == 'parquet':
+        from pyarrow.parquet import ParquetFile
+        parquet_file = ParquetFile(file_name)
+        names, batches = parquet_file.schema_arrow.names, parquet_file.iter_batches(batch_size)
+    else:
+        from pyarrow.feather import read_table as read_arrow_table
+        table = read_arrow_table(file_name, memory_map=True)
+        names, batches = table.column_names, table.to_batches(batch_size)
+    yield '\t'.join(names) + '\n'
+    for batch in batches:
+        columns = [['NA' if value is None else str(value) for value in column.to_pylist()] for column in batch.columns]
+        yield from ('\t'.join(row) + '\n' for row in zip(*columns))
+
+
+def write_table_rows(header: List[str],
+                     rows: Iterable[List[str]],
+                     file: Union[str, TextIOWrapper],
+                     table_format: Literal['tsv', 'parquet', 'feather'] = 'tsv',
+                     batch_size: int = 65536) -> None:
+    """
+    Write stream of string rows as table file without keeping them in memory, NA cells of columnar file are null.
+    :param header: Field names. (type=List[str])
+    :param rows: Rows of fields. (type=Iterable[List[str]])
+    :param file: Output file path or stream, stream of a columnar file is reopened in binary mode. (type=str|TextIOWrapper)
+    :param table_format: Output format. (type=str, default=tsv)
+    :param batch_size: Number of rows of each columnar record batch. (type=int, default=65536)
+    :return: None
+    """
+    if table_format == 'tsv':
+        if isinstance(file, str):
+            with open(file, 'w') as o:
+                return write_table_rows(header, rows, o)
+        file.write('\t'.join(header) + '\n')
+        file.writelines('\t'.join(row) + '\n' for row in rows)
+        return
+    import pyarrow as pa
+    from pyarrow.parquet import ParquetWriter
+    schema = pa.schema([(name, pa.string()) for name in header])
+    file_name = getattr(file, 'name', file)
+    if file_name in ('-', '<stdout>'):
+        file_name = click.get_binary_stream('stdout')
+    writer = ParquetWriter(file_name, schema) if table_format == 'parquet' else pa.ipc.new_file(file_name, schema)
+    with writer:
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            columns = [[None if value == 'NA' else value for value in column] for column in zip(*batch)]
+            writer.write_batch(pa.RecordBatch.from_arrays([pa.array(column, pa.string()) for column in columns], schema=schema))
@@ -0,0 +1,3 @@
+from go_lib.ontology import Ontology, parse_obo_terms, ancestor_csr, read_data_version
+
+__version__ = '0.1.0'
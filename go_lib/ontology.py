@@ -0,0 +1,203 @@
+"""
+File: ontology.py
+Description: Gene Ontology terms parsed from OBO file into compact arrays with ancestor index, cached as npz.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from os import stat, replace
+from os.path import abspath, basename, dirname
+from re import compile
+from typing import Dict, List, Tuple
+import numpy as np
+import click
+
+# Relations followed when propagating annotations to ancestor terms (true path rule).
+PROPAGATE_RELATIONS = ('is_a', 'part_of')
+UNSAFE_CHARS = compile(r'[^\w.-]+')
+
+
+def read_data_version(obo_file: str) -> str:
+    """data-version of OBO header (eg. releases/2024-01-17), file size and mtime if there is none."""
+    with open(obo_file) as f:
+        for line in f:
+            if line.startswith('data-version:'):
+                return line.split(':', 1)[1].strip()
+            if line.startswith('['):
+                break
+    st = stat(obo_file)
+    return f'{st.st_size}-{st.st_mtime_ns}'
+
+
+def parse_obo_terms(obo_file: str) -> Tuple[List[str], List[str], List[str], Dict[str, str], List[List[str]]]:
+    """
+    Parse [Term] stanzas of OBO file in one pass.
+    :return: tuple(IDs, names, namespaces, alt ID to ID dict, parent IDs by is_a and part_of of each term)
+    """
+    ids, names, namespaces, alt_ids, parents = [], [], [], {}, []
+    in_term = False
+    for line in open(obo_file):
+        if line.startswith('['):
+            in_term = line.startswith('[Term]')
+            if in_term:
+                ids.append('')
+                names.append('')
+                namespaces.append('')
+                parents.append([])
+            continue
+        if not in_term:
+            continue
+        tag, _, value = line.partition(': ')
+        if tag == 'id':
+            ids[-1] = value.strip()
+        elif tag == 'name':
+            names[-1] = value.strip()
+        elif tag == 'namespace':
+            namespaces[-1] = value.strip()
+        elif tag == 'alt_id':
+            alt_ids[value.strip()] = len(ids) - 1
+        elif tag == 'is_a':
+            parents[-1].append(value.split('!')[0].strip())
+        elif tag == 'relationship':
+            relation, target = value.split()[:2]
+            if relation in PROPAGATE_RELATIONS:
+                parents[-1].append(target)
+    alt_ids = {alt_id: ids[i] for alt_id, i in alt_ids.items()}
+    return ids, names, namespaces, alt_ids, parents
+
+
+def ancestor_csr(parents: List[List[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Transitive closure of parent lists as CSR adjacency: ancestors of term i are indices[indptr[i]:indptr[i + 1]].
+    Terms are visited in topological order (parents first), so each closure is the union of its parents' closures.
+    """
+    n = len(parents)
+    children = [[] for _ in range(n)]
+    num_parents = np.zeros(n, dtype=np.int64)
+    for i, term_parents in enumerate(parents):
+        num_parents[i] = len(term_parents)
+        for parent in term_parents:
+            children[parent].append(i)
+    order = [i for i in range(n) if num_parents[i] == 0]
+    ancestors = [frozenset()] * n
+    for i in order:
+        for child in children[i]:
+            num_parents[child] -= 1
+            if num_parents[child] == 0:
+                order.append(child)
+    if len(order) != n:
+        raise ValueError('Cycle found among is_a/part_of relations of OBO file.')
+    for i in order:
+        if parents[i]:
+            closure = set(parents[i])
+            for parent in parents[i]:
+                closure.update(ancestors[parent])
+            ancestors[i] = frozenset(closure)
+    lengths = np.fromiter((len(i) for i in ancestors), dtype=np.int64, count=n)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = np.fromiter((j for i in ancestors for j in sorted(i)), dtype=np.int32, count=int(indptr[-1]))
+    return indptr, indices
+
+
+class Ontology:
+    """
+    GO terms as arrays (ids, names, namespaces) plus CSR ancestor index over is_a and part_of. Parsing go-basic.obo
+    takes seconds, so the arrays are cached in <obo file>.<data-version>.npz and reused while data-version is
+    unchanged. Alternative IDs are mapped to their primary term.
+    """
+    def __init__(self,
+                 ids: np.ndarray,
+                 names: np.ndarray,
+                 namespaces: np.ndarray,
+                 alt_ids: np.ndarray,
+                 alt_terms: np.ndarray,
+                 indptr: np.ndarray,
+                 indices: np.ndarray,
+                 data_version: str = ''):
+        self.ids = ids
+        self.names = names
+        self.namespaces = namespaces
+        self.indptr = indptr
+        self.indices = indices
+        self.data_version = data_version
+        self.alt_ids = dict(zip(alt_ids.tolist(), alt_terms.tolist()))
+        self.index = {term_id: i for i, term_id in enumerate(ids.tolist())}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_obo(cls, obo_file: str):
+        ids, names, namespaces, alt_ids, parents = parse_obo_terms(obo_file)
+        index = {term_id: i for i, term_id in enumerate(ids)}
+        parents = [[index[parent] for parent in term_parents if parent in index] for term_parents in parents]
+        indptr, indices = ancestor_csr(parents)
+        return cls(
+            ids=np.array(ids, dtype=str),
+            names=np.array(names, dtype=str),
+            namespaces=np.array(namespaces, dtype=str),
+            alt_ids=np.array(list(alt_ids), dtype=str),
+            alt_terms=np.array([index[i] for i in alt_ids.values()], dtype=np.int32),
+            indptr=indptr,
+            indices=indices,
+            data_version=read_data_version(obo_file)
+        )
+
+    @staticmethod
+    def cache_file(obo_file: str) -> str:
+        version = UNSAFE_CHARS.sub('_', read_data_version(obo_file)).strip('_')
+        return f'{dirname(abspath(obo_file))}/.{basename(obo_file)}.{version}.npz'
+
+    def save(self, file: str):
+        """Save arrays as npz (no pickle), written to a temporary file first so that readers never see half a file."""
+        alt_ids = np.array(list(self.alt_ids), dtype=str)
+        alt_terms = np.array(list(self.alt_ids.values()), dtype=np.int32)
+        with open(f'{file}.tmp', 'wb') as o:
+            np.savez(o, ids=self.ids, names=self.names, namespaces=self.namespaces, alt_ids=alt_ids,
+                     alt_terms=alt_terms, indptr=self.indptr, indices=self.indices,
+                     data_version=np.array(self.data_version))
+        replace(f'{file}.tmp', file)
+
+    @classmethod
+    def load(cls, obo_file: str, use_cache: bool = True):
+        """Load ontology from cache of obo_file if its data-version is cached, otherwise parse and cache it."""
+        if not use_cache:
+            return cls.from_obo(obo_file)
+        cache_file = cls.cache_file(obo_file)
+        try:
+            with np.load(cache_file) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+            arrays['data_version'] = str(arrays['data_version'])
+            return cls(**arrays)
+        except (OSError, KeyError, ValueError):
+            pass
+        ontology = cls.from_obo(obo_file)
+        try:
+            ontology.save(cache_file)
+        except OSError as e:
+            click.echo(f'\033[33mWarning: can not write ontology cache {cache_file}: {e}\033[0m', err=True)
+        return ontology
+
+    def term_index(self, term_id: str) -> int:
+        """Index of term (alternative IDs are resolved), -1 if unknown."""
+        i = self.index.get(term_id)
+        if i is None:
+            i = self.alt_ids.get(term_id, -1)
+        return i
+
+    def propagate(self, rows: np.ndarray, terms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Add all ancestors of annotated terms in one vectorized gather over the CSR index.
+        :param rows: Row (gene) number of each annotation. (type=numpy.ndarray)
+        :param terms: Term index of each annotation. (type=numpy.ndarray)
+        :return: tuple(rows, terms) of unique annotations including ancestors, sorted by row then term.
+        """
+        starts = self.indptr[terms]
+        counts = self.indptr[terms + 1] - starts
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        ancestors = self.indices[np.repeat(starts, counts) + offsets]
+        keys = np.concatenate([rows, np.repeat(rows, counts)]).astype(np.int64) * len(self) + \
+            np.concatenate([terms, ancestors])
+        keys = np.unique(keys)
+        return keys // len(self), keys % len(self)
@@ -12,7 +12,8 @@ from os import makedirs, getcwd
 import matplotlib.pyplot as plt
 import click
 from pybioinformatic import GenoType, Timer, Displayer
-displayer = Displayer(__file__.split('/')[-1], version='0.2.1')
+from file_io_lib import text_table_file
+displayer = Displayer(__file__.split('/')[-1], version='0.2.2')
 
 
 @Timer('Genotype consistency analysis underway.')
@@ -25,7 +26,9 @@ def main(gt_file1: Union[str, TextIOWrapper],
     makedirs(output_path, exist_ok=True)
     if reverse_cmap:
         color_map = plt.get_cmap(color_map).reversed()
-    with GenoType(gt_file1) as gt1, GenoType(gt_file2) as gt2:
+    # GenoType only parses text, columnar GT files (vcf2gt -f parquet|feather) are converted to temporary text files
+    with text_table_file(gt_file1, output_path) as gt_file1, text_table_file(gt_file2, output_path) as gt_file2, \
+            GenoType(gt_file1) as gt1, GenoType(gt_file2) as gt2:
         gt1.compare(gt2, output_path=output_path, cmap=color_map) \
             if database_compare else \
             gt1.self_compare(gt2, output_path=output_path)
@@ -34,10 +37,10 @@ def main(gt_file1: Union[str, TextIOWrapper],
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
 @click.option('-i', '--database-gt', 'database_gt',
               metavar='<GT file>', type=click.File('r'), required=True,
-              help='Input database sample gt file.')
+              help='Input database sample gt file (text, Parquet or Feather).')
 @click.option('-I', '--test-gt', 'test_gt',
               metavar='<GT file>', type=click.File('r'), required=True,
-              help='Input test sample gt file.')
+              help='Input test sample gt file (text, Parquet or Feather).')
 @click.option('--database-compare/--self-compare', 'database_compare',
               default=True, show_default=True,
               help='Specify comparison mode. Database compare means test sample compare with database sample. '
@@ -11,14 +11,17 @@ from typing import Union
 from typing_extensions import Literal
 import click
 from pybioinformatic import GenoType, dataframe_to_str, Displayer
-displayer = Displayer(__file__.split('/')[-1], version='0.1.0')
+from file_io_lib import text_table_file
+displayer = Displayer(__file__.split('/')[-1], version='0.1.1')
 
 
 def main(gt_file: Union[str, TextIOWrapper],
          another_gt: Union[str, TextIOWrapper],
          mode: Literal['inner', 'outer'] = 'inner',
          output_file: Union[TextIOWrapper, None] = None):
-    with GenoType(gt_file) as gt1, GenoType(another_gt) as gt2:
+    # GenoType only parses text, columnar GT files (vcf2gt -f parquet|feather) are converted to temporary text files
+    with text_table_file(gt_file) as gt_file, text_table_file(another_gt) as another_gt, \
+            GenoType(gt_file) as gt1, GenoType(another_gt) as gt2:
         merge_gt = gt1.merge(other=gt2, how=mode)
         merge_gt.reset_index(inplace=True)
         merge_gt = dataframe_to_str(df=merge_gt, index=False)
@@ -28,10 +31,10 @@ def main(gt_file: Union[str, TextIOWrapper],
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
 @click.option('-1', '--gt-file', 'gt_file',
               metavar='<file|stdin>', type=click.File('r'), required=True,
-              help='Enter GT file.')
+              help='Enter GT file (text, Parquet or Feather).')
 @click.option('-2', '--another-gt', 'another_gt',
               metavar='<file|stdin>', type=click.File('r'), required=True,
-              help='Enter another GT file.')
+              help='Enter another GT file (text, Parquet or Feather).')
 @click.option('-m', '--mode', 'mode',
               type=click.Choice(['inner', 'outer']), default='inner', show_default=True,
               help='Merge mode.')
@@ -13,16 +13,18 @@ from matplotlib.pyplot import rcParams, style, figure, subplots_adjust, savefig
 from seaborn import histplot
 import click
 from pybioinformatic import GenoType, Timer, Displayer
-displayer = Displayer(__file__.split('/')[-1], version='0.1.0')
+from file_io_lib import TABLE_FORMATS, table_file_name, write_table_file, text_table_file
+displayer = Displayer(__file__.split('/')[-1], version='0.2.1')
 
 
 @Timer('Calculating MissRate, HetRate, and MAF.')
 def main(gt_file: Union[str, TextIOWrapper],
          num_processing: int,
-         output_path: str):
+         output_path: str,
+         table_format: str = 'tsv'):
     makedirs(output_path, exist_ok=True)
-    # stat MHM
-    with GenoType(gt_file) as gt:
+    # stat MHM, GenoType only parses text, so columnar GT file is converted to a temporary text file first
+    with text_table_file(gt_file, output_path) as gt_file, GenoType(gt_file) as gt:
         stat_df = gt.parallel_stat_MHM(num_processing)
     # plot figure
     style.use('ggplot')
@@ -42,7 +44,7 @@ def main(gt_file: Union[str, TextIOWrapper],
     stat_df['MissRate(%)'] = stat_df.loc[:, ['MissRate(%)']].applymap(lambda value: '%.2f' % value)
     stat_df['HetRate(%)'] = stat_df.loc[:, ['HetRate(%)']].applymap(lambda value: '%.2f' % value)
     stat_df['MAF'] = stat_df.loc[:, ['MAF']].applymap(lambda value: '%.3f' % value)
-    stat_df.to_csv(f'{output_path}/site_stat.xls', sep='\t', index=False)
+    write_table_file(stat_df, table_file_name(f'{output_path}/site_stat.xls', table_format), table_format, index=False)
     savefig(f'{output_path}/distribution.png', bbox_inches='tight')
 
 
@@ -55,11 +57,14 @@ def main(gt_file: Union[str, TextIOWrapper],
 @click.option('-o', '--output-path', 'output_path',
               metavar='<path>', default=getcwd(), show_default=True,
               help='Output file path, if not exist, automatically created.')
+@click.option('-f', '--format', 'table_format',
+              type=click.Choice(TABLE_FORMATS), default='tsv', show_default=True,
+              help='Output table format, parquet and feather files replace .xls suffix.')
 @click.option('-V', '--version', 'version', help='Show author and version information.',
               is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
-def run(gt_file, num_processing, output_path):
+def run(gt_file, num_processing, output_path, table_format):
     """Calculate the miss rate, heterozygosity rate and MAF of SNP sites from GT files."""
-    main(gt_file, num_processing, output_path)
+    main(gt_file, num_processing, output_path, table_format)
 
 
 if __name__ == '__main__':
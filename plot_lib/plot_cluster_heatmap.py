@@ -10,7 +10,8 @@ import click
 from numpy import log2
 from matplotlib.pyplot import rcParams, savefig
 from seaborn import clustermap
-from pybioinformatic import read_in_gene_expression_as_dataframe, Displayer
+from pybioinformatic import Displayer
+from expression_lib import read_in_gene_expression_as_dataframe
 displayer = Displayer(__file__.split('/')[-1], version='0.1.0')
 
 
@@ -39,7 +40,7 @@ def main(gene_exp_file: str,
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
 @click.option('-i', '--gene_exp', 'gene_exp_file',
               metavar='<text file>', required=True,
-              help='Input gene expression file (support format: txt, csv, xls, and xlsx).')
+              help='Input gene expression file (support format: txt, csv, xls, xlsx, and binary matrix).')
 @click.option('-c', '--color_map', 'color_map',
               metavar='<str>', default='PiYG', show_default=True,
               help='Color map (eg. PiYG, vlag, OrRd, YlOrRd, Spectral).')
@@ -7,95 +7,191 @@ Author: xuwenlin
 E-mail: wenlinxu.njfu@outlook.com
 """
 from io import TextIOWrapper
-from random import choice
-from time import sleep
+from os import makedirs, replace
+from os.path import expanduser, exists
+from concurrent.futures import ThreadPoolExecutor, Future
+from threading import Lock
+from random import uniform
+from re import compile
+from time import sleep, monotonic
+from typing import Dict, List
 import requests
+from requests.adapters import HTTPAdapter
 from natsort import natsort_key
 from tqdm import tqdm
 import click
-from pybioinformatic import TaskManager, Displayer
-displayer = Displayer(__file__.split('/')[-1], version='0.3.0')
-
-
-def download(url, proxy_list: list):
-    header_list = [
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.99 Safari/537.36",
-        "Mozilla/5.0 (Windows NT 6.3; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_9_2) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/35.0.1916.153 Safari/537.36",
-        "Mozilla/5.0 (Windows NT 6.1; WOW64; rv:30.0) Gecko/20100101 Firefox/30.0",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_9_2) AppleWebKit/537.75.14 (KHTML, like Gecko) Version/7.0.3 Safari/537.75.14",
-        "Mozilla/5.0 (compatible; MSIE 10.0; Windows NT 6.2; Win64; x64; Trident/6.0)",
-        'Mozilla/5.0 (Windows; U; Windows NT 5.1; it; rv:1.8.1.11) Gecko/20071127 Firefox/2.0.0.11',
-        'Opera/9.25 (Windows NT 5.1; U; en)',
-        'Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; .NET CLR 1.1.4322; .NET CLR 2.0.50727)',
-        'Mozilla/5.0 (compatible; Konqueror/3.5; Linux) KHTML/3.5.5 (like Gecko) (Kubuntu)',
-        'Mozilla/5.0 (X11; U; Linux i686; en-US; rv:1.8.0.12) Gecko/20070731 Ubuntu/dapper-security Firefox/1.5.0.12',
-        'Lynx/2.8.5rel.1 libwww-FM/2.14 SSL-MM/1.4.1 GNUTLS/1.2.9',
-        "Mozilla/5.0 (X11; Linux i686) AppleWebKit/535.7 (KHTML, like Gecko) Ubuntu/11.04 Chromium/16.0.912.77 Chrome/16.0.912.77 Safari/535.7",
-        "Mozilla/5.0 (X11; Ubuntu; Linux i686; rv:10.0) Gecko/20100101 Firefox/10.0"
-    ]
-
-    if proxy_list is None:
-        proxy_list = [
-            {'http': 'http://39.104.23.154:6379'},
-            {'http': 'http://47.104.198.111:80'},
-            {'http': 'http://112.124.36.55:8888'},
-            {'http': 'http://47.116.210.163:8080'},
-            {'http': 'http://47.119.22.92:9098'},
-            {'http': 'http://39.102.214.199:8081'},
-            {'http': 'http://39.102.209.128:3128'},
-            {'http': 'http://8.138.82.6:8080'},
-            {'http': 'http://121.43.154.123:9098'},
-            {'http': 'http://39.102.214.199:3128'}
-        ]
-
-    while True:
-        response = requests.get(
-            url=url,
-            headers={"User-Agent": choice(header_list)},
-            proxies=choice(proxy_list)
-        )
-        if response.status_code != 403:
-            break
-        else:
-            sleep(180)
-
-    return response.text
+from pybioinformatic import Displayer
+displayer = Displayer(__file__.split('/')[-1], version='0.4.1')
+
+BASE_URL = 'https://rest.kegg.jp'
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.99 Safari/537.36'
+DEFAULT_CACHE_DIR = expanduser('~/.cache/KEGG_seq')
+BATCH_SIZE = 10  # max entries per KEGG REST get request
+RETRY_STATUS = {403, 429, 500, 502, 503, 504}
+UNSAFE_CHARS = compile(r'[^\w.-]+')
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket, acquire() blocks until a token is available.
+    :param rate: Tokens added per second. (type=float)
+    :param capacity: Max tokens kept (burst size). (type=float, default=rate)
+    """
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.last = monotonic()
+        self.lock = Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            sleep(wait)
+
+
+class KEGGFetcher:
+    """
+    Download KEGG entries in batches of 10 IDs over one keep-alive session shared by all threads.
+    Every request takes a token of the rate limiter (KEGG allows about 3 requests per second),
+    requests answered with 403/429/5xx or failed by network errors are retried with exponential backoff
+    and full jitter (Retry-After is honored). Entries are cached per ID in cache_dir/seq_type,
+    so a rerun only downloads IDs missing from cache.
+    """
+    def __init__(self,
+                 seq_type: str = 'aaseq',
+                 base_url: str = BASE_URL,
+                 cache_dir: str = DEFAULT_CACHE_DIR,
+                 rate: float = 3,
+                 num_threads: int = 3,
+                 max_retries: int = 8,
+                 backoff: float = 1,
+                 max_backoff: float = 300,
+                 proxies: Dict[str, str] = None):
+        self.seq_type = seq_type
+        self.base_url = base_url.rstrip('/')
+        self.cache_dir = f'{cache_dir}/{seq_type}'
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(rate)
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=num_threads)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if proxies:
+            self.session.proxies.update(proxies)
+        makedirs(self.cache_dir, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.session.close()
+
+    def cache_file(self, entry_id: str) -> str:
+        return f'{self.cache_dir}/{UNSAFE_CHARS.sub("_", entry_id.lower())}.fa'
+
+    def cached(self, entry_id: str) -> str:
+        """Cached entry of ID, empty string if KEGG did not return it before, None if it is not cached."""
+        cache_file = self.cache_file(entry_id)
+        if exists(cache_file):
+            with open(cache_file) as f:
+                return f.read()
+        return None
+
+    def get(self, url: str) -> requests.Response:
+        """GET url within rate limit, retrying throttled or failed requests with exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                response = self.session.get(url, timeout=60)
+            except requests.RequestException as e:
+                response, error = None, e
+            else:
+                if response.status_code not in RETRY_STATUS:
+                    return response
+                error = f'HTTP {response.status_code}'
+            if attempt == self.max_retries:
+                break
+            delay = uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            sleep(delay)
+        raise click.ClickException(f'Download of {url} failed after {self.max_retries + 1} attempts: {error}')
+
+    def fetch(self, entry_ids: List[str]) -> Dict[str, str]:
+        """
+        Download a batch of entries (at most 10) and cache each of them. IDs that KEGG does not return in a
+        successful response are cached as empty entries (negative cache), so reruns do not ask for them again.
+        :return: Entry of each requested ID (lower case) as FASTA text, empty string for IDs not found by KEGG.
+        """
+        response = self.get(f'{self.base_url}/get/{"+".join(entry_ids)}/{self.seq_type}')
+        entries = {}
+        if response.status_code != 404:
+            response.raise_for_status()
+            for record in response.text.split('>')[1:]:
+                entry_id = record.split(maxsplit=1)[0].lower()
+                entries[entry_id] = f'>{record.rstrip()}\n'
+        for entry_id in entry_ids:
+            entries.setdefault(entry_id.lower(), '')
+        for entry_id, entry in entries.items():
+            cache_file = self.cache_file(entry_id)
+            with open(f'{cache_file}.tmp', 'w') as o:
+                o.write(entry)
+            replace(f'{cache_file}.tmp', cache_file)
+        return entries
 
 
 def main(in_file: TextIOWrapper,
          seq_type: click.Choice(['aaseq', 'ntseq']),
-         num_processing: int,
+         num_threads: int = 3,
          proxy: TextIOWrapper = None,
-         output_file: TextIOWrapper = None):
+         output_file: TextIOWrapper = None,
+         cache_dir: str = DEFAULT_CACHE_DIR,
+         rate: float = 3,
+         base_url: str = BASE_URL):
     id_list = list({line.strip() for line in in_file if line.strip()})
     id_list.sort(key=natsort_key)
-    url_template = 'https://rest.kegg.jp/get/{dbentries}/{seq_type}'
     if proxy:
-        proxy = [{line.strip().split('\t')[0]: line.strip().split('\t')[1]} for line in proxy if line.strip()]
-    if len(id_list) <= 10:
-        url = url_template.format(
-            dbentries='+'.join(id_list),
-            seq_type=seq_type
-        )
-        ret = download(url, proxy)
-        click.echo(ret, output_file)
-    else:
-        params = [
-            (
-                url_template.format(
-                    dbentries='+'.join(id_list[i:i + 10]),
-                    seq_type=seq_type
-                ),
-                proxy
-            )
-            for i in range(0, len(id_list), 10)
-        ]
-        tkm = TaskManager(num_processing=num_processing, params=params)
-        with tqdm(total=len(params)) as pbar:
-            rets = tkm.parallel_run_func(func=download, call_back_func=lambda _: pbar.update())
-            for ret in rets:
-                click.echo(ret.get(), output_file)
+        proxy = dict(line.strip().split('\t')[:2] for line in proxy if line.strip())
+    output_file = output_file or click.get_text_stream('stdout')
+    with KEGGFetcher(seq_type, base_url, cache_dir, rate, num_threads, proxies=proxy) as fetcher, \
+            ThreadPoolExecutor(num_threads) as executor:
+        entries = {entry_id: fetcher.cached(entry_id) for entry_id in id_list}
+        missing = [entry_id for entry_id, entry in entries.items() if entry is None]
+        pbar = tqdm(total=len(missing), file=click.get_text_stream('stderr'))
+        futures: Dict[str, Future] = {}
+        for i in range(0, len(missing), BATCH_SIZE):
+            batch = missing[i:i + BATCH_SIZE]
+            future = executor.submit(fetcher.fetch, batch)
+            future.add_done_callback(lambda _, n=len(batch): pbar.update(n))
+            futures.update((entry_id, future) for entry_id in batch)
+        # Entries are written in ID order as soon as the batch holding them is done.
+        try:
+            for entry_id in id_list:
+                entry = entries[entry_id]
+                if entry is None:
+                    entry = futures[entry_id].result()[entry_id.lower()]
+                if not entry:
+                    click.echo(f'\033[33mWarning: {entry_id} is not found in KEGG.\033[0m', err=True)
+                    continue
+                output_file.write(entry)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            pbar.close()
+    output_file.flush()
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
@@ -105,9 +201,19 @@ def main(in_file: TextIOWrapper,
 @click.option('-t', '--seq_type', 'seq_type',
               metavar='<aaseq|ntseq>', type=click.Choice(['aaseq', 'ntseq']), default='aaseq', show_default=True,
               help='Specified sequence type.')
-@click.option('-n', '--num-processing', 'num_processing',
-              metavar='<int>', type=int, default=10, show_default=True,
-              help='Number of processing. (Download 10 sequences per processing)')
+@click.option('-n', '--num-threads', 'num_threads',
+              metavar='<int>', type=click.IntRange(min=1), default=3, show_default=True,
+              help='Number of download threads. (Download 10 sequences per request)')
+@click.option('-r', '--rate', 'rate',
+              metavar='<float>', type=click.FloatRange(min=0, min_open=True), default=3, show_default=True,
+              help='Max requests per second sent to KEGG.')
+@click.option('-c', '--cache-dir', 'cache_dir',
+              metavar='<dir>', default=DEFAULT_CACHE_DIR, show_default=True,
+              help='Directory caching downloaded sequences by ID, only IDs missing from it are downloaded. '
+                   'IDs not found by KEGG are remembered as empty files, delete them to ask KEGG again.')
+@click.option('-u', '--base-url', 'base_url',
+              metavar='<url>', default=BASE_URL, show_default=True,
+              help='KEGG REST API url.')
 @click.option('-p', '--proxy', 'proxy',
               metavar='<file|stdin>', type=click.File('r'),
               help=r'Proxy ip. (eg. http\thttp://39.104.23.154:6379)')
@@ -116,9 +222,9 @@ def main(in_file: TextIOWrapper,
               help='Output file, stdout by default.')
 @click.option('-V', '--version', 'version', help='Show author and version information.',
               is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
-def run(id_file, seq_type, num_processing, proxy, output_file):
+def run(id_file, seq_type, num_threads, rate, cache_dir, base_url, proxy, output_file):
     """Batch download sequences from KEGG url."""
-    main(id_file, seq_type, num_processing, proxy, output_file)
+    main(id_file, seq_type, num_threads, proxy, output_file, cache_dir, rate, base_url)
 
 
 if __name__ == '__main__':
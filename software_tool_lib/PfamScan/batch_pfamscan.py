@@ -12,13 +12,15 @@ from natsort import natsort_key
 from pandas import DataFrame, concat
 import click
 from pybioinformatic import TaskManager, Displayer
-displayer = Displayer(__file__.split('/')[-1], version='0.1.0')
+from file_io_lib import TABLE_FORMATS, table_file_name, write_table_file
+displayer = Displayer(__file__.split('/')[-1], version='0.2.0')
 
 
 def main(input_dir: str,
          pfamscan_database: str,
          num_processing: int,
-         out_dir: str):
+         out_dir: str,
+         table_format: str = 'tsv'):
     # Run PfamScan
     makedirs(f'{out_dir}/results', exist_ok=True)
     files = listdir(input_dir)
@@ -44,7 +46,7 @@ def main(input_dir: str,
         dfs.append(df)
     result = concat(dfs)
     result.sort_values('seq_id', key=natsort_key, inplace=True)
-    result.to_csv(f'{out_dir}/all_results.xls', sep='\t', index=False)
+    write_table_file(result, table_file_name(f'{out_dir}/all_results.xls', table_format), table_format, index=False)
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
@@ -60,11 +62,14 @@ def main(input_dir: str,
 @click.option('-n', '--num_processing', 'num_processing',
               metavar='<int>', type=int, default=1, show_default=True,
               help='Number of processing.')
+@click.option('-f', '--format', 'table_format',
+              type=click.Choice(TABLE_FORMATS), default='tsv', show_default=True,
+              help='Output table format, parquet and feather files replace .xls suffix.')
 @click.option('-V', '--version', 'version', help='Show author and version information.',
               is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
-def run(fasta_dir, pfam_database, num_processing, output_dir):
+def run(fasta_dir, pfam_database, num_processing, output_dir, table_format):
     """Batch pfamscan with multiple FASTA files."""
-    main(fasta_dir, pfam_database, num_processing, output_dir)
+    main(fasta_dir, pfam_database, num_processing, output_dir, table_format)
 
 
 if __name__ == '__main__':
@@ -11,7 +11,8 @@ from os import getcwd, makedirs
 from pandas import read_csv, read_table
 import click
 from pybioinformatic import merge_duplicate_indexes, get_FPKM, get_TPM, Displayer
-displayer = Displayer(__file__.split('/')[-1], version='0.1.0')
+from file_io_lib import TABLE_FORMATS, table_file_name, write_table_file
+displayer = Displayer(__file__.split('/')[-1], version='0.2.0')
 
 file_content = """
 # featureCounts command\n
@@ -25,7 +26,8 @@ gene100 Chr19 2100 4200   -    2100    2345    2137    1987  ...\n
 
 def main(featureCounts_result_file: TextIOWrapper,
          min_value: float = None,
-         out_path: str = getcwd()) -> None:
+         out_path: str = getcwd(),
+         table_format: str = 'tsv') -> None:
     """
     Standardize gene expression with FPKM
     :param featureCounts_result_file: gene expression matrix file generated by featureCounts software (TAB delimiters)
@@ -40,6 +42,7 @@ def main(featureCounts_result_file: TextIOWrapper,
     :param min_value: Gene minimum expression (genes whose expression is less than the specified value in all samples
                       are filtered out). {type=float, default=None}
     :param out_path: Output path. {type=str, default=.}
+    :param table_format: Output table format, tsv, parquet or feather. {type=str, default=tsv}
     :return: None
     """
     makedirs(out_path, exist_ok=True)
@@ -62,15 +65,16 @@ def main(featureCounts_result_file: TextIOWrapper,
 
     # extract raw reads count
     reads_count = merge_duplicate_indexes(df=df.iloc[:, 1:])
-    reads_count.to_csv(f'{out_path}/reads.count.fc.xls', sep='\t', float_format='%.0f')
+    write_table_file(reads_count, table_file_name(f'{out_path}/reads.count.fc.xls', table_format), table_format,
+                     float_format='%.0f')
 
     # calculate FPKM
     FPKM = get_FPKM(df, min_value)
-    FPKM.to_csv(f'{out_path}/FPKM.fc.xls', sep='\t')
+    write_table_file(FPKM, table_file_name(f'{out_path}/FPKM.fc.xls', table_format), table_format)
 
     # calculate TPM
     TPM = get_TPM(df, min_value)
-    TPM.to_csv(f'{out_path}/TPM.fc.xls', sep='\t')
+    write_table_file(TPM, table_file_name(f'{out_path}/TPM.fc.xls', table_format), table_format)
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
@@ -84,11 +88,14 @@ def main(featureCounts_result_file: TextIOWrapper,
 @click.option('-o', '--output-path', 'output_path',
               metavar='<str>', default=getcwd(), show_default=True,
               help='Output path, if not exist, automatically created.')
+@click.option('-f', '--format', 'table_format',
+              type=click.Choice(TABLE_FORMATS), default='tsv', show_default=True,
+              help='Output table format, parquet and feather files replace .xls suffix.')
 @click.option('-V', '--version', 'version', help='Show author and version information.',
               is_flag=True, is_eager=True, expose_value=False, callback=displayer.version_info)
-def run(gene_exp_file, min_exp, output_path):
+def run(gene_exp_file, min_exp, output_path, table_format):
     """Standardize gene expression with FPKM and TPM."""
-    main(gene_exp_file, min_exp, output_path)
+    main(gene_exp_file, min_exp, output_path, table_format)
 
 
 if __name__ == '__main__':
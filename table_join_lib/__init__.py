@@ -0,0 +1,7 @@
+from table_join_lib.external_sort import natural_key, external_sort, sort_to_file, read_and_remove
+from table_join_lib.merge_join import split_row, merge_join
+from table_join_lib.kway_join import project_lines, keyed_rows, sort_projected, sort_projected_to_file, \
+    kway_merge_join
+from table_join_lib.partition_join import hash_buckets, partition_join
+
+__version__ = '0.1.0'
@@ -0,0 +1,90 @@
+"""
+File: external_sort.py
+Description: Sort text lines larger than memory with sorted on-disk runs and a k-way merge.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from heapq import merge
+from itertools import islice
+from os import remove
+from tempfile import mkstemp
+from typing import Iterable, Iterator, Callable, List, Any
+from natsort import natsort_key
+
+# Max number of runs merged at once, more runs are merged in several passes to stay under the open file limit.
+MAX_FAN_IN = 128
+
+
+def natural_key(key: str) -> tuple:
+    """Natural sort key, ties between different strings with the same natural order (eg. a1 and a01) are broken."""
+    return natsort_key(key), key
+
+
+def _write_run(lines: List[str], tmp_dir: str) -> str:
+    fd, run_file = mkstemp(suffix='.run', dir=tmp_dir)
+    with open(fd, 'w') as o:
+        o.writelines(lines)
+    return run_file
+
+
+def _merge_runs(run_files: List[str], key: Callable[[str], Any]) -> Iterator[str]:
+    runs = [open(run_file) for run_file in run_files]
+    try:
+        yield from merge(*runs, key=key)
+    finally:
+        for run, run_file in zip(runs, run_files):
+            run.close()
+            remove(run_file)
+
+
+def external_sort(lines: Iterable[str],
+                  key: Callable[[str], Any],
+                  tmp_dir: str = None,
+                  run_size: int = 1000000) -> Iterator[str]:
+    """
+    Stable sort of newline terminated text lines with bounded memory.
+    :param lines: Input lines. (type=Iterable[str])
+    :param key: Sort key of a line. (type=Callable)
+    :param tmp_dir: Directory of temporary run files. (type=str, default=system temporary directory)
+    :param run_size: Max number of lines kept in memory. (type=int, default=1000000)
+    :return: Sorted lines.
+    """
+    lines = iter(lines)
+    run_files = []
+    while True:
+        run = list(islice(lines, run_size))
+        if not run:
+            break
+        run.sort(key=key)
+        if not run_files and len(run) < run_size:
+            yield from run
+            return
+        run_files.append(_write_run(run, tmp_dir))
+    while len(run_files) > MAX_FAN_IN:
+        run_files = [
+            _write_run(_merge_runs(run_files[i:i + MAX_FAN_IN], key), tmp_dir)
+            for i in range(0, len(run_files), MAX_FAN_IN)
+        ]
+    yield from _merge_runs(run_files, key)
+
+
+def sort_to_file(lines: Iterable[str],
+                 key: Callable[[str], Any],
+                 tmp_dir: str = None,
+                 run_size: int = 1000000) -> str:
+    """
+    Externally sort lines into a single temporary file, the run files are merged and removed before returning,
+    so sorting several inputs one after another never keeps more than one set of runs open.
+    :return: Path of sorted temporary file, read it with read_and_remove.
+    """
+    return _write_run(external_sort(lines, key, tmp_dir, run_size), tmp_dir)
+
+
+def read_and_remove(file: str) -> Iterator[str]:
+    """Iterate over lines of a temporary file, the file is removed once iteration ends."""
+    try:
+        with open(file) as f:
+            yield from f
+    finally:
+        remove(file)
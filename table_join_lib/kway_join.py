@@ -0,0 +1,80 @@
+"""
+File: kway_join.py
+Description: Streaming k-way merge join of several tables sorted by the same multi-column key.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from heapq import merge
+from itertools import groupby, product
+from typing import Iterable, Iterator, List, Tuple, Literal
+from table_join_lib.external_sort import natural_key, external_sort, sort_to_file
+from table_join_lib.merge_join import NA_VALUES
+
+
+def multi_natural_key(key: Tuple[str, ...]) -> tuple:
+    return tuple(natural_key(i) for i in key)
+
+
+def project_lines(lines: Iterable[str], indexes: List[int]) -> Iterator[str]:
+    """Keep only the fields at indexes of tab-delimited lines, fields after the last needed one are never split."""
+    max_split = max(indexes) + 1
+    for line in lines:
+        fields = line.rstrip('\r\n').split('\t', max_split)
+        fields.extend([''] * (max_split - len(fields) + 1))
+        yield '\t'.join(fields[i] if fields[i] not in NA_VALUES else 'NA' for i in indexes) + '\n'
+
+
+def keyed_rows(lines: Iterable[str], key_num: int) -> Iterator[Tuple[Tuple[str, ...], List[str]]]:
+    """Split projected lines (key fields first) as tuple(key, other fields)."""
+    for line in lines:
+        fields = line.rstrip('\n').split('\t')
+        yield tuple(fields[:key_num]), fields[key_num:]
+
+
+def _projected_key(key_num: int):
+    return lambda line: multi_natural_key(tuple(line.rstrip('\n').split('\t', key_num)[:key_num]))
+
+
+def sort_projected(lines: Iterable[str], key_num: int, tmp_dir: str = None, run_size: int = 1000000) -> Iterator[str]:
+    """Externally sort projected lines (key fields first) by natural order of key fields."""
+    return external_sort(lines, key=_projected_key(key_num), tmp_dir=tmp_dir, run_size=run_size)
+
+
+def sort_projected_to_file(lines: Iterable[str], key_num: int, tmp_dir: str = None, run_size: int = 1000000) -> str:
+    """Like sort_projected, but sorted eagerly into one temporary file whose path is returned."""
+    return sort_to_file(lines, key=_projected_key(key_num), tmp_dir=tmp_dir, run_size=run_size)
+
+
+def _key_groups(table_index: int, rows: Iterable[Tuple[Tuple[str, ...], List[str]]]):
+    last_sort_key = None
+    for key, group in groupby(rows, key=lambda row: row[0]):
+        sort_key = multi_natural_key(key)
+        if last_sort_key is not None and sort_key <= last_sort_key:
+            raise ValueError(f'Table {table_index + 1} is not naturally sorted by key: {"/".join(key)}.')
+        last_sort_key = sort_key
+        yield sort_key, table_index, key, [row[1] for row in group]
+
+
+def kway_merge_join(tables: List[Iterable[Tuple[Tuple[str, ...], List[str]]]],
+                    widths: List[int],
+                    how: Literal['left', 'outer', 'inner'] = 'left') -> Iterator[List[str]]:
+    """
+    Join tables sorted by the same key in a single pass, only the rows of one key are kept in memory.
+    :param tables: Rows of each table as tuple(key, other fields), sorted by multi_natural_key. The first one is master table.
+    :param widths: Number of non-key fields of each table. (type=List[int])
+    :param how: Join method, 'left' keeps the keys of master table. (type=str, default=left)
+    :return: Joined rows (key fields, then non-key fields of each table in order), duplicate keys make cartesian product.
+    """
+    na_rows = [[['NA'] * width] for width in widths]
+    groups = merge(*(_key_groups(i, rows) for i, rows in enumerate(tables)))
+    for _, key_groups in groupby(groups, key=lambda group: group[0]):
+        table_rows = list(na_rows)
+        present = 0
+        for _, table_index, key, rows in key_groups:
+            table_rows[table_index] = rows
+            present += 1
+        if (how == 'left' and table_rows[0] is na_rows[0]) or (how == 'inner' and present < len(tables)):
+            continue
+        for rows in product(*table_rows):
+            yield [*key, *(field for row in rows for field in row)]
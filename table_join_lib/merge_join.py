@@ -0,0 +1,69 @@
+"""
+File: merge_join.py
+Description: Streaming merge join of tables sorted by join key.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from itertools import groupby
+from typing import Iterable, Iterator, List, Literal, Tuple
+from table_join_lib.external_sort import natural_key
+
+NA_VALUES = {'', 'NA', 'NaN', 'nan', 'N/A', 'n/a', 'NULL', 'null', 'None', '#N/A'}
+
+
+def split_row(line: str, width: int) -> List[str]:
+    """Split tab-delimited line into exactly width fields, missing and empty cells are NA (same as pandas)."""
+    fields = line.rstrip('\r\n').split('\t')
+    fields.extend([''] * (width - len(fields)))
+    return [field if field not in NA_VALUES else 'NA' for field in fields[:width]]
+
+
+def _group_by_key(rows: Iterable[List[str]], column: int) -> Iterator[Tuple[str, List[List[str]]]]:
+    for key, group in groupby(rows, key=lambda row: row[column]):
+        yield key, [row[:column] + row[column + 1:] for row in group]
+
+
+def merge_join(left_rows: Iterable[List[str]],
+               right_rows: Iterable[List[str]],
+               left_column: int,
+               right_column: int,
+               left_width: int,
+               right_width: int,
+               how: Literal['left', 'right', 'outer', 'inner']) -> Iterator[List[str]]:
+    """
+    Merge join two row streams sorted by natural_key of their join column. Only the rows of one key are kept in memory.
+    :param left_rows: Left table rows (list of fields) sorted by join key. (type=Iterable[List[str]])
+    :param right_rows: Right table rows (list of fields) sorted by join key. (type=Iterable[List[str]])
+    :param left_column: Join column index of left table (0-based). (type=int)
+    :param right_column: Join column index of right table (0-based). (type=int)
+    :param left_width: Number of columns of left table. (type=int)
+    :param right_width: Number of columns of right table. (type=int)
+    :param how: Join method. (type=str)
+    :return: Joined rows (join key, left other fields, right other fields), duplicate rows are dropped.
+    """
+    left_na = [['NA'] * (left_width - 1)]
+    right_na = [['NA'] * (right_width - 1)]
+    left_groups = _group_by_key(left_rows, left_column)
+    right_groups = _group_by_key(right_rows, right_column)
+    left = next(left_groups, None)
+    right = next(right_groups, None)
+    while left or right:
+        if right is None or (left and natural_key(left[0]) < natural_key(right[0])):
+            key, left_group, right_group = left[0], left[1], right_na if how in ('left', 'outer') else None
+            left = next(left_groups, None)
+        elif left is None or natural_key(right[0]) < natural_key(left[0]):
+            key, left_group, right_group = right[0], left_na if how in ('right', 'outer') else None, right[1]
+            right = next(right_groups, None)
+        else:
+            key, left_group, right_group = left[0], left[1], right[1]
+            left = next(left_groups, None)
+            right = next(right_groups, None)
+        if left_group is None or right_group is None:
+            continue
+        joined = dict.fromkeys(
+            tuple([key] + left_row + right_row)
+            for left_row in left_group
+            for right_row in right_group
+        )
+        yield from (list(row) for row in joined)
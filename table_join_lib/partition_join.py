@@ -0,0 +1,99 @@
+"""
+File: partition_join.py
+Description: Hash-partitioned parallel join of two tables, joined buckets are merged in natural order of join key.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+from heapq import merge
+from multiprocessing import get_context
+from os import remove
+from tempfile import mkstemp
+from typing import Iterator, List, Literal, Tuple
+import numpy as np
+from pandas import DataFrame, Index
+from pandas.util import hash_pandas_object
+from table_join_lib.external_sort import natural_key
+
+_shared = {}
+# Temporary columns holding the row number of each input table.
+LEFT_POSITION = '\0left_position'
+RIGHT_POSITION = '\0right_position'
+
+
+def hash_buckets(keys: Index, num_buckets: int) -> np.ndarray:
+    """Bucket number of each key, equal keys of both tables always fall into the same bucket."""
+    return hash_pandas_object(keys.to_series(), index=False).to_numpy() % num_buckets
+
+
+def _init_worker(shared: dict):
+    _shared.update(shared)
+
+
+def _join_bucket(bucket: int) -> str:
+    left_mask, right_mask = _shared['left_buckets'] == bucket, _shared['right_buckets'] == bucket
+    # Row numbers in the input tables order the rows of a key like merge_join: left rows in file order,
+    # each with the right rows in file order.
+    left = _shared['left'][left_mask].assign(**{LEFT_POSITION: np.flatnonzero(left_mask)})
+    right = _shared['right'][right_mask].assign(**{RIGHT_POSITION: np.flatnonzero(right_mask)})
+    joined = left.join(other=right, how=_shared['how'], lsuffix=_shared['lsuffix'], rsuffix=_shared['rsuffix'])
+    keys = joined.index.astype(str).tolist()
+    left_positions = joined[LEFT_POSITION].fillna(-1).tolist()
+    right_positions = joined[RIGHT_POSITION].fillna(-1).tolist()
+    order = sorted(range(len(keys)), key=lambda i: (natural_key(keys[i]), left_positions[i], right_positions[i]))
+    joined = joined.drop(columns=[LEFT_POSITION, RIGHT_POSITION]).iloc[order]
+    joined = joined[~joined.reset_index().duplicated().to_numpy()]
+    fd, bucket_file = mkstemp(suffix='.bucket', dir=_shared['tmp_dir'])
+    with open(fd, 'w') as o:
+        joined.to_csv(o, sep='\t', na_rep='NA', header=False)
+    return bucket_file
+
+
+def _merge_buckets(bucket_files: List[str]) -> Iterator[List[str]]:
+    buckets = [open(bucket_file) for bucket_file in bucket_files]
+    try:
+        lines = merge(*buckets, key=lambda line: natural_key(line.split('\t', 1)[0]))
+        yield from (line.rstrip('\n').split('\t') for line in lines)
+    finally:
+        for bucket, bucket_file in zip(buckets, bucket_files):
+            bucket.close()
+            remove(bucket_file)
+
+
+def partition_join(left: DataFrame,
+                   right: DataFrame,
+                   how: Literal['left', 'right', 'outer', 'inner'],
+                   num_processing: int,
+                   lsuffix: str = '_left_table',
+                   rsuffix: str = '_right_table',
+                   tmp_dir: str = None) -> Tuple[List[str], Iterator[List[str]]]:
+    """
+    Join two tables indexed by join key in parallel. Both tables are hash-partitioned by key into num_processing
+    buckets, each bucket pair is joined and naturally sorted in its own process, then the sorted buckets are
+    k-way merged, so the global natural sort never re-sorts the whole result.
+    :param left: Left table indexed by join key. (type=pandas.DataFrame)
+    :param right: Right table indexed by join key. (type=pandas.DataFrame)
+    :param how: Join method. (type=str)
+    :param num_processing: Number of buckets and worker processes. (type=int)
+    :param lsuffix: Suffix of overlapping columns of left table. (type=str, default=_left_table)
+    :param rsuffix: Suffix of overlapping columns of right table. (type=str, default=_right_table)
+    :param tmp_dir: Directory of temporary bucket files. (type=str, default=system temporary directory)
+    :return: tuple(header, joined rows with NA for missing cells), only fully duplicated rows are dropped.
+             Rows are in the same order as merge_join: by key, then left row, then right row in file order.
+    """
+    empty = left.iloc[:0].join(other=right.iloc[:0], how=how, lsuffix=lsuffix, rsuffix=rsuffix)
+    header = [left.index.name or ''] + [str(i) for i in empty.columns]
+    shared = {
+        'left': left,
+        'right': right,
+        'left_buckets': hash_buckets(left.index, num_processing),
+        'right_buckets': hash_buckets(right.index, num_processing),
+        'how': how,
+        'lsuffix': lsuffix,
+        'rsuffix': rsuffix,
+        'tmp_dir': tmp_dir
+    }
+    # fork shares both tables with workers instead of pickling them
+    with get_context('fork').Pool(num_processing, initializer=_init_worker, initargs=(shared,)) as pool:
+        bucket_files = pool.map(_join_bucket, range(num_processing))
+    return header, _merge_buckets(bucket_files)
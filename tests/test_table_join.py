@@ -0,0 +1,34 @@
+"""
+File: test_table_join.py
+Description: Parallel partition join gives the same rows in the same order as the external merge join.
+CreateDate: 2026/10/18
+Author: xuwenlin
+E-mail: wenlinxu.njfu@outlook.com
+"""
+import pytest
+from pandas import DataFrame
+from table_join_lib import natural_key, merge_join, partition_join
+
+LEFT = [
+    ['g10', 'a', '1'], ['g2', 'b', '2'], ['g2', 'c', '3'], ['g1', 'd', '4'],
+    ['g3', 'e', '5'], ['g2', 'b', '2'], ['g7', 'f', '6'], ['g10', 'g', '7']
+]
+RIGHT = [
+    ['g2', 'x'], ['g10', 'y'], ['g2', 'z'], ['g4', 'w'], ['g10', 'y'], ['g2', 'v'], ['g9', 'u'], ['g1', 't']
+]
+
+
+def external_rows(how: str) -> list:
+    left = sorted(LEFT, key=lambda row: natural_key(row[0]))
+    right = sorted(RIGHT, key=lambda row: natural_key(row[0]))
+    return list(merge_join(left, right, 0, 0, len(LEFT[0]), len(RIGHT[0]), how))
+
+
+@pytest.mark.parametrize('how', ['left', 'right', 'outer', 'inner'])
+@pytest.mark.parametrize('num_processing', [2, 3])
+def test_partition_join_matches_merge_join(how, num_processing, tmp_path):
+    left = DataFrame(LEFT, columns=['id', 'name', 'value']).set_index('id')
+    right = DataFrame(RIGHT, columns=['id', 'note']).set_index('id')
+    header, rows = partition_join(left, right, how, num_processing, tmp_dir=str(tmp_path))
+    assert header == ['id', 'name', 'value', 'note']
+    assert list(rows) == external_rows(how)